@@ -93,6 +93,35 @@ DATABASES = {
 # }
 
 
+# 密码哈希算法，新密码使用第一个，登录时其他算法或参数过时的密码会自动用第一个重新哈希
+PASSWORD_HASHERS = [
+    'utils.hashers.TunedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+try:
+    import argon2
+except ImportError:
+    pass
+else:
+    # 安装了argon2-cffi时优先使用Argon2
+    PASSWORD_HASHERS.insert(0, 'utils.hashers.TunedArgon2PasswordHasher')
+
+# PBKDF2的迭代次数，调整后已有用户在下次登录时按新的次数重新哈希
+PASSWORD_HASH_ITERATIONS = 150000
+
+# Argon2的参数，memory_cost单位为KB
+PASSWORD_HASH_ARGON2 = {
+    'time_cost': 2,
+    'memory_cost': 512,
+    'parallelism': 2,
+}
+
+# 计算密码哈希的进程数，为0时在处理请求的进程中计算
+PASSWORD_HASH_WORKERS = 2
+
+# 按手机号认证，密码校验在上面的进程池中执行
+AUTHENTICATION_BACKENDS = ['users.backends.MobileBackend']
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -208,4 +237,17 @@ LOGIN_URL = '/login/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media/')
 
 # 设置图片访问的统一路由
-MEDIA_URL = '/media/'
\ No newline at end of file
+MEDIA_URL = '/media/'
+
+# 短信网关，sms_worker命令用它发送短信
+# 离线压测时可以换成本地模拟的网关 libs.yuntongxun.stub.StubCCP
+SMS_GATEWAY = 'libs.yuntongxun.sms.CCP'
+
+# 短信发送队列在redis中的键前缀，loadtest命令压测时使用单独的前缀
+SMS_QUEUE_PREFIX = 'smsq'
+
+# 是否启用验证码、登录等接口的限流，压测时可以关闭
+RATELIMIT_ENABLE = True
+
+# 生成上传图片缩略图的线程数
+IMAGE_WORKERS = 2
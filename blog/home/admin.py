@@ -1,4 +1,5 @@
 from django.contrib import admin
-from home.models import ArticleCtegory
+from home.models import ArticleCtegory, Tag
 # Register your models here.
-admin.site.register(ArticleCtegory)
\ No newline at end of file
+admin.site.register(ArticleCtegory)
+admin.site.register(Tag)
\ No newline at end of file
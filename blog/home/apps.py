@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class HomeConfig(AppConfig):
     name = 'home'
+
+    def ready(self):
+        # 注册信号处理函数
+        import home.signals
@@ -0,0 +1,77 @@
+'''
+文章分类缓存
+分类数据很少变化，使用 进程内缓存 + redis缓存 两级缓存，缓存key带版本号，
+分类保存或删除时通过信号更新版本号，各进程读到新版本号后自动重新加载
+'''
+import time
+
+from django.core.cache import cache
+
+from home.models import ArticleCtegory
+
+# 分类缓存的版本号
+VERSION_KEY = 'category:version'
+# 分类列表缓存，%s为版本号
+CATEGORIES_KEY = 'category:list:%s'
+# 分类列表缓存的有效期
+CATEGORIES_EXPIRES = 24 * 3600
+
+# 进程内缓存：版本号 -> 分类列表
+_local_cache = {}
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # 版本号丢失时使用当前时间，避免与之前用过的版本号重复
+        cache.add(VERSION_KEY, int(time.time()), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    '''
+    分类修改后更新版本号，使所有进程的分类缓存失效
+    '''
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, int(time.time()), timeout=None)
+
+
+def get_categories():
+    '''
+    1.读取当前版本号
+    2.读取进程内缓存
+    3.进程内没有时读取redis缓存
+    4.redis中也没有时查询数据库并写入缓存
+    '''
+    global _local_cache
+    # 1.读取当前版本号
+    version = get_version()
+    # 2.读取进程内缓存
+    categories = _local_cache.get(version)
+    if categories is None:
+        # 3.读取redis缓存
+        categories = cache.get(CATEGORIES_KEY % version)
+        if categories is None:
+            # 4.查询数据库并写入缓存
+            categories = list(ArticleCtegory.objects.all())
+            cache.set(CATEGORIES_KEY % version, categories, CATEGORIES_EXPIRES)
+        # 只保留当前版本的分类
+        _local_cache = {version: categories}
+    return categories
+
+
+def get_category(category_id):
+    '''
+    根据id从缓存中获取分类，分类不存在时返回None
+    '''
+    try:
+        category_id = int(category_id)
+    except (TypeError, ValueError):
+        return None
+    for category in get_categories():
+        if category.id == category_id:
+            return category
+    return None
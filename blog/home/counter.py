@@ -0,0 +1,65 @@
+'''
+文章浏览量计数
+每次访问只在redis中累加浏览量，由flush_article_views命令定期批量写回数据库，
+避免每次访问都重写tb_article整行数据，也不会在并发访问时丢失浏览量
+'''
+import logging
+
+from django_redis import get_redis_connection
+from redis.exceptions import ResponseError
+
+from home.models import Article
+from home.ranking import HOT_KEY
+from utils.db import case_update
+
+logger = logging.getLogger('')
+
+# 尚未写回数据库的浏览量增量，hash结构：文章id -> 增量
+VIEWS_KEY = 'article:views'
+# 正在写回数据库的浏览量增量
+VIEWS_FLUSHING_KEY = 'article:views:flushing'
+
+
+def incr_views(article_id, amount=1):
+    '''
+    累加文章浏览量，同时更新热门文章排行
+    返回该文章尚未写回数据库的浏览量
+    '''
+    redis_conn = get_redis_connection('default')
+    pipeline = redis_conn.pipeline()
+    pipeline.hincrby(VIEWS_KEY, article_id, amount)
+    pipeline.zincrby(HOT_KEY, amount, article_id)
+    pending, _ = pipeline.execute()
+    return pending
+
+
+def flush_views(batch_size=500):
+    '''
+    1.将增量hash改名为临时key，之后的访问会累加到新的hash中
+    2.读取临时key中的全部增量
+    3.每批文章用一条UPDATE ... CASE语句写回数据库
+    4.每批写回成功后从临时key中删除这批文章
+    返回写回的文章数量
+    '''
+    redis_conn = get_redis_connection('default')
+    # 1.将增量hash改名为临时key
+    # 若上一次写回中途失败，临时key仍然存在，则先把它写回
+    if not redis_conn.exists(VIEWS_FLUSHING_KEY):
+        try:
+            redis_conn.rename(VIEWS_KEY, VIEWS_FLUSHING_KEY)
+        except ResponseError:
+            # 没有需要写回的浏览量
+            return 0
+    # 2.读取临时key中的全部增量
+    increments = {int(article_id): int(amount)
+                  for article_id, amount in redis_conn.hgetall(VIEWS_FLUSHING_KEY).items()}
+    article_ids = sorted(increments)
+    # 3.分批写回数据库
+    for start in range(0, len(article_ids), batch_size):
+        batch = article_ids[start:start + batch_size]
+        case_update(Article, 'total_views', {article_id: increments[article_id] for article_id in batch},
+                    increment=True)
+        # 4.删除已写回的文章
+        redis_conn.hdel(VIEWS_FLUSHING_KEY, *batch)
+    logger.info('flushed views of %d articles' % len(article_ids))
+    return len(article_ids)
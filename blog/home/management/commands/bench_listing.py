@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from home.models import Article, ArticleCtegory
+
+
+class Command(BaseCommand):
+    help = '对比文章列表查询加载全部字段与只加载列表字段时的传输字节数和查询耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--category', type=int,
+                            help='查询的分类id，不传则使用第一个分类')
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument('--pages', type=int, default=50,
+                            help='依次查询的页数')
+
+    def handle(self, *args, **options):
+        category = ArticleCtegory.objects.get(id=options['category']) if options['category'] else \
+            ArticleCtegory.objects.order_by('id').first()
+        self.stdout.write('分类：%s，文章数量：%d' % (category, Article.objects.filter(category=category).count()))
+        querysets = [
+            ('全部字段', Article.objects.filter(category=category)),
+            ('listing', Article.objects.listing().filter(category=category)),
+        ]
+        for name, queryset in querysets:
+            total_bytes, total_time = self.measure(queryset, options['page_size'], options['pages'])
+            self.stdout.write('%-10s 传输%.1fKB  查询耗时%.2fms/页' % (
+                name, total_bytes / 1024, total_time * 1000 / options['pages']))
+
+    @staticmethod
+    def measure(queryset, page_size, pages):
+        '''
+        执行与分页器相同的LIMIT/OFFSET查询，统计返回数据的字节数和耗时
+        '''
+        total_bytes = 0
+        total_time = 0
+        with connection.cursor() as cursor:
+            for page in range(pages):
+                sql, params = queryset[page * page_size:(page + 1) * page_size].query.sql_with_params()
+                start = time.perf_counter()
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+                total_time += time.perf_counter() - start
+                total_bytes += sum(len(str(value).encode()) for row in rows for value in row if value is not None)
+        return total_bytes, total_time
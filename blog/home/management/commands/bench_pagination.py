@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+
+from home.models import Article, ArticleCtegory
+from utils.paginator import CursorPaginator
+
+
+class Command(BaseCommand):
+    help = '对比页码分页与游标分页在第一页和深页码时的查询耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--category', type=int,
+                            help='查询的分类id，不传则使用第一个分类')
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument('--page', type=int, default=5000,
+                            help='对比的深页码')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='每种情况重复查询的次数')
+
+    def handle(self, *args, **options):
+        category = ArticleCtegory.objects.get(id=options['category']) if options['category'] else \
+            ArticleCtegory.objects.order_by('id').first()
+        articles = Article.objects.listing().filter(category=category)
+        page_size = options['page_size']
+        # 深页码的游标：取上一页最后一条数据（只用于准备游标，不计入耗时）
+        last = articles.order_by('-created', '-id')[(options['page'] - 1) * page_size - 1]
+        deep_cursor = CursorPaginator.encode_cursor(CursorPaginator.NEXT, last)
+
+        for page_num, cursor in ((1, ''), (options['page'], deep_cursor)):
+            page_time = self.measure(options['repeat'],
+                                     lambda: list(Paginator(articles, page_size).page(page_num)))
+            cursor_time = self.measure(options['repeat'],
+                                       lambda: list(CursorPaginator(articles, page_size).page(cursor)))
+            self.stdout.write('第%d页  页码分页%.2fms  游标分页%.2fms' % (page_num, page_time, cursor_time))
+
+    @staticmethod
+    def measure(repeat, func):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - start) * 1000 / repeat
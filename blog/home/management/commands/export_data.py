@@ -0,0 +1,37 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from home import transfer
+
+
+class Command(BaseCommand):
+    help = '把用户、分类、文章、评论分别导出为jsonl或csv文件，按主键分批读取，内存占用不随数据量增长'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='导出文件保存的目录')
+        parser.add_argument('--format', choices=transfer.FORMATS, default='jsonl',
+                            help='文件格式')
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='每次从数据库读取的行数')
+        parser.add_argument('--only', nargs='+', choices=[name for name, _ in transfer.MODELS],
+                            help='只导出指定的数据')
+
+    def handle(self, *args, **options):
+        os.makedirs(options['directory'], exist_ok=True)
+        start = time.time()
+        total = 0
+        for name, model in transfer.MODELS:
+            if options['only'] and name not in options['only']:
+                continue
+            path = transfer.get_path(options['directory'], name, options['format'])
+            begin = time.time()
+            count = transfer.export_model(model, path, options['format'], options['batch_size'])
+            seconds = time.time() - begin
+            total += count
+            self.stdout.write('%s：%d行，耗时%.1f秒，%.0f行/秒，文件%.1fMB' % (
+                path, count, seconds, count / seconds if seconds else 0, os.path.getsize(path) / 1024 / 1024))
+        seconds = time.time() - start
+        self.stdout.write('共导出%d行，耗时%.1f秒，%.0f行/秒，内存峰值%.1fMB' % (
+            total, seconds, total / seconds if seconds else 0, transfer.peak_rss()[0]))
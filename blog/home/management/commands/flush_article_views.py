@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from home.counter import flush_views
+
+
+class Command(BaseCommand):
+    help = '将redis中累加的文章浏览量批量写回数据库'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='每条UPDATE语句更新的文章数量')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='循环写回的间隔秒数，为0时只写回一次')
+
+    def handle(self, *args, **options):
+        while True:
+            count = flush_views(batch_size=options['batch_size'])
+            self.stdout.write('已写回%d篇文章的浏览量' % count)
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from home import transfer
+
+
+class Command(BaseCommand):
+    help = '导入export_data导出的文件，分批bulk_create，文章和评论可以用多个进程并行写入'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='导出文件所在的目录')
+        parser.add_argument('--format', choices=transfer.FORMATS, default='jsonl',
+                            help='文件格式')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='每次bulk_create写入的行数')
+        parser.add_argument('--workers', type=int, default=0,
+                            help='并行写入文章和评论的进程数，0表示在当前进程中写入')
+
+    def handle(self, *args, **options):
+        '''
+        1.按users、categories、articles、comments的顺序导入存在的文件
+        2.统计标签的文章数量，使缓存失效
+        3.输出每种数据的写入速度和内存占用峰值
+        '''
+        importer = transfer.Importer(options['directory'], options['format'],
+                                     options['batch_size'], options['workers'])
+        files = importer.available()
+        if not files:
+            raise CommandError('目录中没有%s格式的导出文件' % options['format'])
+        start = time.time()
+        total = 0
+        # 1.按顺序导入
+        for name, _ in files:
+            begin = time.time()
+            skipped = importer.skipped
+            try:
+                count = importer.import_file(name)
+            except transfer.TransferError as e:
+                raise CommandError(e)
+            seconds = time.time() - begin
+            total += count
+            self.stdout.write('%s：%d行，跳过%d行，耗时%.1f秒，%.0f行/秒' % (
+                name, count, importer.skipped - skipped, seconds, count / seconds if seconds else 0))
+        # 2.统计标签的文章数量，使缓存失效
+        importer.finish()
+        # 3.输出速度和内存占用
+        seconds = time.time() - start
+        rss, worker_rss = transfer.peak_rss()
+        self.stdout.write('共导入%d行，跳过%d行，耗时%.1f秒，%.0f行/秒，内存峰值%.1fMB，工作进程内存峰值%.1fMB' % (
+            total, importer.skipped, seconds, total / seconds if seconds else 0, rss, worker_rss))
+        if importer.article_offset is not None:
+            self.stdout.write('文章已导入，请运行 rebuild_search_index 和 rebuild_hot_articles 更新搜索索引和热门文章')
@@ -0,0 +1,285 @@
+import datetime
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django_redis import get_redis_connection
+
+from home.models import Article, ArticleCtegory, Comment
+from libs.yuntongxun.stub import StubCCP
+from users import verify_codes
+from users.models import User
+from users.sms_queue import LOAD_TEST_PREFIX, QUEUE_KEY, SmsWorker, clear_queue
+
+# 场景名 -> 说明，按执行顺序排列
+SCENARIOS = {
+    'index': '未登录访问首页（页面缓存）',
+    'index_auth': '已登录访问首页',
+    'detail_get': '文章详情',
+    'detail_post': '发表评论',
+    'login': '登录',
+    'imagecode': '图片验证码',
+    'smscode': '短信验证码（放入队列，由模拟网关发送）',
+}
+
+
+def percentile(values, p):
+    '''
+    已排序数据的百分位数（最近秩法）
+    '''
+    if not values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(values)))
+    return values[min(rank, len(values)) - 1]
+
+
+def git_commit():
+    '''
+    返回 (当前提交, 工作区是否有未提交的修改)，不在git仓库中时返回 (None, None)
+    '''
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=cwd, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=cwd,
+                               capture_output=True, text=True, check=True).stdout.strip() != ''
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+class Command(BaseCommand):
+    help = ('在当前进程中并发请求主要页面和接口，统计p50/p95/p99耗时、吞吐量和每个请求的查询次数，'
+            '结果保存为json以便在不同提交之间对比。压测期间关闭限流，短信放入单独的队列，由模拟网关发送')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS),
+                            help='执行的场景')
+        parser.add_argument('--requests', type=int, default=500,
+                            help='每个场景的请求数')
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='并发的线程数')
+        parser.add_argument('--warmup', type=int, default=20,
+                            help='每个场景正式计时前的预热请求数')
+        parser.add_argument('--password', default='password123',
+                            help='seed_data生成的用户的密码')
+        parser.add_argument('--seed', type=int, default=1,
+                            help='随机数种子')
+        parser.add_argument('--output', default='loadtest-results',
+                            help='结果保存的目录或json文件路径')
+        parser.add_argument('--compare',
+                            help='与之前保存的结果对比')
+
+    def handle(self, *args, **options):
+        '''
+        1.读取seed_data生成的用户、分类和文章
+        2.关闭限流，短信放入单独的队列，网关替换为模拟网关，逐个场景并发请求
+        3.发送短信验证码场景放入队列的短信
+        4.输出并保存结果，与之前的结果对比
+        '''
+        # 1.读取压测数据
+        self.rng = random.Random(options['seed'])
+        self.password = options['password']
+        self.users = list(User.objects.filter(mobile__startswith='138').order_by('id')
+                          .values_list('id', 'mobile')[:1000])
+        self.category_ids = list(ArticleCtegory.objects.values_list('id', flat=True))
+        self.article_ids = list(Article.objects.order_by('-id').values_list('id', flat=True)[:10000])
+        if not self.users or not self.article_ids:
+            raise CommandError('没有压测数据，请先运行 seed_data')
+        if 'smscode' in options['scenarios'] and get_redis_connection('default').llen(QUEUE_KEY % LOAD_TEST_PREFIX):
+            raise CommandError('压测短信队列中已有任务，可能有其他压测正在进行')
+        # 请求序号用于生成不重复的uuid和手机号，从当前时间开始，连续运行时不会重复
+        self.sequence = int(time.time()) % 100000 * 1000
+        self.lock = threading.Lock()
+        # 2.逐个场景并发请求
+        results = {}
+        with override_settings(RATELIMIT_ENABLE=False, DEBUG=False, SMS_QUEUE_PREFIX=LOAD_TEST_PREFIX,
+                               SMS_GATEWAY='libs.yuntongxun.stub.StubCCP'):
+            for name in options['scenarios']:
+                self.run_scenario(name, options['warmup'], options['concurrency'])
+                results[name] = self.run_scenario(name, options['requests'], options['concurrency'])
+                self.print_result(name, results[name])
+            # 3.发送放入队列的短信
+            if 'smscode' in options['scenarios']:
+                results['sms_delivery'] = self.deliver_sms(options['concurrency'])
+                self.stdout.write('模拟网关发送短信%(sent)d条，失败%(failed)d条，%(throughput).1f条/秒' % results['sms_delivery'])
+        # 4.输出并保存结果
+        commit, dirty = git_commit()
+        report = {
+            'commit': commit,
+            'dirty': dirty,
+            'time': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'options': {key: options[key] for key in ('requests', 'concurrency', 'warmup', 'seed')},
+            'data': {
+                'users': User.objects.count(),
+                'categories': len(self.category_ids),
+                'articles': Article.objects.count(),
+                'comments': Comment.objects.count(),
+            },
+            'results': results,
+        }
+        path = self.save(report, options['output'])
+        self.stdout.write('结果已保存到 %s' % path)
+        if options['compare']:
+            self.compare(report, options['compare'])
+
+    def run_scenario(self, name, count, concurrency):
+        '''
+        concurrency个线程各自使用一个Client，共同发送count个请求，
+        记录每个请求的耗时和查询次数，吞吐量按全部请求的总耗时计算
+        '''
+        latencies = []
+        queries = []
+        errors = []
+        remaining = [count]
+
+        def worker():
+            client = self.make_client(name)
+            try:
+                while True:
+                    with self.lock:
+                        if remaining[0] <= 0:
+                            return
+                        remaining[0] -= 1
+                        self.sequence += 1
+                        sequence = self.sequence
+                    method, path, data, expected = self.make_request(name, sequence)
+                    with CaptureQueriesContext(connection) as context:
+                        begin = time.perf_counter()
+                        response = getattr(client, method)(path, data)
+                        elapsed = time.perf_counter() - begin
+                    with self.lock:
+                        latencies.append(elapsed)
+                        queries.append(len(context.captured_queries))
+                        if not expected(response):
+                            errors.append(response.status_code)
+            finally:
+                connection.close()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [executor.submit(worker) for _ in range(concurrency)]:
+                future.result()
+        wall = time.perf_counter() - start
+        latencies.sort()
+        return {
+            'requests': len(latencies),
+            'errors': len(errors),
+            'throughput': len(latencies) / wall if wall else 0,
+            'mean_ms': sum(latencies) * 1000 / len(latencies) if latencies else 0,
+            'p50_ms': percentile(latencies, 50) * 1000 if latencies else 0,
+            'p95_ms': percentile(latencies, 95) * 1000 if latencies else 0,
+            'p99_ms': percentile(latencies, 99) * 1000 if latencies else 0,
+            'max_ms': latencies[-1] * 1000 if latencies else 0,
+            'queries_per_request': sum(queries) / len(queries) if queries else 0,
+            'max_queries': max(queries) if queries else 0,
+        }
+
+    def make_client(self, name):
+        client = Client()
+        if name in ('index_auth', 'detail_get', 'detail_post'):
+            # 已登录的场景直接写入session，不计入登录的耗时
+            with self.lock:
+                user_id = self.rng.choice(self.users)[0]
+            client.force_login(User.objects.get(id=user_id))
+        return client
+
+    def make_request(self, name, sequence):
+        '''
+        返回 (请求方法, 路径, 参数, 判断响应是否正常的函数)
+        '''
+        with self.lock:
+            category_id = self.rng.choice(self.category_ids)
+            page_num = self.rng.randint(1, 5)
+            article_id = self.rng.choice(self.article_ids)
+            mobile = self.rng.choice(self.users)[1]
+        ok = lambda response: response.status_code == 200
+        redirect = lambda response: response.status_code == 302
+        if name in ('index', 'index_auth'):
+            # 分类中文章不足5页时返回404，也算正常响应
+            return 'get', '/', {'cat_id': category_id, 'page_num': page_num}, \
+                lambda response: response.status_code in (200, 404)
+        if name == 'detail_get':
+            return 'get', '/detail/', {'id': article_id}, ok
+        if name == 'detail_post':
+            return 'post', '/detail/', {'id': article_id, 'content': '<p>压测评论%d</p>' % sequence}, redirect
+        if name == 'login':
+            return 'post', '/login/', {'mobile': mobile, 'password': self.password}, redirect
+        if name == 'imagecode':
+            return 'get', '/imagecode/', {'uuid': 'loadtest-image-%d' % sequence}, ok
+        # 每个请求使用不同的手机号，不会因60秒内重复发送被拒绝；图片验证码预先写入redis
+        # 序号超过8位时取后8位，手机号始终是11位
+        uuid = 'loadtest-sms-%d' % sequence
+        verify_codes.save_image_code(uuid, 'abcd')
+        mobile = '199%08d' % (sequence % 10 ** 8)
+        return 'get', '/smscode/', {'mobile': mobile, 'image_code': 'abcd', 'uuid': uuid}, \
+            lambda response: response.status_code == 200 and response.json()['code'] == '0'
+
+    @staticmethod
+    def deliver_sms(concurrency):
+        '''
+        用模拟网关发送短信验证码场景放入队列的短信，统计发送速度
+        队列使用LOAD_TEST_PREFIX，只包含压测产生的短信
+        '''
+        gateway = StubCCP(latency=0)
+        worker = SmsWorker(gateway, concurrency=concurrency)
+        start = time.perf_counter()
+        worker.run(until_empty=True)
+        elapsed = time.perf_counter() - start
+        # 清理压测产生的图片验证码和短信队列
+        redis_conn = get_redis_connection('default')
+        for key in redis_conn.scan_iter('img:loadtest-*', count=1000):
+            redis_conn.delete(key)
+        clear_queue(LOAD_TEST_PREFIX)
+        return {'sent': gateway.sent, 'failed': gateway.failed,
+                'throughput': gateway.sent / elapsed if elapsed else 0}
+
+    def print_result(self, name, result):
+        self.stdout.write('%-12s %6d次 错误%d  %8.1f次/秒  p50 %7.2fms  p95 %7.2fms  p99 %7.2fms  查询%.1f次/请求  %s' % (
+            name, result['requests'], result['errors'], result['throughput'], result['p50_ms'],
+            result['p95_ms'], result['p99_ms'], result['queries_per_request'], SCENARIOS[name]))
+
+    @staticmethod
+    def save(report, output):
+        if output.endswith('.json'):
+            path = output
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        else:
+            os.makedirs(output, exist_ok=True)
+            path = os.path.join(output, '%s-%s.json' % (
+                datetime.datetime.now().strftime('%Y%m%d-%H%M%S'), (report['commit'] or 'nogit')[:10]))
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return path
+
+    def compare(self, report, path):
+        with open(path, encoding='utf-8') as f:
+            previous = json.load(f)
+        self.stdout.write('与 %s（提交%s）对比：' % (path, (previous.get('commit') or '未知')[:10]))
+        for name, result in report['results'].items():
+            old = previous.get('results', {}).get(name)
+            if not old or 'p50_ms' not in result:
+                continue
+            self.stdout.write('%-12s 吞吐量%+6.1f%%  p50 %+6.1f%%  p95 %+6.1f%%  p99 %+6.1f%%  查询%+.1f次/请求' % (
+                name, self.change(old['throughput'], result['throughput']),
+                self.change(old['p50_ms'], result['p50_ms']), self.change(old['p95_ms'], result['p95_ms']),
+                self.change(old['p99_ms'], result['p99_ms']),
+                result['queries_per_request'] - old['queries_per_request']))
+
+    @staticmethod
+    def change(old, new):
+        return (new - old) * 100 / old if old else 0
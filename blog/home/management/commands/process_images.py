@@ -0,0 +1,80 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from home import page_cache
+from home.models import Article
+from users import user_cache
+from users.models import User
+from utils import images
+
+
+class Command(BaseCommand):
+    help = '为已有的文章标题图和用户头像生成缩略图，并统计首页标题图的传输字节数变化'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4,
+                            help='同时处理的图片数量')
+        parser.add_argument('--force', action='store_true',
+                            help='已有缩略图的图片也重新生成')
+
+    def handle(self, *args, **options):
+        '''
+        1.找出需要生成缩略图的图片，多行使用同一个图片文件时只生成一次
+        2.用线程池生成缩略图
+        3.批量保存缩略图路径，并使首页缓存和用户缓存失效
+        '''
+        targets = [
+            (Article, images.ARTICLE_WIDTHS, self.article_saved),
+            (User, images.AVATAR_WIDTHS, self.user_saved),
+        ]
+        for model, widths, saved in targets:
+            # 1.找出需要生成缩略图的图片
+            queryset = model.objects.exclude(avatar='')
+            if not options['force']:
+                queryset = queryset.filter(avatar_variants='')
+            names = sorted(set(queryset.values_list('avatar', flat=True)))
+            if not names:
+                continue
+            # 2.用线程池生成缩略图
+            start = time.time()
+            with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+                results = list(executor.map(lambda name: self.make_variants(name, widths), names))
+            # 3.批量保存缩略图路径
+            original_bytes = variant_bytes = 0
+            for name, variants in zip(names, results):
+                if variants is None:
+                    continue
+                rows = model.objects.filter(avatar=name)
+                ids = list(rows.values_list('id', flat=True))
+                stale = set(rows.exclude(avatar_variants='').values_list('avatar_variants', flat=True))
+                rows.update(avatar_variants=json.dumps(variants))
+                saved(ids)
+                for variants_json in stale:
+                    images.delete_variants(variants_json)
+                original_bytes += default_storage.size(name)
+                smallest = variants[min(variants, key=int)]
+                variant_bytes += default_storage.size(smallest['webp'])
+            self.stdout.write('%s：%d个图片，耗时%.1f秒，原图共%.1fKB，最小的WebP缩略图共%.1fKB' % (
+                model._meta.verbose_name, len(names), time.time() - start,
+                original_bytes / 1024, variant_bytes / 1024))
+
+    def make_variants(self, name, widths):
+        try:
+            return images.make_variants(name, widths)
+        except Exception as e:
+            self.stderr.write('生成缩略图失败 %s: %s' % (name, e))
+            return None
+
+    @staticmethod
+    def article_saved(ids):
+        for category_id in set(Article.objects.filter(id__in=ids).values_list('category_id', flat=True)):
+            page_cache.bump_generation(category_id)
+
+    @staticmethod
+    def user_saved(ids):
+        for id in ids:
+            user_cache.invalidate_user(id)
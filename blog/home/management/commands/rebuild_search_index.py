@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from home import search
+
+
+class Command(BaseCommand):
+    help = '根据tb_article重建全部文章的搜索索引，重建期间原有的索引照常可用'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='每批读取和写入的文章数量')
+
+    def handle(self, *args, **options):
+        start = time.time()
+        count = search.rebuild(batch_size=options['batch_size'])
+        self.stdout.write('已为%d篇文章建立索引，耗时%.1f秒' % (count, time.time() - start))
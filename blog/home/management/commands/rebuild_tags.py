@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from home import tags
+
+
+class Command(BaseCommand):
+    help = '根据文章的tags字段重建文章与标签的关联，并重新统计标签的文章数量'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='每批读取和写入的文章数量')
+
+    def handle(self, *args, **options):
+        start = time.time()
+        count = tags.rebuild(batch_size=options['batch_size'])
+        self.stdout.write('已为%d篇文章重建标签，耗时%.1f秒' % (count, time.time() - start))
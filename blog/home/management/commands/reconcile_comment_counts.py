@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from home.models import Article, Comment
+from utils.db import case_update
+
+
+class Command(BaseCommand):
+    help = '根据tb_comment分批重新统计文章评论量，修复tb_article.comment_count的偏差'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='每批统计的文章数量')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='只统计有偏差的文章数量，不修改数据')
+
+    def handle(self, *args, **options):
+        '''
+        1.按id顺序分批读取文章的评论量
+        2.统计这批文章在tb_comment中的实际评论数量
+        3.有偏差的文章用一条UPDATE ... CASE语句修正
+        '''
+        last_id = 0
+        checked = fixed = 0
+        while True:
+            # 1.按id顺序分批读取文章的评论量
+            current = list(Article.objects.filter(id__gt=last_id).order_by('id')
+                           .values_list('id', 'comment_count')[:options['batch_size']])
+            if not current:
+                break
+            last_id = current[-1][0]
+            # 2.统计实际评论数量
+            counts = dict(Comment.objects.filter(article_id__in=[id for id, _ in current]).order_by()
+                          .values_list('article_id').annotate(Count('id')))
+            # 3.修正有偏差的文章
+            drift = {id: counts.get(id, 0) for id, comment_count in current if comment_count != counts.get(id, 0)}
+            if drift and not options['dry_run']:
+                case_update(Article, 'comment_count', drift)
+            checked += len(current)
+            fixed += len(drift)
+        self.stdout.write('共检查%d篇文章，%d篇评论量有偏差%s' % (
+            checked, fixed, '' if options['dry_run'] else '，已修正'))
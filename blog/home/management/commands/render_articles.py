@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from home import render
+
+
+class Command(BaseCommand):
+    help = '为已有的文章生成预渲染的正文、字数和阅读时间'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help='每批读取和写入的文章数量')
+        parser.add_argument('--force', action='store_true',
+                            help='已经预渲染的文章也重新生成')
+
+    def handle(self, *args, **options):
+        start = time.time()
+        count = render.render_all(batch_size=options['batch_size'], force=options['force'])
+        seconds = time.time() - start
+        self.stdout.write('已预渲染%d篇文章，耗时%.1f秒，平均每篇%.2f毫秒' % (
+            count, seconds, seconds * 1000 / count if count else 0))
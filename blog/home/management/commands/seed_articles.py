@@ -0,0 +1,64 @@
+import random
+import string
+
+from django.core.management.base import BaseCommand, CommandError
+
+from home import tags
+from home.models import Article, ArticleCtegory
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = '批量生成测试文章数据，用于性能测试'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000,
+                            help='生成的文章数量')
+        parser.add_argument('--content-size', type=int, default=8 * 1024,
+                            help='每篇文章正文的字节数')
+        parser.add_argument('--category', type=int,
+                            help='文章所属分类id，不传则写入第一个分类')
+        parser.add_argument('--mobile', default='13800000000',
+                            help='文章作者的手机号，不存在时自动创建')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='每次bulk_create写入的文章数量')
+
+    def handle(self, *args, **options):
+        # 准备分类和作者
+        if options['category']:
+            try:
+                category = ArticleCtegory.objects.get(id=options['category'])
+            except ArticleCtegory.DoesNotExist:
+                raise CommandError('没有此分类')
+        else:
+            category = ArticleCtegory.objects.order_by('id').first() or \
+                ArticleCtegory.objects.create(title='性能测试')
+        user = User.objects.filter(mobile=options['mobile']).first() or \
+            User.objects.create_user(username=options['mobile'], mobile=options['mobile'])
+        # 正文使用若干段随机文本，避免每篇文章内容完全相同
+        paragraphs = [''.join(random.choice(string.ascii_letters + ' ') for _ in range(500))
+                      for _ in range(20)]
+        paragraph_count = max(options['content_size'] // 512, 1)
+
+        count = options['count']
+        batch_size = options['batch_size']
+        created = 0
+        while created < count:
+            articles = []
+            for i in range(created, min(created + batch_size, count)):
+                content = ''.join('<p>%s</p>' % random.choice(paragraphs) for _ in range(paragraph_count))
+                articles.append(Article(
+                    auther=user,
+                    avatar='article/20220119/screenshot0000.jpg',
+                    title='测试文章%d' % i,
+                    category=category,
+                    tags='测试',
+                    sumary=content[3:200],
+                    content=content,
+                    total_views=random.randint(0, 10000),
+                ))
+            Article.objects.bulk_create(articles)
+            created += len(articles)
+            self.stdout.write('已生成%d/%d篇文章' % (created, count))
+        # bulk_create不发送post_save信号，重建标签关联和文章数量
+        tags.rebuild()
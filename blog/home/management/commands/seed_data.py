@@ -0,0 +1,183 @@
+import datetime
+import math
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.utils import timezone
+
+from home import categories, page_cache, ranking, search, tags
+from home.models import Article, ArticleCtegory, Comment
+from home.render import render_article
+from users.models import User
+from utils import hashers
+
+CATEGORY_TITLES = ['Python', 'Django', '数据库', '前端', '运维', '算法', '随笔', '读书']
+TAG_NAMES = ['python', 'django', 'mysql', 'redis', 'linux', 'nginx', 'vue', '缓存', '性能', '并发',
+             '索引', '部署', '测试', '算法', '网络', '安全', '设计', '架构']
+# 生成中文段落使用的常用字
+HANZI = ('的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说'
+         '产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点'
+         '从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原'
+         '又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革')
+WORDS = ['request', 'cache', 'query', 'index', 'server', 'thread', 'process', 'latency', 'memory', 'python',
+         'django', 'redis', 'mysql', 'template', 'session', 'worker', 'queue', 'batch', 'stream', 'page']
+CODE_SAMPLE = '''def handle(request):
+    articles = Article.objects.listing().filter(category=category)
+    for article in articles[:10]:
+        print(article.id, article.title)
+    return render(request, 'index.html', {'articles': articles})
+'''
+
+
+class Command(BaseCommand):
+    help = '生成压测用的用户、分类、文章和评论，正文长度按对数正态分布，结果可以用--seed复现'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100,
+                            help='用户数量，手机号为138开头的连续号码，已存在的用户直接使用')
+        parser.add_argument('--categories', type=int, default=5,
+                            help='分类数量，标题相同的分类直接使用')
+        parser.add_argument('--articles', type=int, default=1000,
+                            help='生成的文章数量')
+        parser.add_argument('--comments', type=float, default=5,
+                            help='每篇文章的平均评论数')
+        parser.add_argument('--content-size', type=int, default=4 * 1024,
+                            help='正文长度的中位数（字节）')
+        parser.add_argument('--password', default='password123',
+                            help='所有用户的密码')
+        parser.add_argument('--seed', type=int, default=1,
+                            help='随机数种子')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='每次bulk_create写入的行数')
+        parser.add_argument('--search-index', action='store_true',
+                            help='生成后重建搜索索引')
+
+    def handle(self, *args, **options):
+        '''
+        1.生成用户，所有用户使用同一个密码哈希，只计算一次
+        2.生成分类
+        3.生成文章，写入前预渲染正文，评论量按泊松分布预先确定
+        4.按文章的评论量生成评论
+        5.重建标签、热门文章，使缓存失效
+        '''
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        start = time.time()
+        # 1.生成用户
+        users = self.seed_users(options['users'], options['password'], batch_size)
+        # 2.生成分类
+        category_ids = self.seed_categories(options['categories'])
+        # 3.生成文章
+        max_id = Article.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+        now = timezone.now()
+        created = 0
+        while created < options['articles']:
+            articles = []
+            for i in range(created, min(created + batch_size, options['articles'])):
+                article = Article(
+                    auther_id=rng.choice(users),
+                    avatar='article/20220119/screenshot0000.jpg',
+                    title=self.sentence(rng, 6, 18),
+                    category_id=rng.choice(category_ids),
+                    tags=','.join(rng.sample(TAG_NAMES, rng.randint(1, 3)))[:20],
+                    sumary='',
+                    content=self.content(rng, options['content_size']),
+                    total_views=int(rng.paretovariate(1.2) * 10),
+                    comment_count=self.poisson(rng, options['comments']),
+                    created=now - datetime.timedelta(seconds=rng.randint(0, 365 * 24 * 3600)),
+                )
+                render_article(article)
+                articles.append(article)
+            Article.objects.bulk_create(articles)
+            created += len(articles)
+            self.stdout.write('已生成%d/%d篇文章' % (created, options['articles']))
+        # 4.生成评论
+        comments = self.seed_comments(rng, max_id, users, batch_size)
+        # 5.重建标签、热门文章，使缓存失效
+        tags.rebuild()
+        ranking.rebuild()
+        if options['search_index']:
+            search.rebuild()
+        categories.bump_version()
+        for category_id in category_ids:
+            page_cache.bump_generation(category_id)
+        self.stdout.write('共%d个用户，%d个分类，生成%d篇文章、%d条评论，耗时%.1f秒' % (
+            len(users), len(category_ids), created, comments, time.time() - start))
+
+    @staticmethod
+    def seed_users(count, password, batch_size):
+        encoded = hashers.make_password(password)
+        mobiles = ['138%08d' % i for i in range(count)]
+        existing = set(User.objects.filter(mobile__in=mobiles).values_list('mobile', flat=True))
+        User.objects.bulk_create([
+            User(username='bench%s' % mobile, mobile=mobile, password=encoded)
+            for mobile in mobiles if mobile not in existing
+        ], batch_size=batch_size)
+        return list(User.objects.filter(mobile__in=mobiles).values_list('id', flat=True))
+
+    @staticmethod
+    def seed_categories(count):
+        titles = [CATEGORY_TITLES[i] if i < len(CATEGORY_TITLES) else '分类%d' % i for i in range(count)]
+        existing = dict(ArticleCtegory.objects.filter(title__in=titles).values_list('title', 'id'))
+        for title in titles:
+            if title not in existing:
+                existing[title] = ArticleCtegory.objects.create(title=title).id
+        return [existing[title] for title in titles]
+
+    @staticmethod
+    def seed_comments(rng, max_id, users, batch_size):
+        '''
+        为id大于max_id的新文章按comment_count生成评论
+        '''
+        count = 0
+        last_id = max_id
+        while True:
+            rows = list(Article.objects.filter(id__gt=last_id).order_by('id')
+                        .values_list('id', 'comment_count')[:batch_size])
+            if not rows:
+                return count
+            last_id = rows[-1][0]
+            comments = [Comment(article_id=article_id, user_id=rng.choice(users),
+                                content='<p>%s</p>' % Command.sentence(rng, 10, 80))
+                        for article_id, comment_count in rows for _ in range(comment_count)]
+            Comment.objects.bulk_create(comments, batch_size=batch_size)
+            count += len(comments)
+
+    @staticmethod
+    def poisson(rng, mean):
+        # Knuth算法，平均数较小时足够快
+        limit, k, p = math.exp(-mean), 0, 1.0
+        while True:
+            p *= rng.random()
+            if p <= limit:
+                return k
+            k += 1
+
+    @staticmethod
+    def sentence(rng, min_length, max_length):
+        length = rng.randint(min_length, max_length)
+        return ''.join(rng.choice(HANZI) for _ in range(length))
+
+    @staticmethod
+    def content(rng, median_size):
+        '''
+        生成中英文混排的段落，偶尔带有标题和代码块，总长度按对数正态分布
+        '''
+        target = min(max(int(rng.lognormvariate(math.log(median_size), 0.6)), 200), 64 * median_size)
+        parts = []
+        size = 0
+        while size < target:
+            roll = rng.random()
+            if roll < 0.08:
+                part = '<h3>%s</h3>' % Command.sentence(rng, 4, 12)
+            elif roll < 0.13:
+                part = '<pre><code class="language-python">%s</code></pre>' % CODE_SAMPLE
+            else:
+                words = [Command.sentence(rng, 5, 30) if rng.random() < 0.7 else ' %s ' % rng.choice(WORDS)
+                         for _ in range(rng.randint(3, 12))]
+                part = '<p>%s。</p>' % ''.join(words)
+            parts.append(part)
+            size += len(part.encode())
+        return ''.join(parts)
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.28 on 2026-10-18 09:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0003_comment'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['category', 'created', 'id'], name='tb_article_cat_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['article', 'created', 'id'], name='tb_comment_art_created_idx'),
+        ),
+    ]
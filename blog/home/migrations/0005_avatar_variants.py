@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 10:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0004_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='avatar_variants',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 2.2.28 on 2026-10-18 10:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0005_avatar_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleTag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'tb_article_tag',
+            },
+        ),
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=20, unique=True)),
+                ('article_count', models.PositiveIntegerField(default=0)),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': '标签管理',
+                'verbose_name_plural': '标签管理',
+                'db_table': 'tb_tag',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['article_count'], name='tb_tag_count_idx'),
+        ),
+        migrations.AddField(
+            model_name='articletag',
+            name='article',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_links', to='home.Article'),
+        ),
+        migrations.AddField(
+            model_name='articletag',
+            name='tag',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='article_links', to='home.Tag'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='tag_set',
+            field=models.ManyToManyField(blank=True, related_name='articles', through='home.ArticleTag', to='home.Tag'),
+        ),
+        migrations.AddIndex(
+            model_name='articletag',
+            index=models.Index(fields=['tag', 'created', 'id'], name='tb_article_tag_created_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='articletag',
+            unique_together={('article', 'tag')},
+        ),
+    ]
@@ -0,0 +1,67 @@
+import re
+
+from django.db import migrations
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# 每批处理的文章数量
+BATCH_SIZE = 1000
+
+# 与home.tags中的拆分规则一致，迁移中不引用会继续修改的应用代码
+SEPARATOR_RE = re.compile(r'[\s,，;；、/|]+')
+
+
+def split_tags(text):
+    names = []
+    for name in SEPARATOR_RE.split((text or '').lower()):
+        name = name.strip()[:20]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def forwards(apps, schema_editor):
+    '''
+    1.按id分批读取文章的tags字段，拆分成标签
+    2.批量创建本批中新出现的标签
+    3.批量创建文章与标签的关联
+    4.全部处理完后统计每个标签的文章数量
+    '''
+    Article = apps.get_model('home', 'Article')
+    Tag = apps.get_model('home', 'Tag')
+    ArticleTag = apps.get_model('home', 'ArticleTag')
+    tag_ids = {}
+    last_id = 0
+    while True:
+        # 1.按id分批读取，不使用OFFSET
+        rows = list(Article.objects.filter(id__gt=last_id).order_by('id')
+                    .values_list('id', 'tags', 'created')[:BATCH_SIZE])
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        splitted = [(id, created, split_tags(tags)) for id, tags, created in rows]
+        # 2.批量创建新标签
+        names = {name for _, _, names in splitted for name in names if name not in tag_ids}
+        if names:
+            Tag.objects.bulk_create([Tag(name=name) for name in names], ignore_conflicts=True)
+            tag_ids.update(Tag.objects.filter(name__in=names).values_list('name', 'id'))
+        # 3.批量创建关联
+        ArticleTag.objects.bulk_create([
+            ArticleTag(article_id=id, tag_id=tag_ids[name], created=created)
+            for id, created, names in splitted for name in names
+        ], ignore_conflicts=True)
+    # 4.统计文章数量
+    counts = ArticleTag.objects.filter(tag=OuterRef('pk')).order_by().values('tag').annotate(
+        count=Count('*')).values('count')
+    Tag.objects.update(article_count=Coalesce(Subquery(counts, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0006_tags'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+    ]
@@ -23,6 +23,49 @@ class ArticleCtegory(models.Model):
         verbose_name_plural = verbose_name
 
 
+class Tag(models.Model):
+    '''
+    文章标签
+    由文章的tags字段拆分得到，文章保存时由home.tags维护标签与文章的关联和文章数量
+    '''
+    # 标签名
+    name = models.CharField(max_length=20, unique=True)
+    # 使用该标签的文章数量
+    article_count = models.PositiveIntegerField(default=0)
+    # 标签创建时间
+    created = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        db_table = 'tb_tag'
+        # 标签云按文章数量倒序查询
+        indexes = [
+            models.Index(fields=['article_count'], name='tb_tag_count_idx'),
+        ]
+        verbose_name = '标签管理'
+        verbose_name_plural = verbose_name
+
+
+class ArticleQuerySet(models.QuerySet):
+
+    # 文章列表需要的字段，不包含文章正文
+    LISTING_FIELDS = (
+        'id', 'avatar', 'avatar_variants', 'title', 'tags', 'sumary', 'total_views', 'comment_count',
+        'created', 'updated',
+        'auther__id', 'auther__username', 'auther__avatar',
+        'category__id', 'category__title',
+    )
+
+    def listing(self):
+        '''
+        文章列表使用的查询集
+        只查询列表需要的字段，不加载文章正文，同时关联查询作者和分类信息
+        '''
+        return self.select_related('auther', 'category').only(*self.LISTING_FIELDS)
+
+
 class Article(models.Model):
     '''
     作者
@@ -42,6 +85,8 @@ class Article(models.Model):
     auther = models.ForeignKey(User, on_delete=models.CASCADE)
     # 标题图
     avatar = models.ImageField(upload_to='article/%Y%m%d/', blank=True)
+    # 标题图的缩略图，json格式，由utils.images在后台生成
+    avatar_variants = models.TextField(blank=True, default='')
     # 标题
     title = models.CharField(max_length=20, blank=True)
     # 栏目分类
@@ -50,10 +95,18 @@ class Article(models.Model):
     category = models.ForeignKey(ArticleCtegory, null=True, blank=True, on_delete=models.CASCADE, related_name='article')
     # 标签
     tags = models.CharField(max_length=20, blank=True)
+    # 拆分后的标签
+    tag_set = models.ManyToManyField(Tag, through='ArticleTag', related_name='articles', blank=True)
     # 文章摘要
     sumary = models.CharField(max_length=200, null=False, blank=False)
     # 文章正文
     content = models.TextField()
+    # 过滤并高亮代码后的正文，保存时由home.render生成，详情页直接输出
+    content_html = models.TextField(blank=True, default='')
+    # 正文字数
+    word_count = models.PositiveIntegerField(default=0)
+    # 阅读时间（分钟）
+    reading_time = models.PositiveSmallIntegerField(default=0)
     # 文章浏览量
     total_views = models.PositiveIntegerField(default=0)
     # 文章评论量
@@ -63,11 +116,17 @@ class Article(models.Model):
     # 文章修改时间
     updated = models.DateTimeField(auto_now=True)
 
+    objects = ArticleQuerySet.as_manager()
+
     # 修改表名以及展示的配置信息
     class Meta:
         db_table = 'tb_article'
         # 排序方式
         ordering = ('-created',)
+        # 按分类查询并按时间分页时使用的联合索引
+        indexes = [
+            models.Index(fields=['category', 'created', 'id'], name='tb_article_cat_created_idx'),
+        ]
         verbose_name = '文章管理'
         verbose_name_plural = verbose_name
 
@@ -75,6 +134,25 @@ class Article(models.Model):
         return self.title
 
 
+class ArticleTag(models.Model):
+    '''
+    文章与标签的关联
+    冗余保存文章的创建时间，标签页按(tag, created, id)索引顺序读取，不需要对文章排序
+    '''
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='tag_links')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='article_links')
+    # 文章创建时间
+    created = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'tb_article_tag'
+        unique_together = ('article', 'tag')
+        # 按标签查询文章并按时间分页时使用的联合索引
+        indexes = [
+            models.Index(fields=['tag', 'created', 'id'], name='tb_article_tag_created_idx'),
+        ]
+
+
 class Comment(models.Model):
     '''
     评论内容
@@ -96,5 +174,9 @@ class Comment(models.Model):
 
     class Meta:
         db_table = 'tb_comment'
+        # 按文章查询评论并按时间分页时使用的联合索引
+        indexes = [
+            models.Index(fields=['article', 'created', 'id'], name='tb_comment_art_created_idx'),
+        ]
         verbose_name = '评论管理'
         verbose_name_plural = verbose_name
\ No newline at end of file
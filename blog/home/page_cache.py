@@ -0,0 +1,80 @@
+'''
+未登录用户的首页缓存
+首页内容只与分类、分页参数有关，渲染结果按这些参数缓存，
+同时记录生成页面时分类的代数，分类下的文章或评论变化时只增加该分类的代数。
+页面过期或代数变化后，只有获取到锁的一个请求重新生成页面，其余请求先返回旧页面
+'''
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.http import HttpResponse
+
+# 分类的代数，%s为分类id
+GENERATION_KEY = 'index:generation:%s'
+# 缓存的页面，%s为请求参数的摘要
+PAGE_KEY = 'index:page:%s'
+# 重新生成页面的锁
+LOCK_KEY = 'index:lock:%s'
+# 页面的有效期，超过后重新生成
+PAGE_FRESH_SECONDS = 60
+# 页面在缓存中的保存时间，在此期间可以作为旧页面返回
+PAGE_STALE_SECONDS = 24 * 3600
+# 锁的有效期，防止重新生成页面失败后一直持有锁
+LOCK_SECONDS = 10
+
+
+def get_generation(category_id):
+    return cache.get(GENERATION_KEY % category_id, 0)
+
+
+def bump_generation(category_id):
+    '''
+    分类下的文章或评论变化后增加分类的代数，使该分类的所有缓存页面失效
+    '''
+    if category_id is None:
+        return
+    try:
+        cache.incr(GENERATION_KEY % category_id)
+    except ValueError:
+        # 代数丢失时使用当前时间，避免与之前用过的代数重复
+        cache.set(GENERATION_KEY % category_id, int(time.time()), timeout=None)
+
+
+def cache_index_page(request, render):
+    '''
+    1.根据分类和分页参数读取缓存页面
+    2.页面未过期且代数与分类当前代数一致时直接返回
+    3.否则尝试获取重新生成页面的锁，获取到锁的请求重新生成页面并写入缓存
+    4.未获取到锁的请求在有旧页面时返回旧页面，没有旧页面时自己生成
+    '''
+    # 1.根据分类和分页参数读取缓存页面
+    category_id = request.GET.get('cat_id', 1)
+    params = '%s:%s:%s:%s' % (category_id,
+                              request.GET.get('page_num', 1),
+                              request.GET.get('page_size', 10),
+                              request.GET.get('cursor'))
+    digest = hashlib.md5(params.encode()).hexdigest()
+    generation = get_generation(category_id)
+    page = cache.get(PAGE_KEY % digest)
+    # 2.页面未过期且代数一致时直接返回
+    if page is not None and page['generation'] == generation and page['expires'] > time.time():
+        return HttpResponse(page['content'], content_type=page['content_type'])
+    # 3.获取到锁的请求重新生成页面
+    if cache.add(LOCK_KEY % digest, 1, LOCK_SECONDS):
+        try:
+            response = render(request)
+            if response.status_code == 200:
+                cache.set(PAGE_KEY % digest, {
+                    'generation': generation,
+                    'expires': time.time() + PAGE_FRESH_SECONDS,
+                    'content': response.content,
+                    'content_type': response['Content-Type'],
+                }, PAGE_STALE_SECONDS)
+            return response
+        finally:
+            cache.delete(LOCK_KEY % digest)
+    # 4.其他请求返回旧页面
+    if page is not None:
+        return HttpResponse(page['content'], content_type=page['content_type'])
+    return render(request)
@@ -0,0 +1,115 @@
+'''
+热门文章排行
+文章浏览量同时累加到redis的有序集合中，详情页侧边栏直接从有序集合中取浏览量最高的文章，
+不再对tb_article按total_views排序
+'''
+import json
+
+from django_redis import get_redis_connection
+
+from home.models import Article
+
+# 热门文章有序集合：文章id -> 浏览量
+HOT_KEY = 'article:hot'
+# 重建有序集合时使用的临时key
+HOT_REBUILD_KEY = 'article:hot:rebuild'
+# 文章摘要信息（标题、标题图）的缓存
+SUMMARY_KEY = 'article:summary:%s'
+# 文章摘要信息的缓存时间
+SUMMARY_EXPIRES = 24 * 3600
+
+
+def get_hot_articles(count=9):
+    '''
+    1.从有序集合中取浏览量最高的文章id
+    2.批量读取文章摘要缓存
+    3.缓存中没有的文章从数据库中查询并写入缓存
+    4.按排行顺序组织数据
+    '''
+    redis_conn = get_redis_connection('default')
+    # 1.从有序集合中取浏览量最高的文章id
+    ranking = [(int(article_id), int(views))
+               for article_id, views in redis_conn.zrevrange(HOT_KEY, 0, count - 1, withscores=True)]
+    if not ranking:
+        return []
+    # 2.批量读取文章摘要缓存
+    summaries = {}
+    for (article_id, _), summary in zip(ranking, redis_conn.mget([SUMMARY_KEY % article_id
+                                                                  for article_id, _ in ranking])):
+        if summary is not None:
+            summaries[article_id] = json.loads(summary)
+    # 3.缓存中没有的文章从数据库中查询并写入缓存
+    missing = [article_id for article_id, _ in ranking if article_id not in summaries]
+    if missing:
+        pipeline = redis_conn.pipeline()
+        for article in Article.objects.filter(id__in=missing).only('id', 'title', 'avatar'):
+            summary = {
+                'id': article.id,
+                'title': article.title,
+                'avatar': article.avatar.url if article.avatar else None,
+            }
+            summaries[article.id] = summary
+            pipeline.setex(SUMMARY_KEY % article.id, SUMMARY_EXPIRES, json.dumps(summary))
+        pipeline.execute()
+    # 4.按排行顺序组织数据，已删除的文章直接跳过
+    hot_articles = []
+    for article_id, views in ranking:
+        if article_id in summaries:
+            hot_articles.append(dict(summaries[article_id], views=views))
+    return hot_articles
+
+
+def remove_article(article_id):
+    '''
+    从排行中删除文章
+    '''
+    redis_conn = get_redis_connection('default')
+    pipeline = redis_conn.pipeline()
+    pipeline.zrem(HOT_KEY, article_id)
+    pipeline.delete(SUMMARY_KEY % article_id)
+    pipeline.execute()
+
+
+def clear_summary(article_id):
+    '''
+    文章标题或标题图修改后删除摘要缓存
+    '''
+    get_redis_connection('default').delete(SUMMARY_KEY % article_id)
+
+
+def rebuild(batch_size=1000):
+    '''
+    根据数据库中的浏览量重建有序集合
+    1.分批读取文章浏览量写入临时key
+    2.加上redis中尚未写回数据库的浏览量
+    3.用临时key原子替换有序集合
+    返回文章数量
+    '''
+    from home.counter import VIEWS_KEY, VIEWS_FLUSHING_KEY
+
+    redis_conn = get_redis_connection('default')
+    redis_conn.delete(HOT_REBUILD_KEY)
+    # 1.分批读取文章浏览量写入临时key
+    count = 0
+    mapping = {}
+    for article_id, total_views in Article.objects.order_by().values_list('id', 'total_views').iterator():
+        mapping[article_id] = total_views
+        if len(mapping) >= batch_size:
+            redis_conn.zadd(HOT_REBUILD_KEY, mapping)
+            count += len(mapping)
+            mapping = {}
+    if mapping:
+        redis_conn.zadd(HOT_REBUILD_KEY, mapping)
+        count += len(mapping)
+    if not count:
+        redis_conn.delete(HOT_KEY)
+        return 0
+    # 2.加上redis中尚未写回数据库的浏览量
+    pipeline = redis_conn.pipeline()
+    for key in (VIEWS_FLUSHING_KEY, VIEWS_KEY):
+        for article_id, amount in redis_conn.hgetall(key).items():
+            pipeline.zincrby(HOT_REBUILD_KEY, int(amount), article_id)
+    pipeline.execute()
+    # 3.用临时key原子替换有序集合
+    redis_conn.rename(HOT_REBUILD_KEY, HOT_KEY)
+    return count
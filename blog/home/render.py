@@ -0,0 +1,42 @@
+'''
+文章正文的预渲染
+编辑器提交的正文在保存时处理一次：按白名单过滤html、服务端高亮代码、统计字数和阅读时间，
+结果保存在content_html等字段中，详情页直接输出，不再每次访问都处理正文
+'''
+from home.models import Article
+from utils import html
+
+
+def render_article(article):
+    '''
+    根据article.content填充content_html、word_count、reading_time，摘要为空时用正文开头作为摘要
+    '''
+    content_html, text = html.sanitize(article.content)
+    article.content_html = content_html
+    article.word_count = html.count_words(text)
+    article.reading_time = html.reading_minutes(article.word_count)
+    if not article.sumary:
+        article.sumary = html.excerpt(text, Article._meta.get_field('sumary').max_length)
+
+
+def render_all(batch_size=200, force=False):
+    '''
+    为还没有预渲染的文章生成content_html，force为True时全部重新生成
+    逐批读取并用bulk_update写回，不触发post_save信号，返回处理的文章数量
+    '''
+    fields = ['content_html', 'word_count', 'reading_time', 'sumary']
+    queryset = Article.objects.order_by('id').only('id', 'content', 'sumary')
+    if not force:
+        queryset = queryset.filter(content_html='')
+    count = 0
+    last_id = 0
+    while True:
+        articles = list(queryset.filter(id__gt=last_id)[:batch_size])
+        if not articles:
+            break
+        last_id = articles[-1].id
+        for article in articles:
+            render_article(article)
+        Article.objects.bulk_update(articles, fields)
+        count += len(articles)
+    return count
@@ -0,0 +1,283 @@
+'''
+文章全文搜索
+在redis中维护倒排索引，文章保存或删除时由home.signals增量更新，
+中文按相邻两个字切分（bigram），英文和数字按单词切分，
+标题、标签、摘要、正文按不同权重累加词频。
+倒排表是有序集合，分数是建立索引时按BM25算好的词权重（不含idf），
+查询时在一个Lua脚本中只读取每个词权重最高的一部分文章，乘以idf累加后排序，
+只有当前页的文章需要查询数据库
+'''
+import json
+import re
+from collections import Counter
+from html import unescape
+
+from django.utils import timezone
+from django.utils.html import strip_tags
+from django_redis import get_redis_connection
+
+from home.models import Article
+
+# 倒排表，有序集合：文章id -> 词权重，查询时按权重从高到低只读取前TERM_TOP_K篇
+TERM_KEY = 'search:postings:%s'
+# 每篇文章索引过的词及长度，更新或删除文章时据此清理倒排表
+DOC_KEY = 'search:doc:%s'
+# 索引的文章数量和总长度
+STATS_KEY = 'search:stats'
+# 重建索引时先写入加了这个前缀的临时key，写好后再替换
+REBUILD_PREFIX = 'search:rebuild:'
+
+# 建立索引的字段 -> 权重
+FIELD_WEIGHTS = {
+    'title': 3,
+    'tags': 2,
+    'sumary': 2,
+    'content': 1,
+}
+
+# BM25参数
+K1 = 1.2
+B = 0.75
+# 最多返回的结果数量
+MAX_RESULTS = 1000
+# 查询时每个词最多读取的文章数量，脚本的耗时与此成正比，不随文章数量增长
+TERM_TOP_K = MAX_RESULTS
+# 查询最多使用的词数，多出的词忽略
+MAX_TERMS = 8
+
+TOKEN_RE = re.compile(r'[一-鿿]+|[a-z0-9]+')
+
+# redis是单线程的，脚本执行期间会阻塞session、限流、短信队列等其他请求，
+# 每个词只用ZREVRANGE读取权重最高的top_k篇，脚本的耗时与文章数量无关。
+# 匹配的文章数量按读取到的文章计算，有一个词读满top_k篇时至少为top_k，不会少于MAX_RESULTS的上限
+# KEYS: 统计信息, 各个词的倒排表
+# ARGV: offset, limit, top_k
+# 返回 {匹配的文章数量, 文章id, 得分, 文章id, 得分, ...}
+SEARCH_SCRIPT = '''
+local n = tonumber(redis.call('hget', KEYS[1], 'docs')) or 0
+if n <= 0 then
+    return {0}
+end
+local offset = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local top_k = tonumber(ARGV[3])
+local scores = {}
+local ids = {}
+for i = 2, #KEYS do
+    local df = redis.call('zcard', KEYS[i])
+    if df > 0 then
+        local idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+        local postings = redis.call('zrevrange', KEYS[i], 0, top_k - 1, 'withscores')
+        for j = 1, #postings, 2 do
+            local id = postings[j]
+            if scores[id] == nil then
+                scores[id] = 0
+                ids[#ids + 1] = id
+            end
+            scores[id] = scores[id] + idf * tonumber(postings[j + 1])
+        end
+    end
+end
+table.sort(ids, function(x, y)
+    if scores[x] == scores[y] then
+        return tonumber(x) > tonumber(y)
+    end
+    return scores[x] > scores[y]
+end)
+local result = {#ids}
+for i = offset + 1, math.min(offset + limit, #ids) do
+    result[#result + 1] = ids[i]
+    result[#result + 1] = tostring(scores[ids[i]])
+end
+return result
+'''
+
+
+def tokenize(text):
+    '''
+    中文连续的字按相邻两个字切分，单独的一个字保留，英文和数字按单词切分
+    '''
+    tokens = []
+    for run in TOKEN_RE.findall(text.lower()):
+        if run[0] >= '一' and len(run) > 1:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def analyze(article):
+    '''
+    返回 (词 -> 加权词频, 加权长度)
+    '''
+    terms = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        text = getattr(article, field) or ''
+        if field == 'content':
+            # 正文是编辑器生成的html
+            text = unescape(strip_tags(text))
+        for token in tokenize(text):
+            terms[token] += weight
+    return dict(terms), sum(terms.values())
+
+
+def get_avgdl(redis_conn):
+    '''
+    当前索引中文章的平均长度，没有索引时返回None
+    '''
+    docs, length = redis_conn.hmget(STATS_KEY, 'docs', 'length')
+    docs, length = int(docs or 0), float(length or 0)
+    return length / docs if docs > 0 and length > 0 else None
+
+
+def weigh(terms, length, avgdl):
+    '''
+    BM25中每个词除idf以外的部分，只与词频、文章长度和平均长度有关，在建立索引时算好
+    平均长度按建立索引时的统计，文章数量变化很大后可以重建索引
+    '''
+    norm = K1 * (1 - B + B * length / (avgdl or length or 1))
+    return {term: tf * (K1 + 1) / (tf + norm) for term, tf in terms.items()}
+
+
+def index_article(article):
+    '''
+    建立或更新一篇文章的索引
+    '''
+    terms, length = analyze(article)
+    doc_key = DOC_KEY % article.id
+    redis_conn = get_redis_connection('default')
+    weights = weigh(terms, length, get_avgdl(redis_conn))
+
+    def update(pipeline):
+        old = pipeline.get(doc_key)
+        old = json.loads(old) if old else None
+        pipeline.multi()
+        if old:
+            for term in old['terms']:
+                if term not in terms:
+                    pipeline.zrem(TERM_KEY % term, article.id)
+            pipeline.hincrby(STATS_KEY, 'docs', -1)
+            pipeline.hincrbyfloat(STATS_KEY, 'length', -old['length'])
+        for term, weight in weights.items():
+            pipeline.zadd(TERM_KEY % term, {article.id: weight})
+        pipeline.set(doc_key, json.dumps({'terms': list(terms), 'length': length}))
+        pipeline.hincrby(STATS_KEY, 'docs', 1)
+        pipeline.hincrbyfloat(STATS_KEY, 'length', length)
+
+    # 监视文章的索引记录，并发更新同一篇文章时重试，倒排表中不会残留旧的词
+    redis_conn.transaction(update, doc_key)
+
+
+def remove_article(article_id):
+    '''
+    删除一篇文章的索引
+    '''
+    doc_key = DOC_KEY % article_id
+
+    def update(pipeline):
+        old = pipeline.get(doc_key)
+        if not old:
+            return
+        old = json.loads(old)
+        pipeline.multi()
+        for term in old['terms']:
+            pipeline.zrem(TERM_KEY % term, article_id)
+        pipeline.delete(doc_key)
+        pipeline.hincrby(STATS_KEY, 'docs', -1)
+        pipeline.hincrbyfloat(STATS_KEY, 'length', -old['length'])
+
+    redis_conn = get_redis_connection('default')
+    redis_conn.transaction(update, doc_key)
+
+
+def search(query, offset=0, limit=10):
+    '''
+    返回 (匹配的文章数量, [(文章id, 得分), ...])，匹配数量最多为MAX_RESULTS
+    只使用前MAX_TERMS个不重复的词
+    '''
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_TERMS]
+    if not terms or offset >= MAX_RESULTS:
+        return 0, []
+    limit = min(limit, MAX_RESULTS - offset)
+    redis_conn = get_redis_connection('default')
+    result = redis_conn.register_script(SEARCH_SCRIPT)(
+        keys=[STATS_KEY] + [TERM_KEY % term for term in terms],
+        args=[offset, limit, TERM_TOP_K])
+    hits = [(int(result[i]), float(result[i + 1])) for i in range(1, len(result), 2)]
+    return min(result[0], MAX_RESULTS), hits
+
+
+def _delete_pattern(redis_conn, pattern):
+    keys = []
+    for key in redis_conn.scan_iter(pattern, count=1000):
+        keys.append(key)
+        if len(keys) >= 1000:
+            redis_conn.delete(*keys)
+            keys = []
+    if keys:
+        redis_conn.delete(*keys)
+
+
+def rebuild(batch_size=500):
+    '''
+    重建期间原有的索引照常提供搜索，全部写好后再一次替换
+    1.清理上次重建失败残留的临时key
+    2.第一遍读取文章，统计平均长度
+    3.第二遍读取文章，按平均长度计算词权重，写入临时的倒排表
+    4.在一个事务中用RENAME把临时key换成正式的key，删除新索引中已经没有的词和文章
+    5.重建期间修改或删除的文章，第二遍读取到的可能是旧数据，重新索引或删除
+    返回文章数量
+    '''
+    redis_conn = get_redis_connection('default')
+    started = timezone.now()
+    # 1.清理残留的临时key
+    _delete_pattern(redis_conn, REBUILD_PREFIX + '*')
+
+    def articles():
+        return Article.objects.order_by().only('id', *FIELD_WEIGHTS).iterator(chunk_size=batch_size)
+
+    # 2.统计平均长度
+    count = 0
+    total_length = 0
+    for article in articles():
+        count += 1
+        total_length += analyze(article)[1]
+    avgdl = total_length / count if count else None
+    # 3.写入临时的倒排表
+    count = 0
+    total_length = 0
+    all_terms = set()
+    article_ids = []
+    pipeline = redis_conn.pipeline(transaction=False)
+    for article in articles():
+        terms, length = analyze(article)
+        for term, weight in weigh(terms, length, avgdl).items():
+            pipeline.zadd(REBUILD_PREFIX + TERM_KEY % term, {article.id: weight})
+        pipeline.set(REBUILD_PREFIX + DOC_KEY % article.id, json.dumps({'terms': list(terms), 'length': length}))
+        all_terms.update(terms)
+        article_ids.append(article.id)
+        count += 1
+        total_length += length
+        if count % batch_size == 0:
+            pipeline.execute()
+    pipeline.hset(REBUILD_PREFIX + STATS_KEY, mapping={'docs': count, 'length': total_length})
+    pipeline.execute()
+    # 4.替换正式的key，MULTI/EXEC中的命令一起执行，搜索不会看到新旧混合的索引
+    # search:term:*和search:lengths是改为有序集合之前的倒排表和文章长度
+    new_keys = {TERM_KEY % term for term in all_terms} | {DOC_KEY % id for id in article_ids}
+    pipeline = redis_conn.pipeline(transaction=True)
+    for pattern in (TERM_KEY % '*', 'search:term:*', DOC_KEY % '*'):
+        for key in redis_conn.scan_iter(pattern, count=1000):
+            if key.decode() not in new_keys:
+                pipeline.delete(key)
+    pipeline.delete('search:lengths')
+    for key in new_keys:
+        pipeline.rename(REBUILD_PREFIX + key, key)
+    pipeline.rename(REBUILD_PREFIX + STATS_KEY, STATS_KEY)
+    pipeline.execute()
+    # 5.重建期间修改或删除的文章
+    for article in Article.objects.filter(updated__gte=started).only('id', *FIELD_WEIGHTS):
+        index_article(article)
+    for article_id in set(article_ids) - set(Article.objects.values_list('id', flat=True)):
+        remove_article(article_id)
+    return count
@@ -0,0 +1,87 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from home import categories, page_cache, ranking, search, tags
+from home.models import Article, ArticleCtegory, Comment, Tag
+from home.render import render_article
+
+
+@receiver(post_init, sender=Article)
+def article_loaded(sender, instance, **kwargs):
+    # 记录文章加载时的分类，修改分类后新旧分类的首页缓存都需要失效
+    # 分类字段可能被延迟加载，直接从__dict__中读取，避免额外的查询
+    instance._loaded_category_id = instance.__dict__.get('category_id')
+    # 记录加载时的标签，标签没有修改时保存文章不需要同步关联
+    instance._loaded_tags = instance.__dict__.get('tags')
+    # 记录加载时的正文，正文没有修改时保存文章不需要重新渲染
+    instance._loaded_content = instance.__dict__.get('content')
+
+
+@receiver(pre_save, sender=Article)
+def article_saving(sender, instance, update_fields=None, **kwargs):
+    # 新文章或正文修改后预渲染正文，只保存部分字段时content_html不会被保存，不渲染
+    if update_fields is not None or 'content' not in instance.__dict__:
+        return
+    if not instance.__dict__.get('content_html') or instance._loaded_content != instance.content:
+        render_article(instance)
+        instance._loaded_content = instance.content
+
+
+@receiver(post_save, sender=Article)
+def article_saved(sender, instance, created, **kwargs):
+    # 文章修改后删除热门文章中的摘要缓存
+    if not created:
+        ranking.clear_summary(instance.id)
+    # 使文章所属分类的首页缓存失效
+    page_cache.bump_generation(instance.category_id)
+    if instance._loaded_category_id != instance.category_id:
+        page_cache.bump_generation(instance._loaded_category_id)
+    instance._loaded_category_id = instance.category_id
+    # 新文章或标签修改后同步文章与标签的关联，标签字段被延迟加载时没有修改
+    if 'tags' in instance.__dict__ and (created or instance._loaded_tags != instance.tags):
+        tags.set_tags(instance)
+        instance._loaded_tags = instance.tags
+    # 事务提交后更新搜索索引，只修改了浏览量、缩略图等不参与搜索的字段时跳过
+    update_fields = kwargs.get('update_fields')
+    if update_fields is None or set(update_fields) & set(search.FIELD_WEIGHTS):
+        transaction.on_commit(lambda: search.index_article(instance))
+
+
+@receiver(pre_delete, sender=Article)
+def article_deleting(sender, instance, **kwargs):
+    # 关联会被级联删除，删除前减少标签的文章数量
+    tags.unset_tags(instance.id)
+
+
+@receiver(post_delete, sender=Article)
+def article_deleted(sender, instance, **kwargs):
+    # 文章删除后从热门文章排行中删除
+    ranking.remove_article(instance.id)
+    page_cache.bump_generation(instance.category_id)
+    # 删除完成后instance.id会被置为None，先保存下来
+    article_id = instance.id
+    transaction.on_commit(lambda: search.remove_article(article_id))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    # 新评论会改变首页展示的评论量，使文章所属分类的首页缓存失效
+    # 评论与评论量在同一个事务中保存，事务提交后再使缓存失效
+    if created and instance.article is not None:
+        category_id = instance.article.category_id
+        transaction.on_commit(lambda: page_cache.bump_generation(category_id))
+
+
+@receiver(post_save, sender=ArticleCtegory)
+@receiver(post_delete, sender=ArticleCtegory)
+def category_changed(sender, instance, **kwargs):
+    # 分类修改后更新分类缓存的版本号
+    categories.bump_version()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    # 标签修改后更新标签云缓存的版本号
+    tags.bump_version()
@@ -0,0 +1,168 @@
+'''
+文章标签
+文章的tags字段是用户输入的文本，保存时拆分成标签并维护文章与标签的关联，
+标签的文章数量随关联的增删一起更新，标签页和标签云不需要统计。
+标签云渲染后的html按版本号缓存，标签的文章数量变化时更新版本号
+'''
+import re
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from home.models import Article, ArticleTag, Tag
+
+# 标签云缓存的版本号
+VERSION_KEY = 'tag:version'
+# 标签云缓存，%s为版本号和标签数量
+CLOUD_KEY = 'tag:cloud:%s:%s'
+# 标签云缓存的有效期
+CLOUD_EXPIRES = 3600
+# 标签云展示的标签数量
+CLOUD_SIZE = 30
+
+# 标签之间的分隔符：空白、中英文逗号和分号、顿号、斜线、竖线
+SEPARATOR_RE = re.compile(r'[\s,，;；、/|]+')
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # 版本号丢失时使用当前时间，避免与之前用过的版本号重复
+        cache.add(VERSION_KEY, int(time.time()), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    '''
+    标签或标签的文章数量变化后更新版本号，使标签云缓存失效
+    '''
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, int(time.time()), timeout=None)
+
+
+def split_tags(text):
+    '''
+    拆分tags字段，英文统一为小写，去掉重复的标签，保持输入的顺序
+    '''
+    names = []
+    for name in SEPARATOR_RE.split((text or '').lower()):
+        name = name.strip()[:Tag._meta.get_field('name').max_length]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def get_tags(names):
+    '''
+    返回 {标签名: 标签id}，不存在的标签先创建
+    '''
+    tag_ids = dict(Tag.objects.filter(name__in=names).values_list('name', 'id'))
+    missing = [name for name in names if name not in tag_ids]
+    if missing:
+        # 并发创建同名标签时忽略冲突，再查询一次取得id
+        Tag.objects.bulk_create([Tag(name=name) for name in missing], ignore_conflicts=True)
+        tag_ids.update(Tag.objects.filter(name__in=missing).values_list('name', 'id'))
+    return tag_ids
+
+
+def set_tags(article):
+    '''
+    1.拆分文章的tags字段，取得各标签的id
+    2.查询文章已有的标签
+    3.删除不再使用的关联，添加新的关联
+    4.同步更新标签的文章数量
+    '''
+    with transaction.atomic():
+        # 1.拆分tags字段
+        tag_ids = set(get_tags(split_tags(article.tags)).values())
+        # 2.查询已有的标签
+        links = ArticleTag.objects.filter(article_id=article.id)
+        old_ids = set(links.values_list('tag_id', flat=True))
+        removed, added = old_ids - tag_ids, tag_ids - old_ids
+        if not removed and not added:
+            return
+        # 3.增删关联
+        if removed:
+            links.filter(tag_id__in=removed).delete()
+            Tag.objects.filter(id__in=removed).update(article_count=F('article_count') - 1)
+        if added:
+            ArticleTag.objects.bulk_create([
+                ArticleTag(article_id=article.id, tag_id=tag_id, created=article.created) for tag_id in added
+            ])
+            # 4.更新文章数量
+            Tag.objects.filter(id__in=added).update(article_count=F('article_count') + 1)
+    transaction.on_commit(bump_version)
+
+
+def unset_tags(article_id):
+    '''
+    文章删除前调用，减少文章所用标签的文章数量，关联由级联删除
+    '''
+    tag_ids = list(ArticleTag.objects.filter(article_id=article_id).values_list('tag_id', flat=True))
+    if tag_ids:
+        Tag.objects.filter(id__in=tag_ids).update(article_count=F('article_count') - 1)
+        transaction.on_commit(bump_version)
+
+
+def get_tag(name):
+    name = (split_tags(name) or [None])[0]
+    if name is None:
+        return None
+    return Tag.objects.filter(name=name).first()
+
+
+def top_tags(limit=CLOUD_SIZE):
+    '''
+    标签云：文章数量最多的标签
+    '''
+    return list(Tag.objects.filter(article_count__gt=0).order_by('-article_count', 'id')[:limit])
+
+
+def link_articles(rows):
+    '''
+    为一批新文章创建标签关联，rows为 [(文章id, tags字段, 创建时间), ...]
+    不更新文章数量，全部处理完后调用recount统计
+    '''
+    splitted = [(id, created, split_tags(text)) for id, text, created in rows]
+    tag_ids = get_tags(list({name for _, _, names in splitted for name in names}))
+    ArticleTag.objects.bulk_create([
+        ArticleTag(article_id=id, tag_id=tag_ids[name], created=created)
+        for id, created, names in splitted for name in names
+    ], ignore_conflicts=True)
+
+
+def recount():
+    '''
+    按关联表重新统计全部标签的文章数量，一条UPDATE完成
+    '''
+    counts = ArticleTag.objects.filter(tag=OuterRef('pk')).order_by().values('tag').annotate(
+        count=Count('*')).values('count')
+    Tag.objects.update(article_count=Coalesce(Subquery(counts, output_field=IntegerField()), 0))
+    transaction.on_commit(bump_version)
+
+
+def rebuild(batch_size=1000):
+    '''
+    按文章的tags字段重建全部关联和文章数量，用于批量导入文章后
+    返回文章数量
+    '''
+    count = 0
+    with transaction.atomic():
+        ArticleTag.objects.all().delete()
+        last_id = 0
+        while True:
+            rows = list(Article.objects.filter(id__gt=last_id).order_by('id')
+                        .values_list('id', 'tags', 'created')[:batch_size])
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            link_articles(rows)
+            count += len(rows)
+        recount()
+    return count
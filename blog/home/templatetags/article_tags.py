@@ -0,0 +1,31 @@
+from django import template
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from home import tags
+
+register = template.Library()
+
+
+@register.filter
+def split_tags(text):
+    '''
+    把文章的tags字段拆分成标签名，模板中逐个输出标签链接，不需要查询关联表
+    {% for name in article.tags|split_tags %}
+    '''
+    return tags.split_tags(text)
+
+
+@register.simple_tag
+def tag_cloud(limit=tags.CLOUD_SIZE):
+    '''
+    输出标签云，渲染后的html按标签版本号缓存，标签的文章数量变化后重新生成
+    {% tag_cloud %}
+    '''
+    key = tags.CLOUD_KEY % (tags.get_version(), limit)
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string('tag_cloud.html', {'tags': tags.top_tags(limit)})
+        cache.set(key, html, tags.CLOUD_EXPIRES)
+    return mark_safe(html)
@@ -0,0 +1,30 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+from utils import images
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture(image, variants_json, width, **attrs):
+    '''
+    按展示宽度输出图片，有缩略图时输出带WebP和JPEG两种格式的picture标签，浏览器根据屏幕密度选择合适的尺寸
+    {% picture article.avatar article.avatar_variants 270 alt="avatar" style="max-width:100%" %}
+    '''
+    if not image:
+        return ''
+    attributes = format_html_join(' ', '{}="{}"', attrs.items())
+    variants = images.load_variants(variants_json)
+    if not variants:
+        return format_html('<img src="{}" {}>', image.url, attributes)
+    widths = sorted(variants, key=int)
+    srcset = {
+        fmt: ', '.join('%s %sw' % (default_storage.url(variants[w][fmt]), w) for w in widths)
+        for fmt in images.FORMATS
+    }
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}px">'
+        '<img src="{}" srcset="{}" sizes="{}px" {}></picture>',
+        srcset['webp'], width, images.variant_url(image, variants_json, width), srcset['jpeg'], width, attributes)
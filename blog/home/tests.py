@@ -1,3 +1,382 @@
-from django.test import TestCase
+import base64
+import datetime
+import json
+import unittest
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from home import search
+from home.models import Article, ArticleCtegory
+from utils import html
+from utils.html import count_words, excerpt, sanitize
+from utils.paginator import CursorPaginator, InvalidCursor
+
+CODE = '<pre><code class="language-python">x = 1\n</code></pre>'
+
+
+class SanitizeTest(SimpleTestCase):
+    '''
+    utils.html.sanitize按白名单过滤编辑器提交的html
+    '''
+
+    def test_drop_content_tags(self):
+        for tag in ('script', 'style', 'iframe', 'textarea'):
+            with self.subTest(tag):
+                out, text = sanitize('<p>a<%s>alert(1)</%s>b</p>' % (tag, tag))
+                self.assertEqual(out, '<p>ab</p>')
+                self.assertEqual(text, '\nab')
+
+    def test_nested_drop_content_tags(self):
+        out, _ = sanitize('<div><object><embed></embed>x</object>y</div>')
+        self.assertEqual(out, '<div>y</div>')
+
+    def test_disallowed_tag_keeps_text(self):
+        out, _ = sanitize('<form><input value="x">text</form>')
+        self.assertEqual(out, 'text')
+
+    def test_unsafe_href(self):
+        for href in ('javascript:alert(1)', 'java\tscript:alert(1)', ' JavaScript:alert(1)',
+                     'java\x00script:alert(1)', 'data:text/html,x', 'vbscript:x'):
+            with self.subTest(href=href):
+                out, _ = sanitize('<a href="%s">x</a>' % href)
+                self.assertEqual(out, '<a>x</a>')
+
+    def test_safe_href(self):
+        for href in ('https://example.com/?a=1&b=2', '/article/?id=1', 'mailto:a@example.com'):
+            with self.subTest(href=href):
+                out, _ = sanitize('<a href="%s">x</a>' % href)
+                self.assertIn('href="%s"' % href.replace('&', '&amp;'), out)
+
+    def test_unsafe_img_src(self):
+        out, _ = sanitize('<img src="javascript:alert(1)" alt="a">')
+        self.assertEqual(out, '<img alt="a">')
+
+    def test_event_handlers_removed(self):
+        out, _ = sanitize('<img src="/a.png" onerror="alert(1)"><p onclick="x" onmouseover="y">t</p>')
+        self.assertEqual(out, '<img src="/a.png"><p>t</p>')
+
+    def test_target_adds_rel(self):
+        out, _ = sanitize('<a href="/" target="_blank">x</a>')
+        self.assertEqual(out, '<a href="/" target="_blank" rel="noopener noreferrer">x</a>')
+
+    def test_style_url_removed(self):
+        out, _ = sanitize('<p style="color: red; background-color: url(javascript:x); '
+                          'position: fixed; text-align: center">x</p>')
+        self.assertEqual(out, '<p style="color: red; text-align: center">x</p>')
+
+    def test_style_removed_when_empty(self):
+        out, _ = sanitize('<span style="background-color: URL(/a.png)">x</span>')
+        self.assertEqual(out, '<span>x</span>')
+
+    def test_attribute_values_escaped(self):
+        out, _ = sanitize('<a title="&quot;><script>" href="/">x</a>')
+        self.assertEqual(out, '<a title="&quot;&gt;&lt;script&gt;" href="/">x</a>')
+
+    def test_text_escaped(self):
+        out, text = sanitize('<p>1 &lt; 2 &amp;&amp; a</p>')
+        self.assertEqual(out, '<p>1 &lt; 2 &amp;&amp; a</p>')
+        self.assertEqual(text, '\n1 < 2 && a')
+
+    def test_stray_end_tags_ignored(self):
+        out, _ = sanitize('</div><p>a</i></span>b</p></p>')
+        self.assertEqual(out, '<p>ab</p>')
+
+    def test_unclosed_tags_closed(self):
+        out, _ = sanitize('<ul><li><b>x')
+        self.assertEqual(out, '<ul><li><b>x</b></li></ul>')
+
+    def test_end_tag_closes_inner_tags(self):
+        out, _ = sanitize('<p>a<b>b<i>c</p>d')
+        self.assertEqual(out, '<p>a<b>b<i>c</i></b></p>d')
+
+    def test_unclosed_drop_content_tag(self):
+        out, text = sanitize('<p>a</p><script>alert(1)')
+        self.assertEqual(out, '<p>a</p>')
+        self.assertEqual(text, '\na')
+
+    def test_empty(self):
+        self.assertEqual(sanitize(''), ('', ''))
+        self.assertEqual(sanitize(None), ('', ''))
+
+    @unittest.skipIf(html.highlight is None, '需要安装Pygments')
+    def test_highlight_code(self):
+        out, text = sanitize(CODE)
+        self.assertTrue(out.startswith('<pre class="codehilite"><code class="language-python">'))
+        self.assertIn('<span class="o">=</span>', out)
+        self.assertEqual(text, '\nx = 1\n')
+
+    @unittest.skipIf(html.highlight is None, '需要安装Pygments')
+    def test_highlight_escapes_code(self):
+        out, _ = sanitize('<pre><code class="language-html">&lt;script&gt;alert(1)&lt;/script&gt;</code></pre>')
+        self.assertNotIn('<script>', out)
+        self.assertIn('&lt;', out)
+
+    @unittest.skipIf(html.highlight is None, '需要安装Pygments')
+    def test_unknown_language(self):
+        out, _ = sanitize('<pre><code class="language-nosuchlang">a &lt; b</code></pre>')
+        self.assertEqual(out, '<pre><code class="language-nosuchlang">a &lt; b</code></pre>')
+
+    def test_without_highlight(self):
+        expected = '<pre><code class="language-python">x = 1\n</code></pre>'
+        self.assertEqual(sanitize(CODE, highlight_code=False), (expected, '\nx = 1\n'))
+        # 没有安装Pygments时与highlight_code=False相同
+        with mock.patch.object(html, 'highlight', None):
+            self.assertEqual(sanitize(CODE), (expected, '\nx = 1\n'))
+
+    def test_without_highlight_escapes_code(self):
+        with mock.patch.object(html, 'highlight', None):
+            out, _ = sanitize('<pre><code class="language-html">&lt;script&gt;</code></pre>')
+        self.assertEqual(out, '<pre><code class="language-html">&lt;script&gt;</code></pre>')
+
+
+class TextTest(SimpleTestCase):
+    '''
+    纯文本的字数统计和摘要
+    '''
+
+    def test_count_words(self):
+        self.assertEqual(count_words(''), 0)
+        self.assertEqual(count_words('中文字数'), 4)
+        self.assertEqual(count_words("Django's ORM, version 2.2"), 5)
+        self.assertEqual(count_words('用Python写博客 blog-post'), 6)
+
+    def test_excerpt(self):
+        self.assertEqual(excerpt('  a\n\n b\tc  '), 'a b c')
+        self.assertEqual(excerpt('一二三四五', length=5), '一二三四五')
+        self.assertEqual(excerpt('一二三四五六', length=5), '一二三四…')
+        self.assertEqual(len(excerpt('字' * 500)), 200)
+
+
+class SearchKeysMixin:
+    '''
+    把搜索索引的key换成测试专用的前缀，不影响正在使用的索引
+    '''
+
+    prefix = 'test:search:'
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.multiple(search, TERM_KEY=self.prefix + 'postings:%s', DOC_KEY=self.prefix + 'doc:%s',
+                                      STATS_KEY=self.prefix + 'stats', REBUILD_PREFIX=self.prefix + 'rebuild:')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.redis_conn = get_redis_connection('default')
+        self.clear()
+        self.addCleanup(self.clear)
+
+    def clear(self):
+        keys = list(self.redis_conn.scan_iter(self.prefix + '*'))
+        if keys:
+            self.redis_conn.delete(*keys)
+
+    def keys(self, pattern='*'):
+        return {key.decode() for key in self.redis_conn.scan_iter(self.prefix + pattern)}
+
+
+class SearchTest(SearchKeysMixin, SimpleTestCase):
+    '''
+    home.search的分词、BM25排序和增量索引，文章不需要保存到数据库
+    '''
+
+    def article(self, id, title='', tags='', sumary='', content=''):
+        return Article(id=id, title=title, tags=tags, sumary=sumary, content=content)
+
+    def ids(self, query, **kwargs):
+        return [id for id, _ in search.search(query, **kwargs)[1]]
+
+    def test_tokenize(self):
+        self.assertEqual(search.tokenize('Django博客 Redis-6.0'), ['django', '博客', 'redis', '6', '0'])
+        self.assertEqual(search.tokenize('全文搜索'), ['全文', '文搜', '搜索'])
+        self.assertEqual(search.tokenize('字'), ['字'])
+        self.assertEqual(search.tokenize('!!! ...'), [])
+
+    def test_analyze(self):
+        article = self.article(1, title='Redis', tags='redis', sumary='缓存', content='<p>Redis &amp; MySQL</p>')
+        terms, length = search.analyze(article)
+        # 标题3 + 标签2 + 正文1
+        self.assertEqual(terms['redis'], 6)
+        self.assertEqual(terms['缓存'], 2)
+        self.assertEqual(terms['mysql'], 1)
+        self.assertNotIn('amp', terms)
+        self.assertEqual(length, sum(terms.values()))
+
+    def test_ranking(self):
+        search.index_article(self.article(1, content='redis ' + 'other words here ' * 10))
+        search.index_article(self.article(2, title='redis', content='redis cache'))
+        search.index_article(self.article(3, content='redis cache'))
+        search.index_article(self.article(4, content='mysql'))
+        # 标题中的词权重更高，词频相同时文章越短得分越高
+        self.assertEqual(self.ids('redis'), [2, 3, 1])
+        count, hits = search.search('redis')
+        self.assertEqual(count, 3)
+        self.assertEqual([score for _, score in hits], sorted((score for _, score in hits), reverse=True))
+        # 包含任意一个词的文章都会匹配，同时包含多个词的文章排在前面
+        self.assertEqual(set(self.ids('cache mysql')), {2, 3, 4})
+        self.assertEqual(self.ids('redis cache'), [2, 3, 1])
+        self.assertEqual(self.ids('redis', offset=1, limit=1), [3])
+        self.assertEqual(search.search('nothing'), (0, []))
+        self.assertEqual(search.search(''), (0, []))
+
+    def test_reindex_removes_old_terms(self):
+        search.index_article(self.article(1, title='redis', content='cache'))
+        search.index_article(self.article(1, title='mysql', content='cache'))
+        self.assertEqual(self.ids('redis'), [])
+        self.assertEqual(self.ids('mysql'), [1])
+        self.assertEqual(self.ids('cache'), [1])
+        self.assertNotIn(search.TERM_KEY % 'redis', self.keys())
+        # 文章数量和总长度不会重复计算
+        self.assertEqual(self.redis_conn.hget(search.STATS_KEY, 'docs'), b'1')
+        self.assertEqual(float(self.redis_conn.hget(search.STATS_KEY, 'length')), 4)
+
+    def test_remove_article(self):
+        search.index_article(self.article(1, title='redis'))
+        search.index_article(self.article(2, title='redis mysql'))
+        search.remove_article(1)
+        self.assertEqual(self.ids('redis'), [2])
+        self.assertNotIn(search.DOC_KEY % 1, self.keys())
+        self.assertEqual(self.redis_conn.hget(search.STATS_KEY, 'docs'), b'1')
+        search.remove_article(2)
+        self.assertEqual(self.ids('redis'), [])
+        self.assertEqual(self.keys('postings:*'), set())
+        # 删除不存在的文章不影响统计
+        search.remove_article(3)
+        self.assertEqual(self.redis_conn.hget(search.STATS_KEY, 'docs'), b'0')
+
+
+class SearchRebuildTest(SearchKeysMixin, TestCase):
+    '''
+    home.search.rebuild在临时key中重建，完成后替换原有的索引
+    '''
+
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user(username='search', mobile='13900000021', password='abc12345')
+        for title in ('redis', 'mysql', 'django'):
+            Article.objects.create(auther=user, title=title, sumary=title, content='<p>%s</p>' % title)
+
+    def test_rebuild(self):
+        # 已删除的文章和不再使用的词
+        search.index_article(Article(id=999999, title='obsolete', sumary='redis', content=''))
+        redis_id = Article.objects.get(title='redis').id
+        weigh = search.weigh
+
+        def check_old_index(*args):
+            # 写入临时key期间原有的索引照常可用
+            self.assertEqual(self.ids('obsolete'), [999999])
+            return weigh(*args)
+
+        with mock.patch.object(search, 'weigh', side_effect=check_old_index):
+            self.assertEqual(search.rebuild(batch_size=2), 3)
+        self.assertEqual(self.ids('obsolete'), [])
+        self.assertEqual(self.ids('redis'), [redis_id])
+        self.assertEqual(self.keys('rebuild:*'), set())
+        self.assertNotIn(search.DOC_KEY % 999999, self.keys())
+        self.assertEqual(self.redis_conn.hget(search.STATS_KEY, 'docs'), b'3')
+
+    def ids(self, query):
+        return [id for id, _ in search.search(query)[1]]
+
+
+class CursorPaginatorTest(TestCase):
+    '''
+    utils.paginator.CursorPaginator按(created, id)倒序翻页
+    '''
+
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user(username='pager', mobile='13900000004', password='abc12345')
+        cls.category = ArticleCtegory.objects.create(title='pager')
+        start = timezone.now() - datetime.timedelta(days=1)
+        # 每3篇文章的创建时间相同，翻页时按id区分
+        for i in range(11):
+            Article.objects.create(auther=user, category=cls.category, title='a%d' % i, sumary='a', content='a',
+                                   created=start + datetime.timedelta(minutes=i // 3))
+        cls.expected = list(Article.objects.order_by('-created', '-id').values_list('id', flat=True))
+
+    def paginator(self, per_page=4):
+        return CursorPaginator(Article.objects.filter(category=self.category), per_page)
+
+    def ids(self, page):
+        return [article.id for article in page]
+
+    def test_cursor_round_trip(self):
+        article = Article.objects.get(id=self.expected[5])
+        for direction in (CursorPaginator.NEXT, CursorPaginator.PREV):
+            cursor = CursorPaginator.encode_cursor(direction, article)
+            self.assertNotIn('=', cursor)
+            self.assertEqual(CursorPaginator.decode_cursor(cursor), (direction, article.created, article.id))
+
+    def test_forward_and_back(self):
+        paginator = self.paginator()
+        pages = [paginator.page()]
+        # 第一页没有上一页
+        self.assertFalse(pages[0].has_previous())
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        self.assertEqual([len(page) for page in pages], [4, 4, 3])
+        self.assertEqual([id for page in pages for id in self.ids(page)], self.expected)
+        # 最后一页没有下一页
+        self.assertIsNone(pages[-1].next_cursor)
+        # 从最后一页往回翻，得到相同的各页
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            page = paginator.page(page.prev_cursor)
+            self.assertEqual(self.ids(page), self.ids(expected))
+            self.assertTrue(page.has_next())
+        self.assertFalse(page.has_previous())
+
+    def test_exact_pages(self):
+        # 文章数量正好是每页数量的整数倍时，最后一页没有下一页
+        paginator = CursorPaginator(Article.objects.filter(id__in=self.expected[:8]), 4)
+        page = paginator.page(paginator.page().next_cursor)
+        self.assertEqual(self.ids(page), self.expected[4:8])
+        self.assertFalse(page.has_next())
+
+    def test_past_the_edges(self):
+        paginator = self.paginator()
+        first = Article.objects.get(id=self.expected[0])
+        last = Article.objects.get(id=self.expected[-1])
+        page = paginator.page(CursorPaginator.encode_cursor(CursorPaginator.NEXT, last))
+        self.assertEqual((len(page), page.has_next(), page.has_previous()), (0, False, False))
+        page = paginator.page(CursorPaginator.encode_cursor(CursorPaginator.PREV, first))
+        self.assertEqual((len(page), page.has_next(), page.has_previous()), (0, False, False))
+
+    def test_invalid_cursor(self):
+        def encode(value):
+            return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+        created = timezone.now().isoformat()
+        for cursor in ('abc', '!!!!', '=', base64.urlsafe_b64encode(b'\xff\xfe').decode(), encode({'n': 1}),
+                       encode(['n', created]), encode(['x', created, 1]), encode(['n', 'yesterday', 1]),
+                       encode(['n', created, 'one']), encode(['n', None, 1]), encode(None)):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(InvalidCursor):
+                    self.paginator().page(cursor)
+
+    def test_tampered_cursor(self):
+        # 改动游标中的数据后仍然只能得到(created, id)之后的文章，不会出错
+        article = Article.objects.get(id=self.expected[3])
+        cursor = base64.urlsafe_b64encode(json.dumps(
+            ['n', article.created.isoformat(), article.id + 1000]).encode()).decode()
+        key = (article.created, article.id + 1000)
+        expected = [a.id for a in Article.objects.filter(id__in=self.expected).order_by('-created', '-id')
+                    if (a.created, a.id) < key]
+        self.assertEqual(self.ids(self.paginator(per_page=20).page(cursor)), expected)
+
+    def test_per_page(self):
+        for per_page, expected in (('5', 5), (None, 10), ('', 10), ('abc', 10), ('2.5', 10), ('0', 1), ('-3', 1),
+                                   ('1000', CursorPaginator.MAX_PER_PAGE)):
+            with self.subTest(per_page=per_page):
+                self.assertEqual(CursorPaginator(Article.objects.none(), per_page).per_page, expected)
+
+    def test_view_invalid_page_size(self):
+        response = self.client.get('/', {'cat_id': self.category.id, 'page_size': 'abc', 'cursor': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_article']), CursorPaginator.DEFAULT_PER_PAGE)
+        self.assertEqual(response.context['page_size'], CursorPaginator.DEFAULT_PER_PAGE)
+        response = self.client.get('/', {'cat_id': self.category.id, 'cursor': 'abc'})
+        self.assertEqual(response.status_code, 404)
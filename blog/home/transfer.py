@@ -0,0 +1,346 @@
+'''
+数据的导出和导入
+用户、分类、文章、评论按模型分别导出为jsonl或csv文件，
+导出按主键分批读取，MySQL驱动会把整个结果集读入客户端内存，iterator()不能保证内存不增长；
+导入时逐行读取文件，分批bulk_create，文章和评论可以在多个进程中并行写入，内存占用与数据量无关。
+导入到已有数据的库时重新映射外键：用户按手机号、分类按标题对应已有的数据，
+文章和评论的id加上导入前表中的最大id，不需要在内存中保存文章和评论的id映射
+'''
+import csv
+import datetime
+import json
+import os
+import resource
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+
+from django.core.management.color import no_style
+from django.db import connection, connections, reset_queries
+from django.db.models import Max
+
+from home import categories, page_cache, tags
+from home.models import Article, ArticleCtegory, Comment
+from home.render import render_article
+from users.models import User
+
+# 支持的文件格式
+FORMATS = ('jsonl', 'csv')
+
+# 导出文件名 -> 模型，按导入的顺序排列
+MODELS = (
+    ('users', User),
+    ('categories', ArticleCtegory),
+    ('articles', Article),
+    ('comments', Comment),
+)
+
+# 文章正文可能超过csv模块默认的字段长度限制
+csv.field_size_limit(2 ** 31 - 1)
+
+
+class TransferError(Exception):
+    '''
+    导入的文件不完整，无法继续导入
+    '''
+
+
+def get_path(directory, name, fmt):
+    return os.path.join(directory, '%s.%s' % (name, fmt))
+
+
+def _fields(model):
+    return list(model._meta.concrete_fields)
+
+
+def peak_rss():
+    '''
+    返回 (当前进程, 已结束的工作进程中最大的) 内存占用峰值，单位MB
+    '''
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024)
+
+
+def _encode(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+
+def _decode(field, value, fmt):
+    # csv中的空字符串对可以为空的字段表示None
+    if fmt == 'csv' and value == '' and field.null:
+        return None
+    if value is None:
+        return None
+    return field.to_python(value)
+
+
+def iter_rows(model, batch_size=2000):
+    '''
+    按主键分批读取全部数据，每次只有一批在内存中，返回 (字段名列表, 值元组的迭代器)
+    '''
+    names = [field.attname for field in _fields(model)]
+    pk_index = names.index(model._meta.pk.attname)
+    queryset = model._default_manager.order_by('pk').values_list(*names)
+
+    def rows():
+        last_pk = None
+        while True:
+            batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            batch = list(batch[:batch_size])
+            if not batch:
+                return
+            last_pk = batch[-1][pk_index]
+            # DEBUG为True时每条SQL都会保存在connection.queries中，每批清空一次
+            reset_queries()
+            yield from batch
+
+    return names, rows()
+
+
+def export_model(model, path, fmt='jsonl', batch_size=2000):
+    '''
+    导出一个模型的全部数据，返回行数
+    '''
+    names, rows = iter_rows(model, batch_size)
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            writer = csv.writer(f)
+            writer.writerow(names)
+            for row in rows:
+                writer.writerow(['' if value is None else _encode(value) for value in row])
+                count += 1
+        else:
+            for row in rows:
+                f.write(json.dumps(dict(zip(names, map(_encode, row))), ensure_ascii=False))
+                f.write('\n')
+                count += 1
+    return count
+
+
+def read_rows(model, path, fmt='jsonl'):
+    '''
+    逐行读取导出文件，返回 {字段名: 值} 的迭代器，值已转换为字段的python类型
+    '''
+    fields = {field.attname: field for field in _fields(model)}
+    with open(path, encoding='utf-8', newline='') as f:
+        lines = csv.DictReader(f) if fmt == 'csv' else (json.loads(line) for line in f if line.strip())
+        for line in lines:
+            yield {name: _decode(fields[name], value, fmt) for name, value in line.items() if name in fields}
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+@contextmanager
+def _keep_timestamps(model):
+    '''
+    写入导入的数据时保留导出的创建和修改时间，bulk_create会按auto_now、auto_now_add改为当前时间
+    '''
+    fields = [field for field in _fields(model) if getattr(field, 'auto_now', False) or
+              getattr(field, 'auto_now_add', False)]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _insert_articles(rows):
+    '''
+    写入一批文章，在工作进程中执行
+    旧版本导出的数据没有预渲染的正文时在这里渲染，同时创建标签关联
+    '''
+    reset_queries()
+    articles = [Article(**row) for row in rows]
+    for article in articles:
+        if not article.content_html:
+            render_article(article)
+    with _keep_timestamps(Article):
+        Article.objects.bulk_create(articles)
+    tags.link_articles([(article.id, article.tags, article.created) for article in articles])
+    return len(articles)
+
+
+def _insert_comments(rows):
+    reset_queries()
+    with _keep_timestamps(Comment):
+        Comment.objects.bulk_create([Comment(**row) for row in rows])
+    return len(rows)
+
+
+class Importer(object):
+    '''
+    按users、categories、articles、comments的顺序导入一个目录中的导出文件，
+    用户和分类数量少且需要按唯一字段对应已有数据，在当前进程中导入，
+    文章和评论只需按偏移量换算id，分批交给进程池并行写入
+    '''
+
+    def __init__(self, directory, fmt='jsonl', batch_size=1000, workers=0):
+        self.directory = directory
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.workers = workers
+        # 导出文件中的用户id、分类id -> 当前库中的id
+        self.user_ids = {}
+        self.category_ids = {}
+        # 导入的文章id的偏移量，没有导入文章时为None
+        self.article_offset = None
+        # 因作者找不到而跳过的文章在导出文件中的id，这些文章的评论也要跳过
+        self.skipped_articles = set()
+        # 因外键找不到而跳过的行数
+        self.skipped = 0
+
+    def available(self):
+        '''
+        目录中存在的导出文件，按导入顺序返回 [(文件名, 模型), ...]
+        '''
+        return [(name, model) for name, model in MODELS if os.path.exists(self.path(name))]
+
+    def import_file(self, name):
+        return getattr(self, 'import_%s' % name)()
+
+    def path(self, name):
+        return get_path(self.directory, name, self.fmt)
+
+    def rows(self, name, model):
+        return read_rows(model, self.path(name), self.fmt)
+
+    def import_users(self):
+        '''
+        手机号已存在的用户直接使用已有的用户，不覆盖；用户名被其他用户占用时在后面加上手机号
+        '''
+        count = 0
+        for rows in _chunks(self.rows('users', User), self.batch_size):
+            reset_queries()
+            mobiles = [row['mobile'] for row in rows]
+            existing = dict(User.objects.filter(mobile__in=mobiles).values_list('mobile', 'id'))
+            new_rows = [row for row in rows if row['mobile'] not in existing]
+            taken = set(User.objects.filter(username__in=[row['username'] for row in new_rows])
+                        .values_list('username', flat=True))
+            users = []
+            for row in new_rows:
+                values = dict(row, id=None)
+                if values['username'] in taken:
+                    values['username'] = '%s_%s' % (values['username'], values['mobile'])
+                users.append(User(**values))
+            User.objects.bulk_create(users)
+            existing.update(User.objects.filter(mobile__in=[user.mobile for user in users])
+                            .values_list('mobile', 'id'))
+            for row in rows:
+                self.user_ids[row['id']] = existing[row['mobile']]
+            count += len(rows)
+        return count
+
+    def import_categories(self):
+        '''
+        标题相同的分类合并为已有的分类
+        '''
+        count = 0
+        existing = dict(ArticleCtegory.objects.values_list('title', 'id'))
+        for row in self.rows('categories', ArticleCtegory):
+            if row['title'] not in existing:
+                existing[row['title']] = ArticleCtegory.objects.create(**dict(row, id=None)).id
+            self.category_ids[row['id']] = existing[row['title']]
+            count += 1
+        return count
+
+    def import_articles(self):
+        '''
+        文章的作者按导入用户时得到的对应关系换算，没有同时导入用户时无法换算，直接报错
+        '''
+        if not self.user_ids:
+            raise TransferError('导入文章需要先导入用户，目录中没有%s或其中没有用户' %
+                                os.path.basename(self.path('users')))
+        self.article_offset = Article.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+
+        def remap(row):
+            auther_id = self.user_ids.get(row['auther_id'])
+            if auther_id is None:
+                self.skipped_articles.add(row['id'])
+                return None
+            row['id'] += self.article_offset
+            row['auther_id'] = auther_id
+            if row['category_id'] is not None:
+                row['category_id'] = self.category_ids.get(row['category_id'])
+            return row
+
+        return self.insert('articles', Article, remap, _insert_articles)
+
+    def import_comments(self):
+        offset = Comment.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+
+        def remap(row):
+            row['id'] += offset
+            if row['article_id'] is not None:
+                # 没有同时导入文章，或评论的文章因作者找不到被跳过时，评论的文章无法对应
+                if self.article_offset is None or row['article_id'] in self.skipped_articles:
+                    return None
+                row['article_id'] += self.article_offset
+            if row['user_id'] is not None:
+                row['user_id'] = self.user_ids.get(row['user_id'])
+            return row
+
+        return self.insert('comments', Comment, remap, _insert_comments)
+
+    def insert(self, name, model, remap, insert_batch):
+        '''
+        逐批换算外键后写入，使用进程池时最多有workers * 2批在等待写入，内存占用保持不变
+        '''
+        rows = self.rows(name, model)
+        count = 0
+        if self.workers <= 1:
+            for batch in self.remap_batches(rows, remap):
+                count += insert_batch(batch)
+        else:
+            # 工作进程由fork创建，先关闭当前进程的数据库连接，避免子进程共用同一个连接
+            connections.close_all()
+            pending = set()
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                for batch in self.remap_batches(rows, remap):
+                    if len(pending) >= self.workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        count += sum(future.result() for future in done)
+                    pending.add(executor.submit(insert_batch, batch))
+                count += sum(future.result() for future in wait(pending)[0])
+        self.reset_sequence(model)
+        return count
+
+    def remap_batches(self, rows, remap):
+        for batch in _chunks(rows, self.batch_size):
+            remapped = [row for row in map(remap, batch) if row is not None]
+            self.skipped += len(batch) - len(remapped)
+            if remapped:
+                yield remapped
+
+    @staticmethod
+    def reset_sequence(model):
+        # 指定id写入后同步自增序列，MySQL和SQLite不需要，返回空列表
+        statements = connection.ops.sequence_reset_sql(no_style(), [model])
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+    def finish(self):
+        '''
+        全部导入后统计标签的文章数量，并使分类缓存和导入文章所在分类的首页缓存失效
+        '''
+        if self.article_offset is not None:
+            tags.recount()
+        if self.category_ids:
+            categories.bump_version()
+        for category_id in set(self.category_ids.values()):
+            page_cache.bump_generation(category_id)
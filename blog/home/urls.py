@@ -1,8 +1,13 @@
 from django.urls import path
-from home.views import IndexView, DetailView
+from home.views import IndexView, DetailView, SearchView, TagView
+from utils.ratelimit import ratelimit
 
 urlpatterns = [
     path('', IndexView.as_view(), name='index'),
     # 文章详情
-    path('detail/', DetailView.as_view(), name='detail')
+    path('detail/', DetailView.as_view(), name='detail'),
+    # 文章搜索，不需要登录，按ip限流
+    path('search/', ratelimit(SearchView.as_view(), ip='30/m'), name='search'),
+    # 标签下的文章
+    path('tag/', TagView.as_view(), name='tag'),
 ]
\ No newline at end of file
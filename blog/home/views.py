@@ -1,16 +1,35 @@
+from math import ceil
+
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.paginator import Paginator, EmptyPage
+from django.db import transaction
+from django.db.models import F
 from django.http import HttpResponseNotFound
 from django.shortcuts import render, redirect
 from django.views import View
-from home.models import ArticleCtegory, Article, Comment
+from home.models import Article, ArticleQuerySet, ArticleTag, Comment
+from home.categories import get_categories, get_category
+from home.counter import incr_views
+from home.ranking import get_hot_articles
+from home.render import render_article
+from home.page_cache import cache_index_page
+from home.search import search
+from home.tags import get_tag
 from django.urls import reverse
+from utils.html import sanitize
+from utils.paginator import CursorPaginator, InvalidCursor
 # Create your views here.
 
 
 class IndexView(View):
 
     def get(self, request):
+        # 未登录用户看到的首页只与分类和分页参数有关，使用缓存的页面
+        if not request.user.is_authenticated:
+            return cache_index_page(request, self.render_page)
+        return self.render_page(request)
+
+    def render_page(self, request):
         '''
         1.获取所有分类信息
         2.接受用户点击的分类id
@@ -22,31 +41,44 @@ class IndexView(View):
         8.组织数据，传递给模板
         '''
         # 1.获取所有分类信息
-        categories = ArticleCtegory.objects.all()
+        # 分类信息从缓存中读取，不查询数据库
+        categories = get_categories()
         # 2.接受用户点击的分类id
         # 如果没有传递该参数，默认值为1
         cat_id = request.GET.get('cat_id', 1)
         # 3.数据查询
-        try:
-            category = ArticleCtegory.objects.get(id=cat_id)
-        except ArticleCtegory.DoesNotExist:
-            return HttpResponseNotFound
+        category = get_category(cat_id)
+        if category is None:
+            return HttpResponseNotFound('没有此分类')
         # 4.获取分页参数
         page_num = request.GET.get('page_num', 1)
         page_size = request.GET.get('page_size', 10)
         # 5.根据分类信息查询文章数据
         # filter返回满足条件的对象列表，若对象不存在，返回空列表
         # get返回一个对象，若对象不存在，会报错
-        articles = Article.objects.filter(category=category)
-        # 6.创建分页器
-        paginator = Paginator(articles, per_page=page_size)
-        # 7.进行分页
-        try:
-            page_article = paginator.page(page_num)
-        except EmptyPage:
-            return HttpResponseNotFound('empty page')
-        # 总页数
-        total_page = paginator.num_pages
+        # listing只查询列表需要的字段，不加载文章正文
+        articles = Article.objects.listing().filter(category=category)
+        # 传递了cursor参数时使用游标分页，不统计总数也不使用OFFSET
+        cursor = request.GET.get('cursor')
+        if cursor is not None:
+            try:
+                paginator = CursorPaginator(articles, per_page=page_size)
+                # 翻页链接使用校正后的每页数量
+                page_size = paginator.per_page
+                page_article = paginator.page(cursor)
+            except InvalidCursor:
+                return HttpResponseNotFound('empty page')
+            total_page = None
+        else:
+            # 6.创建分页器
+            paginator = Paginator(articles, per_page=page_size)
+            # 7.进行分页
+            try:
+                page_article = paginator.page(page_num)
+            except EmptyPage:
+                return HttpResponseNotFound('empty page')
+            # 总页数
+            total_page = paginator.num_pages
         # 8.组织数据，传递给模板
         context = {
             'categories': categories,
@@ -54,11 +86,108 @@ class IndexView(View):
             'page_article': page_article,
             'page_size': page_size,
             'total_page': total_page,
-            'page_num': page_num
+            'page_num': page_num,
+            'cursor_mode': cursor is not None
         }
         return render(request, 'index.html', context)
 
 
+class SearchView(View):
+
+    def get(self, request):
+        '''
+        1.获取所有分类信息
+        2.接收搜索关键词和分页参数
+        3.在倒排索引中查询当前页的文章id和匹配的文章数量
+        4.只查询当前页的文章数据，按相关度排序
+        5.组织数据，传递给模板
+        '''
+        # 1.获取所有分类信息
+        categories = get_categories()
+        # 2.接收搜索关键词和分页参数
+        q = request.GET.get('q', '').strip()
+        try:
+            page_num = max(1, int(request.GET.get('page_num', 1)))
+            page_size = min(max(1, int(request.GET.get('page_size', 10))), 50)
+        except ValueError:
+            return HttpResponseNotFound('empty page')
+        # 3.在倒排索引中查询，不扫描文章表
+        total_count, hits = search(q, offset=(page_num - 1) * page_size, limit=page_size)
+        # 4.只查询当前页的文章数据，按相关度排序
+        articles = Article.objects.listing().in_bulk([article_id for article_id, _ in hits])
+        page_article = [articles[article_id] for article_id, _ in hits if article_id in articles]
+        # 5.组织数据，传递给模板
+        context = {
+            'categories': categories,
+            'q': q,
+            'page_article': page_article,
+            'page_size': page_size,
+            'page_num': page_num,
+            'total_count': total_count,
+            'total_page': max(1, ceil(total_count / page_size)),
+        }
+        return render(request, 'search.html', context)
+
+
+class TagView(View):
+
+    def get(self, request):
+        '''
+        1.获取所有分类信息
+        2.接收标签名，查询标签
+        3.获取分页参数
+        4.按(tag, created, id)索引顺序读取关联，同时关联查询文章数据
+        5.创建分页器，总数使用标签的文章数量，不执行COUNT(*)
+        6.进行分页
+        7.组织数据，传递给模板
+        '''
+        # 1.获取所有分类信息
+        categories = get_categories()
+        # 2.接收标签名，查询标签
+        tag = get_tag(request.GET.get('name', ''))
+        if tag is None:
+            return HttpResponseNotFound('没有此标签')
+        # 3.获取分页参数
+        page_num = request.GET.get('page_num', 1)
+        page_size = request.GET.get('page_size', 10)
+        # 4.从关联表的索引出发按主键关联文章，只查询列表需要的字段
+        links = ArticleTag.objects.filter(tag=tag).select_related(
+            'article__auther', 'article__category').only(
+            'id', 'created', 'article', *['article__' + field for field in ArticleQuerySet.LISTING_FIELDS])
+        cursor = request.GET.get('cursor')
+        if cursor is not None:
+            try:
+                paginator = CursorPaginator(links, per_page=page_size)
+                # 翻页链接使用校正后的每页数量
+                page_size = paginator.per_page
+                page_article = paginator.page(cursor)
+            except InvalidCursor:
+                return HttpResponseNotFound('empty page')
+            total_page = None
+        else:
+            # 5.创建分页器
+            paginator = Paginator(links.order_by('-created', '-id'), per_page=page_size)
+            paginator.count = tag.article_count
+            # 6.进行分页
+            try:
+                page_article = paginator.page(page_num)
+            except EmptyPage:
+                return HttpResponseNotFound('empty page')
+            total_page = paginator.num_pages
+        page_article.object_list = [link.article for link in page_article.object_list]
+        # 7.组织数据，传递给模板
+        context = {
+            'categories': categories,
+            'tag': tag,
+            'page_article': page_article,
+            'page_size': page_size,
+            'total_page': total_page,
+            'page_num': page_num,
+            'cursor_mode': cursor is not None
+        }
+        return render(request, 'tag.html', context)
+
+
 class DetailView(LoginRequiredMixin, View):
     def get(self, request):
         '''
@@ -75,45 +204,64 @@ class DetailView(LoginRequiredMixin, View):
         # 1.接收文章id
         id = request.GET.get('id')
         # 2.文章数据查询
+        # 页面输出保存时预渲染的content_html，不加载原始正文
         try:
-            article = Article.objects.get(id=id)
+            article = Article.objects.defer('content').get(id=id)
         except Article.DoesNotExist:
             return render(request, '404.html')
         else:
+            # 还没有预渲染的旧文章在这里渲染，由render_articles命令补齐后不再执行
+            if not article.content_html:
+                render_article(article)
             # 若查询到某文章，则文章浏览量加1
-            article.total_views += 1
-            article.save()
+            # 浏览量先累加到redis，由flush_article_views命令定期写回数据库
+            # 页面展示的浏览量为数据库中的值加上尚未写回的增量
+            article.total_views += incr_views(article.id)
         # 3.查询分类数据
-        categories = ArticleCtegory.objects.all()
+        categories = get_categories()
         # 4.查询浏览量最高的10篇文章
-        # 按浏览量降序排序
-        hot_articles = Article.objects.order_by('-total_views')[:9]
+        # 从redis的热门文章排行中获取，不再对文章表按浏览量排序
+        hot_articles = get_hot_articles(9)
         # 5.获取分页请求参数
         page_size = request.GET.get('page_size', 10)
         page_num = request.GET.get('page_num', 1)
         # 6.根据文章信息查询评论数据
         comments = Comment.objects.filter(article=article).order_by('-created')
-        total_count = comments.count()
-        # 7.创建分页器
-        paginator = Paginator(comments, page_size)
-        # 8.分页处理
-        try:
-            page_comment = paginator.page(page_num)
-        except EmptyPage:
-            return HttpResponseNotFound('empty page')
-        # 总页数
-        total_page = paginator.num_pages
+        # 传递了cursor参数时使用游标分页，评论总数直接使用文章的评论量
+        cursor = request.GET.get('cursor')
+        if cursor is not None:
+            try:
+                paginator = CursorPaginator(comments, per_page=page_size)
+                # 翻页链接使用校正后的每页数量
+                page_size = paginator.per_page
+                page_comment = paginator.page(cursor)
+            except InvalidCursor:
+                return HttpResponseNotFound('empty page')
+            total_count = article.comment_count
+            total_page = None
+        else:
+            total_count = comments.count()
+            # 7.创建分页器
+            paginator = Paginator(comments, page_size)
+            # 8.分页处理
+            try:
+                page_comment = paginator.page(page_num)
+            except EmptyPage:
+                return HttpResponseNotFound('empty page')
+            # 总页数
+            total_page = paginator.num_pages
         # 9.组织模板数据
         context = {
             'categories': categories,
-            'category': article.category,
+            'category': get_category(article.category_id),
             'article': article,
             'hot_articles': hot_articles,
             'total_count': total_count,
             'comments': page_comment,
             'page_size': page_size,
             'total_page': total_page,
-            'page_num': page_num
+            'page_num': page_num,
+            'cursor_mode': cursor is not None
         }
         return render(request, 'detail.html', context)
 
@@ -135,21 +283,24 @@ class DetailView(LoginRequiredMixin, View):
             # 3.登录用户接收评论数据
             #     3.1接收评论数据
             id = request.POST.get('id')
-            content = request.POST.get('content')
+            # 评论同样以safe输出，保存前过滤html
+            content, _ = sanitize(request.POST.get('content', ''))
             #     3.2验证文章是否存在
             try:
-                article = Article.objects.get(id=id)
+                article = Article.objects.only('id', 'category_id').get(id=id)
             except Article.DoesNotExist:
                 return HttpResponseNotFound('没有此文章')
-            #     3.3保存评论数据
-            Comment.objects.create(
-                content=content,
-                article=article,
-                user=user
-            )
-            #     3.4修改文章评论数量
-            article.comment_count += 1
-            article.save()
+            # 保存评论和修改评论数量在同一个事务中完成
+            with transaction.atomic():
+                #     3.3保存评论数据
+                Comment.objects.create(
+                    content=content,
+                    article=article,
+                    user=user
+                )
+                #     3.4修改文章评论数量
+                # 在数据库中原子地加1，只更新comment_count一列，不重写文章整行数据
+                Article.objects.filter(id=article.id).update(comment_count=F('comment_count') + 1)
 
             # 刷新当前页面
             path = reverse('home:detail') + '?id={}'.format(article.id)
@@ -6,6 +6,10 @@
 import random
 import string
 import os.path
+import sys
+import threading
+import time
+from functools import lru_cache
 from io import BytesIO
 
 from PIL import Image
@@ -54,11 +58,28 @@ class Bezier:
             return result
 
 
+# 字符蒙版的查找表，与 point(lambda i: i * 1.97) 的结果相同，不需要每次调用python函数
+MASK_TABLE = [min(255, round(i * 1.97)) for i in range(256)]
+
+CHARACTERS = string.ascii_uppercase + string.ascii_uppercase + '3456789'
+
+
 class Captcha(object):
-    def __init__(self):
+    def __init__(self, cache=True, glyph_cache_size=2048):
         self._bezier = Bezier()
         self._dir = os.path.dirname(__file__)
         # self._captcha_path = os.path.join(self._dir, '..', 'static', 'captcha')
+        self.default_fonts = [os.path.join(self._dir, 'fonts', font)
+                              for font in ['Arial.ttf', 'Georgia.ttf', 'actionj.ttf']]
+        # 已加载的字体，(字体文件, 字号) -> 字体
+        self._fonts = {}
+        # 字体对象在线程之间共用，加载字体和用字体绘制字符都要加锁
+        self._font_lock = threading.RLock()
+        self._cache = cache
+        if cache:
+            self._glyph = lru_cache(maxsize=glyph_cache_size)(self._render_glyph)
+        else:
+            self._glyph = self._render_glyph
 
     @staticmethod
     def instance():
@@ -68,36 +89,35 @@ class Captcha(object):
 
     def initialize(self, width=200, height=75, color=None, text=None, fonts=None):
         # self.image = Image.new('RGB', (width, height), (255, 255, 255))
-        self._text = text if text else random.sample(string.ascii_uppercase + string.ascii_uppercase + '3456789', 4)
-        self.fonts = fonts if fonts else \
-            [os.path.join(self._dir, 'fonts', font) for font in ['Arial.ttf', 'Georgia.ttf', 'actionj.ttf']]
+        self._text = text if text else random.sample(CHARACTERS, 4)
+        self.fonts = fonts if fonts else self.default_fonts
         self.width = width
         self.height = height
         self._color = color if color else self.random_color(0, 200, random.randint(220, 255))
 
     @staticmethod
-    def random_color(start, end, opacity=None):
-        red = random.randint(start, end)
-        green = random.randint(start, end)
-        blue = random.randint(start, end)
+    def random_color(start, end, opacity=None, rng=random):
+        red = rng.randint(start, end)
+        green = rng.randint(start, end)
+        blue = rng.randint(start, end)
         if opacity is None:
             return red, green, blue
         return red, green, blue, opacity
 
     # draw image
 
-    def background(self, image):
-        Draw(image).rectangle([(0, 0), image.size], fill=self.random_color(238, 255))
+    def background(self, image, rng=random):
+        Draw(image).rectangle([(0, 0), image.size], fill=self.random_color(238, 255, rng=rng))
         return image
 
     @staticmethod
     def smooth(image):
         return image.filter(ImageFilter.SMOOTH)
 
-    def curve(self, image, width=4, number=6, color=None):
+    def curve(self, image, width=4, number=6, color=None, rng=random):
         dx, height = image.size
         dx /= number
-        path = [(dx * i, random.randint(0, height))
+        path = [(dx * i, rng.randint(0, height))
                 for i in range(1, number)]
         bcoefs = self._bezier.make_bezier(number - 1)
         points = []
@@ -107,7 +127,7 @@ class Captcha(object):
         Draw(image).line(points, fill=color if color else self._color, width=width)
         return image
 
-    def noise(self, image, number=50, level=2, color=None):
+    def noise(self, image, number=50, level=2, color=None, rng=random):
         width, height = image.size
         dx = width / 10
         width -= dx
@@ -115,28 +135,60 @@ class Captcha(object):
         height -= dy
         draw = Draw(image)
         for i in range(number):
-            x = int(random.uniform(dx, width))
-            y = int(random.uniform(dy, height))
+            x = int(rng.uniform(dx, width))
+            y = int(rng.uniform(dy, height))
             draw.line(((x, y), (x + level, y)), fill=color if color else self._color, width=level)
         return image
 
-    def text(self, image, fonts, font_sizes=None, drawings=None, squeeze_factor=0.75, color=None):
+    def font(self, name, size):
+        '''
+        返回指定字体文件和字号的字体，每种只加载一次
+        '''
+        if not self._cache:
+            return truetype(name, size)
+        font = self._fonts.get((name, size))
+        if font is None:
+            with self._font_lock:
+                font = self._fonts.get((name, size))
+                if font is None:
+                    font = self._fonts[(name, size)] = truetype(name, size)
+        return font
+
+    def _render_glyph(self, char, name, size):
+        '''
+        绘制单个字符的灰度蒙版，裁剪到字符的边界，结果由lru_cache缓存
+        蒙版与颜色无关，每个(字符, 字体, 字号)只需绘制一次
+        '''
+        with self._font_lock:
+            font = self.font(name, size)
+            _, _, c_width, c_height = font.getbbox(char)
+            glyph = Image.new('L', (c_width, c_height), 0)
+            Draw(glyph).text((0, 0), char, font=font, fill=255)
+        return glyph.crop(glyph.getbbox())
+
+    @staticmethod
+    def colorize(glyph, color):
+        '''
+        按蒙版把颜色画在黑色背景上，与直接用该颜色绘制字符的结果相同
+        '''
+        char_image = Image.new('RGB', glyph.size, (0, 0, 0))
+        char_image.paste(color[:3], (0, 0) + glyph.size, glyph)
+        return char_image
+
+    def text(self, image, fonts, font_sizes=None, drawings=None, squeeze_factor=0.75, color=None,
+             chars=None, rng=random):
         color = color if color else self._color
-        fonts = tuple([truetype(name, size)
-                       for name in fonts
-                       for size in font_sizes or (65, 70, 75)])
-        draw = Draw(image)
+        fonts = [(name, size)
+                 for name in fonts
+                 for size in font_sizes or (65, 70, 75)]
         char_images = []
-        for c in self._text:
-            font = random.choice(fonts)
-            c_width, c_height = draw.textsize(c, font=font)
-            char_image = Image.new('RGB', (c_width, c_height), (0, 0, 0))
-            char_draw = Draw(char_image)
-            char_draw.text((0, 0), c, font=font, fill=color)
-            char_image = char_image.crop(char_image.getbbox())
-            for drawing in drawings:
+        for c in chars if chars else self._text:
+            name, size = rng.choice(fonts)
+            # 缓存的蒙版是共用的，上色时创建新的图片，不会修改缓存
+            char_image = self.colorize(self._glyph(c, name, size), color)
+            for drawing in drawings or ():
                 d = getattr(self, drawing)
-                char_image = d(char_image)
+                char_image = d(char_image, rng=rng)
             char_images.append(char_image)
         width, height = image.size
         offset = int((width - sum(int(i.size[0] * squeeze_factor)
@@ -144,7 +196,7 @@ class Captcha(object):
                       char_images[-1].size[0]) / 2)
         for char_image in char_images:
             c_width, c_height = char_image.size
-            mask = char_image.convert('L').point(lambda i: i * 1.97)
+            mask = char_image.convert('L').point(MASK_TABLE)
             image.paste(char_image,
                         (offset, int((height - c_height) / 2)),
                         mask)
@@ -153,14 +205,14 @@ class Captcha(object):
 
     # draw text
     @staticmethod
-    def warp(image, dx_factor=0.27, dy_factor=0.21):
+    def warp(image, dx_factor=0.27, dy_factor=0.21, rng=random):
         width, height = image.size
         dx = width * dx_factor
         dy = height * dy_factor
-        x1 = int(random.uniform(-dx, dx))
-        y1 = int(random.uniform(-dy, dy))
-        x2 = int(random.uniform(-dx, dx))
-        y2 = int(random.uniform(-dy, dy))
+        x1 = int(rng.uniform(-dx, dx))
+        y1 = int(rng.uniform(-dy, dy))
+        x2 = int(rng.uniform(-dx, dx))
+        y2 = int(rng.uniform(-dy, dy))
         image2 = Image.new('RGB',
                            (width + abs(x1) + abs(x2),
                             height + abs(y1) + abs(y2)))
@@ -174,18 +226,18 @@ class Captcha(object):
              width2 - x2, -y1))
 
     @staticmethod
-    def offset(image, dx_factor=0.1, dy_factor=0.2):
+    def offset(image, dx_factor=0.1, dy_factor=0.2, rng=random):
         width, height = image.size
-        dx = int(random.random() * width * dx_factor)
-        dy = int(random.random() * height * dy_factor)
+        dx = int(rng.random() * width * dx_factor)
+        dy = int(rng.random() * height * dy_factor)
         image2 = Image.new('RGB', (width + dx, height + dy))
         image2.paste(image, (dx, dy))
         return image2
 
     @staticmethod
-    def rotate(image, angle=25):
+    def rotate(image, angle=25, rng=random):
         return image.rotate(
-            random.uniform(-angle, angle), Image.BILINEAR, expand=1)
+            rng.uniform(-angle, angle), Image.BILINEAR, expand=1)
 
     def captcha(self, path=None, fmt='JPEG'):
         """Create a captcha.
@@ -210,11 +262,100 @@ class Captcha(object):
         image.save(out, format=fmt)
         return text, out.getvalue()
 
+    def create(self, text=None, seed=None, width=200, height=75, color=None, fonts=None, fmt='JPEG'):
+        '''
+        生成一张验证码，只使用局部变量，可以在多个线程中同时调用
+        1.用seed创建独立的随机数生成器，相同的seed总是得到相同的文字和图片
+        2.确定文字和颜色，没有指定时随机生成4个字符
+        3.依次绘制背景、文字、曲线和噪点，平滑后编码
+        返回 (验证码文字, 图片数据)
+        '''
+        # 1.独立的随机数生成器
+        rng = random.Random(seed)
+        # 2.文字和颜色
+        chars = list(text) if text else rng.sample(CHARACTERS, 4)
+        color = color if color else self.random_color(0, 200, rng.randint(220, 255), rng=rng)
+        # 3.绘制和编码
+        image = Image.new('RGB', (width, height), (255, 255, 255))
+        image = self.background(image, rng=rng)
+        image = self.text(image, fonts or self.default_fonts, drawings=['warp', 'rotate', 'offset'],
+                          color=color, chars=chars, rng=rng)
+        image = self.curve(image, color=color, rng=rng)
+        image = self.noise(image, color=color, rng=rng)
+        image = self.smooth(image)
+        out = BytesIO()
+        image.save(out, format=fmt)
+        return "".join(chars), out.getvalue()
+
     def generate_captcha(self):
-        self.initialize()
-        return self.captcha("")
+        return self.create()
 
 captcha = Captcha.instance()
 
+
+class BaselineCaptcha(Captcha):
+    '''
+    优化前的文字绘制，只用于benchmark对比：
+    每次调用都用truetype()加载全部字体和字号，直接用颜色绘制字符，蒙版用python函数逐像素计算
+    '''
+
+    def __init__(self):
+        super().__init__(cache=False)
+
+    def text(self, image, fonts, font_sizes=None, drawings=None, squeeze_factor=0.75, color=None,
+             chars=None, rng=random):
+        color = color if color else self._color
+        fonts = tuple([truetype(name, size)
+                       for name in fonts
+                       for size in font_sizes or (65, 70, 75)])
+        char_images = []
+        for c in chars if chars else self._text:
+            font = rng.choice(fonts)
+            # 原先的draw.textsize在新版Pillow中已移除，用getbbox得到相同的宽高
+            _, _, c_width, c_height = font.getbbox(c)
+            char_image = Image.new('RGB', (c_width, c_height), (0, 0, 0))
+            Draw(char_image).text((0, 0), c, font=font, fill=color)
+            char_image = char_image.crop(char_image.getbbox())
+            for drawing in drawings or ():
+                d = getattr(self, drawing)
+                char_image = d(char_image, rng=rng)
+            char_images.append(char_image)
+        width, height = image.size
+        offset = int((width - sum(int(i.size[0] * squeeze_factor)
+                                  for i in char_images[:-1]) -
+                      char_images[-1].size[0]) / 2)
+        for char_image in char_images:
+            c_width, c_height = char_image.size
+            mask = char_image.convert('L').point(lambda i: i * 1.97)
+            image.paste(char_image,
+                        (offset, int((height - c_height) / 2)),
+                        mask)
+            offset += int(c_width * squeeze_factor)
+        return image
+
+
+def benchmark(count=200):
+    '''
+    对比优化前后每秒生成的验证码数量
+    1.baseline：BaselineCaptcha，每次加载字体、逐像素计算蒙版
+    2.cached：共用的captcha实例，字体和字符蒙版都已缓存，输出缓存命中率
+    '''
+    rates = {}
+    for name, instance in (('baseline', BaselineCaptcha()), ('cached', captcha)):
+        # 先生成一张，cached的字体在这里加载
+        instance.generate_captcha()
+        start = time.perf_counter()
+        for _ in range(count):
+            instance.generate_captcha()
+        rates[name] = count / (time.perf_counter() - start)
+        print('%-8s %.1f captchas/s' % (name, rates[name]))
+    info = captcha._glyph.cache_info()
+    print('speedup %.1fx, glyph cache hits %d, misses %d'
+          % (rates['cached'] / rates['baseline'], info.hits, info.misses))
+
+
 if __name__ == '__main__':
-    print(captcha.generate_captcha())
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        benchmark(*[int(arg) for arg in sys.argv[2:3]])
+    else:
+        print(captcha.generate_captcha())
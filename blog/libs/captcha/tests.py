@@ -0,0 +1,50 @@
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import SimpleTestCase
+
+from libs.captcha.captcha import CHARACTERS, Captcha, captcha
+
+
+class CaptchaCreateTest(SimpleTestCase):
+    '''
+    Captcha.create() 只使用局部状态，多个线程共用同一个实例时，
+    每个seed生成的文字和图片与单线程中重新生成的完全相同
+    '''
+
+    threads = 16
+    count = 20
+
+    def test_same_seed_same_captcha(self):
+        text, image = captcha.create(seed=1234)
+        self.assertEqual(captcha.create(seed=1234), (text, image))
+        self.assertEqual(len(text), 4)
+        self.assertTrue(set(text) <= set(CHARACTERS))
+        self.assertTrue(image.startswith(b'\xff\xd8'))
+
+    def test_fixed_text(self):
+        text, _ = captcha.create(text='AB34', seed=1)
+        self.assertEqual(text, 'AB34')
+
+    def test_threads_match_single_thread(self):
+        '''
+        1.多个线程同时用不同的seed生成验证码，线程启动后一起开始
+        2.在当前线程中按相同的seed重新生成，文字和图片都要一致
+        '''
+        # 1.多个线程同时生成
+        barrier = threading.Barrier(self.threads)
+        seeds = random.Random(2022).sample(range(2 ** 32), self.threads * self.count)
+
+        def worker(index):
+            barrier.wait()
+            chunk = seeds[index * self.count:(index + 1) * self.count]
+            return [(seed,) + captcha.create(seed=seed) for seed in chunk]
+
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            results = [row for rows in executor.map(worker, range(self.threads)) for row in rows]
+        self.assertEqual(len(results), len(seeds))
+        # 2.单线程重新生成，使用没有缓存的新实例，同时验证缓存不影响结果
+        fresh = Captcha(cache=False)
+        for seed, text, image in results:
+            self.assertEqual(fresh.create(seed=seed), (text, image), 'seed %d' % seed)
@@ -13,9 +13,9 @@
 from hashlib import md5
 import base64
 import datetime
-from urllib import request as urllib2
 import json
-from .xmltojson import xmltojson
+from .transport import HTTPSTransport
+from . import xmlparser
 
 
 class REST:
@@ -30,6 +30,9 @@ class REST:
     Iflog = False  # 是否打印日志
     Batch = ''  # 时间戳
     BodyType = 'xml'  # 包体格式，可填值：json 、xml
+    Transport = None  # 发送请求使用的连接池
+    ConnectTimeout = 5  # 建立连接的超时秒数
+    ReadTimeout = 10  # 等待响应的超时秒数
 
     # 初始化
     # @param serverIP       必选参数    服务器地址
@@ -65,6 +68,29 @@ class REST:
     def setAppId(self, AppId):
         self.AppId = AppId
 
+    # 设置超时时间
+    #
+    # @param connectTimeout  必选参数    建立连接的超时秒数
+    # @param readTimeout  必选参数    等待响应的超时秒数
+
+    def setTimeout(self, connectTimeout, readTimeout):
+        self.ConnectTimeout = connectTimeout
+        self.ReadTimeout = readTimeout
+        self.Transport = None
+
+    # 设置发送请求使用的连接池
+    #
+    # @param transport  必选参数    提供request(method, path, body, headers)方法的对象
+
+    def setTransport(self, transport):
+        self.Transport = transport
+
+    def getTransport(self):
+        if self.Transport is None:
+            self.Transport = HTTPSTransport(self.ServerIP, self.ServerPort, connect_timeout=self.ConnectTimeout,
+                                            read_timeout=self.ReadTimeout)
+        return self.Transport
+
     def log(self, url, body, data):
         print('这是请求的URL：')
         print(url)
@@ -74,47 +100,50 @@ class REST:
         print(data)
         print('********************************')
 
-    # 创建子账号
-    # @param friendlyName   必选参数      子帐号名称
-    def CreateSubAccount(self, friendlyName):
+    # 生成请求，返回(请求方法, 请求路径, 完整URL, 包体, 包头)
+    # @param path     必选参数    接口路径，例如 /SMS/TemplateSMS
+    # @param body     可选参数    包体，为None时发送GET请求
+    # @param query    可选参数    追加在sig之后的查询参数
+    # @param headers  可选参数    包头，默认按BodyType生成
+    def buildRequest(self, path, body=None, query='', headers=None):
 
         self.accAuth()
         nowdate = datetime.datetime.now()
-        self.Batch = nowdate.strftime("%Y%m%d%H%M%S")
+        # 时间戳使用局部变量，多个线程共用一个REST对象时sig和auth不会错乱
+        batch = self.Batch = nowdate.strftime("%Y%m%d%H%M%S")
         # 生成sig
-        signature = self.AccountSid + self.AccountToken + self.Batch
+        signature = self.AccountSid + self.AccountToken + batch
         sig = md5(signature.encode()).hexdigest().upper()
         # 拼接URL
-        url = "https://" + self.ServerIP + ":" + self.ServerPort + "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + "/SubAccounts?sig=" + sig
+        path = "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + path + "?sig=" + sig + query
+        url = "https://" + self.ServerIP + ":" + self.ServerPort + path
         # 生成auth
-        src = self.AccountSid + ":" + self.Batch
+        src = self.AccountSid + ":" + batch
         auth = base64.encodebytes(src.encode()).decode().strip()
-        req = urllib2.Request(url)
-        self.setHttpHeader(req)
-        req.add_header("Authorization", auth)
+        headers = dict(headers or self.httpHeaders())
+        headers["Authorization"] = auth
+        payload = body.encode() if isinstance(body, str) else body
+        return 'GET' if body is None else 'POST', path, url, payload, headers
+
+    # 解析响应包体
+    # @param data     必选参数    响应包体
+    # @param bodyType 可选参数    响应的包体格式，默认为BodyType
+    # @param main2    可选参数    xml响应是否按xmltojson.main2的结构解析
+    def parseResponse(self, data, bodyType=None, main2=False):
+        if (bodyType or self.BodyType) == 'json':
+            # json格式
+            return json.loads(data)
         # xml格式
-        body = '''<?xml version="1.0" encoding="utf-8"?><SubAccount><appId>%s</appId>\
-            <friendlyName>%s</friendlyName>\
-            </SubAccount>\
-            ''' % (self.AppId, friendlyName)
+        return xmlparser.parse2(data) if main2 else xmlparser.parse(data)
 
-        if self.BodyType == 'json':
-            # json格式
-            body = '''{"friendlyName": "%s", "appId": "%s"}''' % (friendlyName, self.AppId)
+    # 所有接口共用的请求发送过程，参数见buildRequest和parseResponse
+    def send(self, path, body=None, query='', headers=None, bodyType=None, main2=False):
+
+        method, path, url, payload, headers = self.buildRequest(path, body, query, headers)
         data = ''
-        req.data = body.encode()
         try:
-            res = urllib2.urlopen(req)
-            data = res.read()
-            res.close()
-
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
+            data = self.getTransport().request(method, path, payload, headers)
+            locations = self.parseResponse(data, bodyType, main2)
             if self.Iflog:
                 self.log(url, body, data)
             return locations
@@ -123,26 +152,26 @@ class REST:
                 self.log(url, body, data)
             return {'172001': '网络错误'}
 
+    # 创建子账号
+    # @param friendlyName   必选参数      子帐号名称
+    def CreateSubAccount(self, friendlyName):
+
+        # xml格式
+        body = '''<?xml version="1.0" encoding="utf-8"?><SubAccount><appId>%s</appId>\
+            <friendlyName>%s</friendlyName>\
+            </SubAccount>\
+            ''' % (self.AppId, friendlyName)
+
+        if self.BodyType == 'json':
+            # json格式
+            body = '''{"friendlyName": "%s", "appId": "%s"}''' % (friendlyName, self.AppId)
+        return self.send("/SubAccounts", body)
+
     #  获取子帐号
     # @param startNo  可选参数    开始的序号，默认从0开始
     # @param offset 可选参数     一次查询的最大条数，最小是1条，最大是100条
     def getSubAccounts(self, startNo, offset):
 
-        self.accAuth()
-        nowdate = datetime.datetime.now()
-        self.Batch = nowdate.strftime("%Y%m%d%H%M%S")
-        # 生成sig
-        signature = self.AccountSid + self.AccountToken + self.Batch
-        sig = md5(signature.encode()).hexdigest().upper()
-        # 拼接URL
-        url = "https://" + self.ServerIP + ":" + self.ServerPort + "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + "/GetSubAccounts?sig=" + sig
-        # 生成auth
-        src = self.AccountSid + ":" + self.Batch
-        # auth = base64.encodestring(src).strip()
-        auth = base64.encodebytes(src.encode()).decode().strip()
-        req = urllib2.Request(url)
-        self.setHttpHeader(req)
-        req.add_header("Authorization", auth)
         # xml格式
         body = '''<?xml version="1.0" encoding="utf-8"?><SubAccount><appId>%s</appId>\
             <startNo>%s</startNo><offset>%s</offset>\
@@ -152,50 +181,13 @@ class REST:
         if self.BodyType == 'json':
             # json格式
             body = '''{"appId": "%s", "startNo": "%s", "offset": "%s"}''' % (self.AppId, startNo, offset)
-        data = ''
-        req.data = body.encode()
-        try:
-            res = urllib2.urlopen(req)
-            data = res.read()
-            res.close()
-
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
-            if self.Iflog:
-                self.log(url, body, data)
-            return locations
-        except Exception as error:
-            if self.Iflog:
-                self.log(url, body, data)
-            return {'172001': '网络错误'}
+        return self.send("/GetSubAccounts", body)
 
     # 子帐号信息查询
     # @param friendlyName 必选参数   子帐号名称
 
     def querySubAccount(self, friendlyName):
 
-        self.accAuth()
-        nowdate = datetime.datetime.now()
-        self.Batch = nowdate.strftime("%Y%m%d%H%M%S")
-        # 生成sig
-        signature = self.AccountSid + self.AccountToken + self.Batch
-        sig = md5(signature.encode()).hexdigest().upper()
-        # 拼接URL
-        url = "https://" + self.ServerIP + ":" + self.ServerPort + "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + "/QuerySubAccountByName?sig=" + sig
-        # 生成auth
-        src = self.AccountSid + ":" + self.Batch
-        # auth = base64.encodestring(src).strip()
-        auth = base64.encodebytes(src.encode()).decode().strip()
-        req = urllib2.Request(url)
-        self.setHttpHeader(req)
-
-        req.add_header("Authorization", auth)
-
         # 创建包体
         body = '''<?xml version="1.0" encoding="utf-8"?><SubAccount><appId>%s</appId>\
             <friendlyName>%s</friendlyName>\
@@ -203,27 +195,7 @@ class REST:
             ''' % (self.AppId, friendlyName)
         if self.BodyType == 'json':
             body = '''{"friendlyName": "%s", "appId": "%s"}''' % (friendlyName, self.AppId)
-        data = ''
-        req.data = body.encode()
-        try:
-            res = urllib2.urlopen(req)
-            data = res.read()
-            res.close()
-
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
-            if self.Iflog:
-                self.log(url, body, data)
-            return locations
-        except Exception as error:
-            if self.Iflog:
-                self.log(url, body, data)
-            return {'172001': '网络错误'}
+        return self.send("/QuerySubAccountByName", body)
 
     # 发送模板短信
     # @param to  必选参数     短信接收彿手机号码集合,用英文逗号分开
@@ -231,21 +203,6 @@ class REST:
     # @param tempId 必选参数    模板Id
     def sendTemplateSMS(self, to, datas, tempId):
 
-        self.accAuth()
-        nowdate = datetime.datetime.now()
-        self.Batch = nowdate.strftime("%Y%m%d%H%M%S")
-        # 生成sig
-        signature = self.AccountSid + self.AccountToken + self.Batch
-        sig = md5(signature.encode()).hexdigest().upper()
-        # 拼接URL
-        url = "https://" + self.ServerIP + ":" + self.ServerPort + "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + "/SMS/TemplateSMS?sig=" + sig
-        # 生成auth
-        src = self.AccountSid + ":" + self.Batch
-        # auth = base64.encodestring(src).strip()
-        auth = base64.encodebytes(src.encode()).decode().strip()
-        req = urllib2.Request(url)
-        self.setHttpHeader(req)
-        req.add_header("Authorization", auth)
         # 创建包体
         b = ''
         for a in datas:
@@ -261,27 +218,7 @@ class REST:
                 b += '"%s",' % (a)
             b += ']'
             body = '''{"to": "%s", "datas": %s, "templateId": "%s", "appId": "%s"}''' % (to, b, tempId, self.AppId)
-        req.data = body.encode()
-        data = ''
-        try:
-            res = urllib2.urlopen(req)
-            data = res.read()
-            res.close()
-
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
-            if self.Iflog:
-                self.log(url, body, data)
-            return locations
-        except Exception as error:
-            if self.Iflog:
-                self.log(url, body, data)
-            return {'172001': '网络错误'}
+        return self.send("/SMS/TemplateSMS", body)
 
     # 外呼通知
     # @param to 必选参数    被叫号码
@@ -300,22 +237,6 @@ class REST:
     def landingCall(self, to, mediaName, mediaTxt, displayNum, playTimes, respUrl, userData, maxCallTime, speed, volume,
                     pitch, bgsound):
 
-        self.accAuth()
-        nowdate = datetime.datetime.now()
-        self.Batch = nowdate.strftime("%Y%m%d%H%M%S")
-        # 生成sig
-        signature = self.AccountSid + self.AccountToken + self.Batch
-        sig = md5(signature.encode()).hexdigest().upper()
-        # 拼接URL
-        url = "https://" + self.ServerIP + ":" + self.ServerPort + "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + "/Calls/LandingCalls?sig=" + sig
-        # 生成auth
-        src = self.AccountSid + ":" + self.Batch
-        # auth = base64.encodestring(src).strip()
-        auth = base64.encodebytes(src.encode()).decode().strip()
-        req = urllib2.Request(url)
-        self.setHttpHeader(req)
-        req.add_header("Authorization", auth)
-
         # 创建包体
         body = '''<?xml version="1.0" encoding="utf-8"?><LandingCall>\
             <to>%s</to><mediaName>%s</mediaName><mediaTxt>%s</mediaTxt><appId>%s</appId><displayNum>%s</displayNum>\
@@ -328,27 +249,7 @@ class REST:
             body = '''{"to": "%s", "mediaName": "%s","mediaTxt": "%s","appId": "%s","displayNum": "%s","playTimes": "%s","respUrl": "%s","userData": "%s","maxCallTime": "%s","speed": "%s","volume": "%s","pitch": "%s","bgsound": "%s"}''' % (
             to, mediaName, mediaTxt, self.AppId, displayNum, playTimes, respUrl, userData, maxCallTime, speed, volume,
             pitch, bgsound)
-        req.data = body.encode()
-        data = ''
-        try:
-            res = urllib2.urlopen(req)
-            data = res.read()
-            res.close()
-
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
-            if self.Iflog:
-                self.log(url, body, data)
-            return locations
-        except Exception as error:
-            if self.Iflog:
-                self.log(url, body, data)
-            return {'172001': '网络错误'}
+        return self.send("/Calls/LandingCalls", body)
 
     # 语音验证码
     # @param verifyCode  必选参数   验证码内容，为数字和英文字母，不区分大小写，长度4-8位
@@ -361,23 +262,6 @@ class REST:
 
     def voiceVerify(self, verifyCode, playTimes, to, displayNum, respUrl, lang, userData):
 
-        self.accAuth()
-        nowdate = datetime.datetime.now()
-        self.Batch = nowdate.strftime("%Y%m%d%H%M%S")
-        # 生成sig
-        signature = self.AccountSid + self.AccountToken + self.Batch
-        sig = md5(signature.encode()).hexdigest().upper()
-        # 拼接URL
-        url = "https://" + self.ServerIP + ":" + self.ServerPort + "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + "/Calls/VoiceVerify?sig=" + sig
-        # 生成auth
-        src = self.AccountSid + ":" + self.Batch
-        # auth = base64.encodestring(src).strip()
-        auth = base64.encodebytes(src.encode()).decode().strip()
-        req = urllib2.Request(url)
-        self.setHttpHeader(req)
-
-        req.add_header("Authorization", auth)
-
         # 创建包体
         body = '''<?xml version="1.0" encoding="utf-8"?><VoiceVerify>\
             <appId>%s</appId><verifyCode>%s</verifyCode><playTimes>%s</playTimes><to>%s</to><respUrl>%s</respUrl>\
@@ -387,27 +271,7 @@ class REST:
             # if this model is Json ..then do next code 
             body = '''{"appId": "%s", "verifyCode": "%s","playTimes": "%s","to": "%s","respUrl": "%s","displayNum": "%s","lang": "%s","userData": "%s"}''' % (
             self.AppId, verifyCode, playTimes, to, respUrl, displayNum, lang, userData)
-        req.data = body.encode()
-        data = ''
-        try:
-            res = urllib2.urlopen(req)
-            data = res.read()
-            res.close()
-
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
-            if self.Iflog:
-                self.log(url, body, data)
-            return locations
-        except Exception as error:
-            if self.Iflog:
-                self.log(url, body, data)
-            return {'172001': '网络错误'}
+        return self.send("/Calls/VoiceVerify", body)
 
     # IVR外呼
     # @param number  必选参数     待呼叫号码，为Dial节点的属性
@@ -416,22 +280,6 @@ class REST:
 
     def ivrDial(self, number, userdata, record):
 
-        self.accAuth()
-        nowdate = datetime.datetime.now()
-        self.Batch = nowdate.strftime("%Y%m%d%H%M%S")
-        # 生成sig
-        signature = self.AccountSid + self.AccountToken + self.Batch;
-        sig = md5(signature.encode()).hexdigest().upper()
-        # 拼接URL
-        url = "https://" + self.ServerIP + ":" + self.ServerPort + "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + "/ivr/dial?sig=" + sig
-        # 生成auth
-        src = self.AccountSid + ":" + self.Batch
-        auth = base64.encodebytes(src.encode()).decode().strip()
-        req = urllib2.Request(url)
-        req.add_header("Accept", "application/xml")
-        req.add_header("Content-Type", "application/xml;charset=utf-8")
-        req.add_header("Authorization", auth)
-
         # 创建包体
         body = '''<?xml version="1.0" encoding="utf-8"?>
                 <Request>
@@ -439,42 +287,15 @@ class REST:
                     <Dial number="%s"  userdata="%s" record="%s"></Dial>
                 </Request>
             ''' % (self.AppId, number, userdata, record)
-        req.data = body.encode()
-        data = ''
-        try:
-            res = urllib2.urlopen(req)
-            data = res.read()
-            res.close()
-            xtj = xmltojson()
-            locations = xtj.main(data)
-            if self.Iflog:
-                self.log(url, body, data)
-            return locations
-        except Exception as error:
-            if self.Iflog:
-                self.log(url, body, data)
-            return {'172001': '网络错误'}
+        # 该接口只支持xml格式
+        headers = {"Accept": "application/xml", "Content-Type": "application/xml;charset=utf-8"}
+        return self.send("/ivr/dial", body, headers=headers, bodyType='xml')
 
     # 话单下载
     # @param date   必选参数    day 代表前一天的数据（从00:00 – 23:59），目前只支持按天查询
     # @param keywords  可选参数     客户的查询条件，由客户自行定义并提供给云通讯平台。默认不填忽略此参数
     def billRecords(self, date, keywords):
 
-        self.accAuth()
-        nowdate = datetime.datetime.now()
-        self.Batch = nowdate.strftime("%Y%m%d%H%M%S")
-        # 生成sig
-        signature = self.AccountSid + self.AccountToken + self.Batch
-        sig = md5(signature.encode()).hexdigest().upper()
-        # 拼接URL
-        url = "https://" + self.ServerIP + ":" + self.ServerPort + "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + "/BillRecords?sig=" + sig
-        # 生成auth
-        src = self.AccountSid + ":" + self.Batch
-        auth = base64.encodebytes(src.encode()).decode().strip()
-        req = urllib2.Request(url)
-        self.setHttpHeader(req)
-        req.add_header("Authorization", auth)
-
         # 创建包体
         body = '''<?xml version="1.0" encoding="utf-8"?><BillRecords>\
             <appId>%s</appId><date>%s</date><keywords>%s</keywords>\
@@ -483,90 +304,19 @@ class REST:
         if self.BodyType == 'json':
             # if this model is Json ..then do next code 
             body = '''{"appId": "%s", "date": "%s","keywords": "%s"}''' % (self.AppId, date, keywords)
-        req.data = body.encode()
-        data = ''
-        try:
-            res = urllib2.urlopen(req)
-            data = res.read()
-
-            res.close()
-
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
-            if self.Iflog:
-                self.log(url, body, data)
-            return locations
-        except Exception as error:
-            if self.Iflog:
-                self.log(url, body, data)
-            return {'172001': '网络错误'}
+        return self.send("/BillRecords", body)
 
     # 主帐号信息查询
 
     def queryAccountInfo(self):
 
-        self.accAuth()
-        nowdate = datetime.datetime.now()
-        self.Batch = nowdate.strftime("%Y%m%d%H%M%S")
-        # 生成sig
-        signature = self.AccountSid + self.AccountToken + self.Batch
-        sig = md5(signature.encode()).hexdigest().upper()
-        # 拼接URL
-        url = "https://" + self.ServerIP + ":" + self.ServerPort + "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + "/AccountInfo?sig=" + sig
-        # 生成auth
-        src = self.AccountSid + ":" + self.Batch
-        auth = base64.encodebytes(src.encode()).decode().strip()
-        req = urllib2.Request(url)
-        self.setHttpHeader(req)
-        body = ''
-        req.add_header("Authorization", auth)
-        data = ''
-        try:
-            res = urllib2.urlopen(req)
-            data = res.read()
-            res.close()
-
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
-            if self.Iflog:
-                self.log(url, body, data)
-            return locations
-        except Exception as error:
-            if self.Iflog:
-                self.log(url, body, data)
-            return {'172001': '网络错误'}
+        return self.send("/AccountInfo")
 
     # 短信模板查询
     # @param templateId  必选参数   模板Id，不带此参数查询全部可用模板 
 
     def QuerySMSTemplate(self, templateId):
 
-        self.accAuth()
-        nowdate = datetime.datetime.now()
-        self.Batch = nowdate.strftime("%Y%m%d%H%M%S")
-        # 生成sig
-        signature = self.AccountSid + self.AccountToken + self.Batch
-        sig = md5(signature.encode()).hexdigest().upper()
-        # 拼接URL
-        url = "https://" + self.ServerIP + ":" + self.ServerPort + "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + "/SMS/QuerySMSTemplate?sig=" + sig
-        # 生成auth
-        src = self.AccountSid + ":" + self.Batch
-        auth = base64.encodebytes(src.encode()).decode().strip()
-        req = urllib2.Request(url)
-        self.setHttpHeader(req)
-
-        req.add_header("Authorization", auth)
-
         # 创建包体
         body = '''<?xml version="1.0" encoding="utf-8"?><Request>\
             <appId>%s</appId><templateId>%s</templateId></Request>
@@ -574,89 +324,20 @@ class REST:
         if self.BodyType == 'json':
             # if this model is Json ..then do next code 
             body = '''{"appId": "%s", "templateId": "%s"}''' % (self.AppId, templateId)
-        req.data = body.encode()
-        data = ''
-        try:
-            res = urllib2.urlopen(req)
-            data = res.read()
-            res.close()
-
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main2(data)
-            if self.Iflog:
-                self.log(url, body, data)
-            return locations
-        except Exception as error:
-            if self.Iflog:
-                self.log(url, body, data)
-            return {'172001': '网络错误'}
+        return self.send("/SMS/QuerySMSTemplate", body, main2=True)
 
     # 呼叫结果查询
     # @param callsid   必选参数    呼叫ID
 
     def CallResult(self, callSid):
 
-        self.accAuth()
-        nowdate = datetime.datetime.now()
-        self.Batch = nowdate.strftime("%Y%m%d%H%M%S")
-        # 生成sig
-        signature = self.AccountSid + self.AccountToken + self.Batch
-        sig = md5(signature.encode()).hexdigest().upper()
-        # 拼接URL
-        url = "https://" + self.ServerIP + ":" + self.ServerPort + "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + "/CallResult?sig=" + sig + "&callsid=" + callSid
-        # 生成auth
-        src = self.AccountSid + ":" + self.Batch
-        auth = base64.encodebytes(src.encode()).decode().strip()
-        req = urllib2.Request(url)
-        self.setHttpHeader(req)
-        body = ''
-        req.add_header("Authorization", auth)
-        data = ''
-        try:
-            res = urllib2.urlopen(req)
-            data = res.read()
-            res.close()
-
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
-            if self.Iflog:
-                self.log(url, body, data)
-            return locations
-        except Exception as error:
-            if self.Iflog:
-                self.log(url, body, data)
-            return {'172001': '网络错误'}
+        return self.send("/CallResult", query="&callsid=" + callSid)
 
     # 呼叫状态查询
     # @param callid   必选参数    一个由32个字符组成的电话唯一标识符
     # @param action      可选参数     查询结果通知的回调url地址 
     def QueryCallState(self, callid, action):
 
-        self.accAuth()
-        nowdate = datetime.datetime.now()
-        self.Batch = nowdate.strftime("%Y%m%d%H%M%S")
-        # 生成sig
-        signature = self.AccountSid + self.AccountToken + self.Batch
-        sig = md5(signature.encode()).hexdigest().upper()
-        # 拼接URL
-        url = "https://" + self.ServerIP + ":" + self.ServerPort + "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + "/ivr/call?sig=" + sig + "&callid=" + callid
-        # 生成auth
-        src = self.AccountSid + ":" + self.Batch
-        auth = base64.encodebytes(src.encode()).decode().strip()
-        req = urllib2.Request(url)
-        self.setHttpHeader(req)
-        req.add_header("Authorization", auth)
-
         # 创建包体
         body = '''<?xml version="1.0" encoding="utf-8"?><Request>\
             <Appid>%s</Appid><QueryCallState callid="%s" action="%s"/>\
@@ -665,78 +346,19 @@ class REST:
         if self.BodyType == 'json':
             # if this model is Json ..then do next code 
             body = '''{"Appid":"%s","QueryCallState":{"callid":"%s","action":"%s"}}''' % (self.AppId, callid, action)
-        req.data = body.encode()
-        data = ''
-        try:
-            res = urllib2.urlopen(req)
-            data = res.read()
-
-            res.close()
-
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
-            if self.Iflog:
-                self.log(url, body, data)
-            return locations
-        except Exception as error:
-            if self.Iflog:
-                self.log(url, body, data)
-            return {'172001': '网络错误'}
+        return self.send("/ivr/call", body, query="&callid=" + callid)
 
     # 语音文件上传
     # @param filename   必选参数    文件名
     # @param body      必选参数     二进制串
     def MediaFileUpload(self, filename, body):
 
-        self.accAuth()
-        nowdate = datetime.datetime.now()
-        self.Batch = nowdate.strftime("%Y%m%d%H%M%S")
-        # 生成sig
-        signature = self.AccountSid + self.AccountToken + self.Batch
-        sig = md5(signature.encode()).hexdigest().upper()
-        # 拼接URL
-        url = "https://" + self.ServerIP + ":" + self.ServerPort + "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + "/Calls/MediaFileUpload?sig=" + sig + "&appid=" + self.AppId + "&filename=" + filename
-        # 生成auth
-        src = self.AccountSid + ":" + self.Batch
-        auth = base64.encodebytes(src.encode()).decode().strip()
-        req = urllib2.Request(url)
-        req.add_header("Authorization", auth)
         if self.BodyType == 'json':
-            req.add_header("Accept", "application/json")
-            req.add_header("Content-Type", "application/octet-stream")
-
+            headers = {"Accept": "application/json", "Content-Type": "application/octet-stream"}
         else:
-            req.add_header("Accept", "application/xml")
-            req.add_header("Content-Type", "application/octet-stream")
-
-        # 创建包体
-        req.data = body.encode()
-
-        try:
-            res = urllib2.urlopen(req)
-            data = res.read()
-
-            res.close()
-
-            if self.BodyType == 'json':
-                # json格式
-                locations = json.loads(data)
-            else:
-                # xml格式
-                xtj = xmltojson()
-                locations = xtj.main(data)
-            if self.Iflog:
-                self.log(url, body, data)
-            return locations
-        except Exception as error:
-            if self.Iflog:
-                self.log(url, body, data)
-            return {'172001': '网络错误'}
+            headers = {"Accept": "application/xml", "Content-Type": "application/octet-stream"}
+        return self.send("/Calls/MediaFileUpload", body, query="&appid=" + self.AppId + "&filename=" + filename,
+                         headers=headers)
 
     # 子帐号鉴权
     def subAuth(self):
@@ -790,12 +412,15 @@ class REST:
             print('172012')
             print('应用ID为空')
 
-    # 设置包头
-    def setHttpHeader(self, req):
+    # 生成包头
+    def httpHeaders(self):
         if self.BodyType == 'json':
-            req.add_header("Accept", "application/json")
-            req.add_header("Content-Type", "application/json;charset=utf-8")
+            return {"Accept": "application/json", "Content-Type": "application/json;charset=utf-8"}
 
         else:
-            req.add_header("Accept", "application/xml")
-            req.add_header("Content-Type", "application/xml;charset=utf-8")
+            return {"Accept": "application/xml", "Content-Type": "application/xml;charset=utf-8"}
+
+    # 设置包头
+    def setHttpHeader(self, req):
+        for key, value in self.httpHeaders().items():
+            req.add_header(key, value)
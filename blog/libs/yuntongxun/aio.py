@@ -0,0 +1,167 @@
+# -*- coding: UTF-8 -*-
+# 云通讯REST SDK的asyncio版本，签名、包头和响应解析与REST完全相同，只有发送请求的过程是异步的
+import asyncio
+import ssl
+
+from .CCPRestSDK import REST
+
+
+class AsyncTransport(object):
+    """基于asyncio.open_connection的HTTP/1.1长连接池，只能在创建连接的事件循环中使用"""
+
+    # @param host             必选参数    服务器地址
+    # @param port             必选参数    服务器端口
+    # @param connect_timeout  可选参数    建立连接的超时秒数
+    # @param read_timeout     可选参数    等待响应的超时秒数
+    # @param pool_size        可选参数    最多保持的空闲连接数
+    # @param max_connections  可选参数    同时使用的最大连接数，超出的请求排队等待
+    # @param context          可选参数    ssl.SSLContext，默认校验服务器证书
+    # @param scheme           可选参数    https或http
+    def __init__(self, host, port, connect_timeout=5, read_timeout=10, pool_size=100, max_connections=100,
+                 context=None, scheme='https'):
+        self.host = host
+        self.port = int(port)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_size = pool_size
+        self.max_connections = max_connections
+        self.context = context
+        self.scheme = scheme
+        self._idle = []
+        self._semaphore = None
+        self.connections_created = 0
+
+    async def _connect(self):
+        context = None
+        if self.scheme == 'https':
+            context = self.context or ssl.create_default_context()
+        connection = await asyncio.wait_for(asyncio.open_connection(self.host, self.port, ssl=context),
+                                            self.connect_timeout)
+        self.connections_created += 1
+        return connection
+
+    def _release(self, connection):
+        if len(self._idle) < self.pool_size:
+            self._idle.append(connection)
+        else:
+            connection[1].close()
+
+    async def _exchange(self, connection, method, path, body, headers):
+        reader, writer = connection
+        lines = ['%s %s HTTP/1.1' % (method, path), 'Host: %s:%s' % (self.host, self.port)]
+        lines.extend('%s: %s' % item for item in headers.items())
+        if body is not None:
+            lines.append('Content-Length: %d' % len(body))
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + (body or b''))
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError('服务器关闭了连接')
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            data = b''.join(chunks)
+            will_close = response_headers.get('connection', '').lower() == 'close'
+        elif 'content-length' in response_headers:
+            data = await reader.readexactly(int(response_headers['content-length']))
+            will_close = response_headers.get('connection', '').lower() == 'close'
+        else:
+            # 没有长度信息时读到连接关闭为止
+            data = await reader.read()
+            will_close = True
+        if status >= 400:
+            will_close = True
+        return data, will_close
+
+    async def request(self, method, path, body=None, headers=None):
+        """发送请求并返回响应包体"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_connections)
+        async with self._semaphore:
+            reused = bool(self._idle)
+            connection = self._idle.pop() if reused else await self._connect()
+            try:
+                data, will_close = await asyncio.wait_for(
+                    self._exchange(connection, method, path, body, headers or {}), self.read_timeout)
+            except (ConnectionResetError, BrokenPipeError, asyncio.IncompleteReadError) as error:
+                connection[1].close()
+                if not reused:
+                    raise
+                # 复用的空闲连接已被服务器关闭，换一个新连接重试一次
+                connection = await self._connect()
+                try:
+                    data, will_close = await asyncio.wait_for(
+                        self._exchange(connection, method, path, body, headers or {}), self.read_timeout)
+                except BaseException:
+                    connection[1].close()
+                    raise
+            except BaseException:
+                connection[1].close()
+                raise
+            if will_close:
+                connection[1].close()
+            else:
+                self._release(connection)
+            return data
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for reader, writer in idle:
+            writer.close()
+        for reader, writer in idle:
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, ssl.SSLError):
+                pass
+
+
+class AsyncREST(REST):
+    """与REST的方法完全相同，但每个接口方法都返回协程，需要await
+
+    rest = AsyncREST(serverIP, serverPort, softVersion)
+    result = await rest.sendTemplateSMS(to, datas, tempId)
+    """
+
+    MaxConnections = 100  # 同时使用的最大连接数
+
+    def getTransport(self):
+        if self.Transport is None:
+            self.Transport = AsyncTransport(self.ServerIP, self.ServerPort, connect_timeout=self.ConnectTimeout,
+                                            read_timeout=self.ReadTimeout, max_connections=self.MaxConnections)
+        return self.Transport
+
+    # 所有接口共用的请求发送过程，各接口方法直接返回这个协程
+    async def send(self, path, body=None, query='', headers=None, bodyType=None, main2=False):
+
+        method, path, url, payload, headers = self.buildRequest(path, body, query, headers)
+        data = ''
+        try:
+            data = await self.getTransport().request(method, path, payload, headers)
+            locations = self.parseResponse(data, bodyType, main2)
+            if self.Iflog:
+                self.log(url, body, data)
+            return locations
+        except Exception as error:
+            if self.Iflog:
+                self.log(url, body, data)
+            return {'172001': '网络错误'}
+
+    async def close(self):
+        if self.Transport is not None:
+            await self.Transport.close()
@@ -0,0 +1,150 @@
+# -*- coding:utf-8 -*-
+# 云通讯SDK的性能测试，全部请求都发往本地模拟网关
+# python -m libs.yuntongxun.bench transport [次数]
+# python -m libs.yuntongxun.bench batch [手机号数量] [模拟网关耗时ms]
+# python -m libs.yuntongxun.bench parser [记录数]
+# python -m libs.yuntongxun.bench aio [并发发送数] [模拟网关耗时ms] [最大连接数]
+
+import asyncio
+import ssl
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from libs.yuntongxun import xmlparser
+from libs.yuntongxun.aio import AsyncREST, AsyncTransport
+
+from libs.yuntongxun.CCPRestSDK import REST
+from libs.yuntongxun.sms import CCP, AsyncCCP
+from libs.yuntongxun.stub import AsyncStubGateway, StubGatewayServer, make_self_signed_cert
+from libs.yuntongxun.transport import HTTPSTransport, UrllibTransport
+from libs.yuntongxun.xmltojson import xmltojson
+
+
+def make_rest(port, transport, rest_class=REST):
+    rest = rest_class('127.0.0.1', str(port), '2013-12-26')
+    rest.setAccount('stub-account', 'stub-token')
+    rest.setAppId('stub-app')
+    rest.setTransport(transport)
+    return rest
+
+
+def bench_transport(count=500):
+    """顺序发送count条短信，对比每次新建连接与连接池长连接的耗时"""
+    # 自签名证书，客户端不校验
+    context = ssl._create_unverified_context()
+    with tempfile.TemporaryDirectory() as directory:
+        certfile, keyfile = make_self_signed_cert(directory)
+        with StubGatewayServer(certfile=certfile, keyfile=keyfile) as server:
+            transports = [
+                ('urlopen', UrllibTransport('127.0.0.1', server.port, timeout=10, context=context)),
+                ('pooled', HTTPSTransport('127.0.0.1', server.port, context=context)),
+            ]
+            for name, transport in transports:
+                rest = make_rest(server.port, transport)
+                start = time.perf_counter()
+                for i in range(count):
+                    result = rest.sendTemplateSMS('13800000000', ['123456', 5], 1)
+                    assert result.get('statusCode') == '000000', result
+                elapsed = time.perf_counter() - start
+                print('%-8s %d次 %.2f秒 %.1f次/秒 平均%.2fms' % (
+                    name, count, elapsed, count / elapsed, elapsed * 1000 / count))
+                transport.close()
+
+
+def bench_batch(count=1000, latency=20):
+    """向count个手机号发送短信，对比逐个发送、并发发送和合并发送的吞吐量"""
+    context = ssl._create_unverified_context()
+    mobiles = ['139%08d' % i for i in range(count)]
+    with tempfile.TemporaryDirectory() as directory:
+        certfile, keyfile = make_self_signed_cert(directory)
+        with StubGatewayServer(latency=latency / 1000, certfile=certfile, keyfile=keyfile) as server:
+            # CCP是指向真实网关的单例，这里绕过__new__创建一个指向模拟网关的实例
+            ccp = object.__new__(CCP)
+            ccp.rest = make_rest(server.port, HTTPSTransport('127.0.0.1', server.port, context=context,
+                                                            pool_size=8))
+            cases = [
+                ('逐个发送', lambda: [ccp.send_template_sms(mobile, ['%06d' % i, 5], 1)
+                                     for i, mobile in enumerate(mobiles)]),
+                ('并发发送', lambda: ccp.send_template_sms_batch(
+                    [(mobile, ['%06d' % i, 5]) for i, mobile in enumerate(mobiles)], 1, max_workers=8)),
+                ('合并发送', lambda: ccp.send_template_sms_batch(
+                    [(mobile, ['新文章发布', 5]) for mobile in mobiles], 1, max_workers=8)),
+            ]
+            for name, case in cases:
+                start = time.perf_counter()
+                case()
+                elapsed = time.perf_counter() - start
+                print('%s %d个手机号 %.2f秒 %.1f个/秒' % (name, count, elapsed, count / elapsed))
+
+
+def sub_accounts_xml(count, total=True):
+    """生成包含count个SubAccount的getSubAccounts响应"""
+    records = ''.join(
+        '<SubAccount><subAccountSid>%032d</subAccountSid><subToken>%032x</subToken>'
+        '<dateCreated>2022-01-19 10:00:00</dateCreated><voipAccount>8001%08d</voipAccount>'
+        '<voipPwd>pwd%05d</voipPwd></SubAccount>' % (i, i, i, i) for i in range(count))
+    return ('<?xml version="1.0" encoding="UTF-8"?><Response><statusCode>000000</statusCode>'
+            + ('<totalCount>%d</totalCount>' % count if total else '') + records + '</Response>').encode()
+
+
+def legacy_parse(xml, main2=False):
+    xtj = xmltojson()
+    # xmltojson把结果放在类属性上，会在多次调用之间残留，对比前先换成实例自己的
+    xtj.a, xtj.m = {}, []
+    return xtj.main2(xml) if main2 else xtj.main(xml)
+
+
+def bench_parser(count=5000):
+    """解析包含count个SubAccount的大响应，对比耗时和内存峰值，解析结果的一致性由tests.py检查"""
+    xml = sub_accounts_xml(count)
+    cases = [
+        ('xmltojson', lambda: legacy_parse(xml)),
+        ('xmlparser', lambda: xmlparser.parse(xml, stream=False)),
+        ('iterparse', lambda: xmlparser.parse(xml, stream=True)),
+    ]
+    print('响应大小 %.1fKB' % (len(xml) / 1024))
+    for name, case in cases:
+        start = time.perf_counter()
+        case()
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        case()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print('%-10s %.1fms 内存峰值%.1fMB' % (name, elapsed * 1000, peak / 1024 / 1024))
+
+
+def bench_aio(count=5000, latency=50, max_connections=200):
+    """在一个事件循环中同时发起count条短信，网关每个请求耗时latency毫秒"""
+    context = ssl._create_unverified_context()
+
+    async def run(certfile, keyfile):
+        async with AsyncStubGateway(latency=latency / 1000, certfile=certfile, keyfile=keyfile) as server:
+            transport = AsyncTransport('127.0.0.1', server.port, context=context, pool_size=max_connections,
+                                       max_connections=max_connections)
+            ccp = AsyncCCP(make_rest(server.port, transport, AsyncREST))
+            messages = [('139%08d' % i, ['%06d' % i, 5]) for i in range(count)]
+            start = time.perf_counter()
+            results = await ccp.send_template_sms_many(messages, 1)
+            elapsed = time.perf_counter() - start
+            await ccp.close()
+            failed = sum(1 for result in results.values() if result != 0)
+            assert server.requests == count, server.requests
+            print('并发%d条 失败%d条 %.2f秒 %.1f条/秒 新建连接%d个' % (
+                count, failed, elapsed, count / elapsed, transport.connections_created))
+
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(*make_self_signed_cert(directory)))
+
+
+if __name__ == '__main__':
+    benchmarks = {
+        'transport': bench_transport,
+        'batch': bench_batch,
+        'parser': bench_parser,
+        'aio': bench_aio,
+    }
+    name = sys.argv[1] if len(sys.argv) > 1 else 'transport'
+    benchmarks[name](*[int(arg) for arg in sys.argv[2:]])
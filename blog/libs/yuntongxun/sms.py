@@ -1,6 +1,11 @@
 # -*- coding:utf-8 -*-
 
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
 from libs.yuntongxun.CCPRestSDK import REST
+from libs.yuntongxun.aio import AsyncREST
 
 # 说明：主账号，登陆云通讯网站后，可在"控制台-应用"中看到开发者主账号ACCOUNT SID
 _accountSid = '8aaf07087e3322ea017e5dbc1a7e07c9'
@@ -68,6 +73,64 @@ class CCP(object):
             # 返回-1 表示发送失败
             return -1
 
+    def send_template_sms_batch(self, messages, temp_id, max_workers=4, group_size=200):
+        """批量发送模板短信"""
+        # @param messages 由(手机号, 内容数据)组成的列表
+        # @param temp_id 模板Id
+        # @param max_workers 最多同时发送的请求数
+        # @param group_size 内容数据相同的手机号合并发送时，每个请求最多包含的手机号数量
+        # 返回字典：手机号 -> 0表示发送成功，-1表示发送失败
+        # 内容数据相同的手机号用英文逗号合并到一个请求的to字段中
+        groups = OrderedDict()
+        for mobile, datas in messages:
+            groups.setdefault(tuple(str(data) for data in datas), []).append(mobile)
+        requests = []
+        for datas, mobiles in groups.items():
+            for start in range(0, len(mobiles), group_size):
+                requests.append((mobiles[start:start + group_size], list(datas)))
+        # 合并后的各个请求并发发送
+        results = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [(mobiles, executor.submit(self.send_template_sms, ','.join(mobiles), datas, temp_id))
+                       for mobiles, datas in requests]
+            for mobiles, future in futures:
+                try:
+                    result = future.result()
+                except Exception:
+                    result = -1
+                for mobile in mobiles:
+                    results[mobile] = result
+        return results
+
+
+class AsyncCCP(object):
+    """发送短信的异步辅助类，连接池绑定在创建连接的事件循环上，每个事件循环各自创建一个实例"""
+
+    def __init__(self, rest=None):
+        if rest is None:
+            rest = AsyncREST(_serverIP, _serverPort, _softVersion)
+            rest.setAccount(_accountSid, _accountToken)
+            rest.setAppId(_appId)
+        self.rest = rest
+
+    async def send_template_sms(self, to, datas, temp_id):
+        """发送模板短信，与CCP.send_template_sms相同，返回0表示成功，-1表示失败"""
+        result = await self.rest.sendTemplateSMS(to, datas, temp_id)
+        if result.get("statusCode") == "000000":
+            return 0
+        return -1
+
+    async def send_template_sms_many(self, messages, temp_id):
+        """并发发送多条模板短信"""
+        # @param messages 由(手机号, 内容数据)组成的列表
+        # 返回字典：手机号 -> 0表示发送成功，-1表示发送失败
+        results = await asyncio.gather(*[self.send_template_sms(mobile, datas, temp_id)
+                                         for mobile, datas in messages])
+        return dict(zip([mobile for mobile, datas in messages], results))
+
+    async def close(self):
+        await self.rest.close()
+
 
 if __name__ == '__main__':
     ccp = CCP()
@@ -77,4 +140,4 @@ if __name__ == '__main__':
     #       {1}短信验证码
     #       {2}短信验证码有效期
     # 参数3：短信模板ID
-    ccp.send_template_sms('15234116541', ['1234', 5], 1)
\ No newline at end of file
+    ccp.send_template_sms('15234116541', ['1234', 5], 1)
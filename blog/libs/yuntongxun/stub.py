@@ -0,0 +1,167 @@
+# -*- coding:utf-8 -*-
+import asyncio
+import os
+import random
+import ssl
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubCCP(object):
+    """本地模拟的短信网关，与CCP的接口相同，用于离线压测短信发送流程"""
+
+    def __init__(self, latency=0.1, failure_rate=0.0):
+        # @param latency 每次发送的耗时（秒）
+        # @param failure_rate 发送失败的概率
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.sent = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def send_template_sms(self, to, datas, temp_id):
+        time.sleep(self.latency)
+        failed = random.random() < self.failure_rate
+        with self._lock:
+            if failed:
+                self.failed += 1
+            else:
+                self.sent += 1
+        # 与CCP相同，返回0表示发送成功，返回-1表示发送失败
+        return -1 if failed else 0
+
+
+class StubGatewayHandler(BaseHTTPRequestHandler):
+    """模拟云通讯REST接口，默认任何请求都返回发送成功的xml响应"""
+
+    # 支持长连接
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    response_body = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?><Response>'
+                     '<statusCode>000000</statusCode><TemplateSMS>'
+                     '<dateCreated>20220101120000</dateCreated><smsMessageSid>stub</smsMessageSid>'
+                     '</TemplateSMS></Response>').encode()
+    error_body = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?><Response>'
+                  '<statusCode>112300</statusCode><statusMsg>接收号码格式错误</statusMsg></Response>').encode()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with self.server.lock:
+            self.server.bodies.append(body)
+        latency = self.server.latency
+        if latency:
+            time.sleep(latency)
+        fail = self.server.fail
+        response_body = self.error_body if fail is not None and fail(body) else self.response_body
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/xml;charset=utf-8')
+        self.send_header('Content-Length', str(len(response_body)))
+        self.end_headers()
+        self.wfile.write(response_body)
+
+    do_GET = do_POST
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubGatewayServer(ThreadingHTTPServer):
+    """在本地线程中运行的模拟网关，传入certfile时使用TLS
+
+    收到的请求包体按顺序保存在bodies中，fail(包体)返回真时该请求返回发送失败的响应
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, certfile=None, keyfile=None, fail=None):
+        super().__init__((host, port), StubGatewayHandler)
+        self.latency = latency
+        self.fail = fail
+        self.bodies = []
+        self.lock = threading.Lock()
+        if certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            self.socket = context.wrap_socket(self.socket, server_side=True)
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+
+class AsyncStubGateway(object):
+    """基于asyncio的模拟网关，在当前事件循环中运行，可以同时处理上万个连接
+
+    async with AsyncStubGateway(latency=0.05) as server:
+        ...server.port...
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, certfile=None, keyfile=None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.context = None
+        if certfile:
+            self.context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            self.context.load_cert_chain(certfile, keyfile)
+        self.server = None
+        self.requests = 0
+
+    async def handle(self, reader, writer):
+        body = StubGatewayHandler.response_body
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                length = 0
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.partition(b':')
+                    if name.strip().lower() == b'content-length':
+                        length = int(value)
+                if length:
+                    await reader.readexactly(length)
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                self.requests += 1
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/xml;charset=utf-8\r\n'
+                             b'Content-Length: %d\r\n\r\n' % len(body) + body)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ssl.SSLError):
+            pass
+        finally:
+            writer.close()
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port, ssl=self.context,
+                                                 backlog=4096)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *args):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+def make_self_signed_cert(directory):
+    """用openssl生成本地测试用的自签名证书，返回(certfile, keyfile)"""
+    certfile = os.path.join(directory, 'stub.crt')
+    keyfile = os.path.join(directory, 'stub.key')
+    subprocess.check_call(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                           '-subj', '/CN=127.0.0.1', '-keyout', keyfile, '-out', certfile],
+                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return certfile, keyfile
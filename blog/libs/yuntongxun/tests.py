@@ -0,0 +1,220 @@
+import asyncio
+import re
+import shutil
+import ssl
+import tempfile
+import time
+import unittest
+
+from django.test import SimpleTestCase
+
+from libs.yuntongxun import xmlparser
+from libs.yuntongxun.CCPRestSDK import REST
+from libs.yuntongxun.aio import AsyncREST, AsyncTransport
+from libs.yuntongxun.sms import CCP, AsyncCCP
+from libs.yuntongxun.stub import AsyncStubGateway, StubGatewayServer, make_self_signed_cert
+from libs.yuntongxun.transport import HTTPSTransport
+from libs.yuntongxun.xmltojson import xmltojson
+
+HEADER = b'<?xml version="1.0" encoding="UTF-8"?>'
+
+
+def sub_accounts_xml(count, total=True):
+    records = b''.join(
+        b'<SubAccount><subAccountSid>%032d</subAccountSid><subToken>%032x</subToken>'
+        b'<dateCreated>2022-01-19 10:00:00</dateCreated><voipAccount>8001%08d</voipAccount>'
+        b'<voipPwd>pwd%05d</voipPwd></SubAccount>' % (i, i, i, i) for i in range(count))
+    return (HEADER + b'<Response><statusCode>000000</statusCode>'
+            + (b'<totalCount>%d</totalCount>' % count if total else b'') + records + b'</Response>')
+
+
+# 样例名 -> (是否按main2解析, 响应)
+PARSER_SAMPLES = {
+    # 发送模板短信成功
+    'normal': (False, HEADER + b'<Response><statusCode>000000</statusCode>'
+                      b'<TemplateSMS><dateCreated>20220119100000</dateCreated>'
+                      b'<smsMessageSid>ff8080813b0</smsMessageSid></TemplateSMS></Response>'),
+    # 网关返回的错误，statusMsg为中文
+    'error': (False, HEADER + '<Response><statusCode>112300</statusCode>'
+                     '<statusMsg>接收号码格式错误</statusMsg></Response>'.encode('utf-8')),
+    # 三级元素还有子元素时只取其文字，同名子元素保留最后一个
+    'nested': (False, HEADER + b'<Response><statusCode>000000</statusCode><data/>'
+                      b'<CallResult><state>1</state><state>2</state>'
+                      b'<detail><callSid>abc</callSid><duration>30</duration></detail></CallResult></Response>'),
+    # 没有totalCount时SubAccount不是列表
+    'sub account': (False, sub_accounts_xml(1, total=False)),
+    'sub account list': (False, sub_accounts_xml(20)),
+    # 查询短信模板，按main2解析
+    'template': (True, HEADER + b'<Response><statusCode>000000</statusCode>'
+                        b'<TemplateSMS><id>1</id><status>1</status></TemplateSMS></Response>'),
+    'template list': (True, HEADER + b'<Response><statusCode>000000</statusCode><totalCount>2</totalCount>'
+                             b'<TemplateSMS><id>1</id><status>1</status></TemplateSMS>'
+                             b'<TemplateSMS><id>2</id><status>0</status></TemplateSMS></Response>'),
+}
+
+
+def legacy_parse(xml, main2=False):
+    xtj = xmltojson()
+    # xmltojson把结果放在类属性上，会在多次调用之间残留，对比前先换成实例自己的
+    xtj.a, xtj.m = {}, []
+    return xtj.main2(xml) if main2 else xtj.main(xml)
+
+
+class XmlParserTest(SimpleTestCase):
+    '''
+    xmlparser一次遍历的解析结果与原先xmltojson的结果一致
+    '''
+
+    def test_same_as_xmltojson(self):
+        for name, (main2, xml) in PARSER_SAMPLES.items():
+            expected = legacy_parse(xml, main2)
+            parse = xmlparser.parse2 if main2 else xmlparser.parse
+            for stream in (False, True):
+                with self.subTest(name, stream=stream):
+                    self.assertEqual(parse(xml, stream=stream), expected)
+
+    def test_str_input(self):
+        _, xml = PARSER_SAMPLES['error']
+        self.assertEqual(xmlparser.parse(xml.decode('utf-8')), legacy_parse(xml))
+
+    def test_calls_do_not_share_results(self):
+        xmlparser.parse(PARSER_SAMPLES['normal'][1])
+        result = xmlparser.parse(PARSER_SAMPLES['error'][1])
+        self.assertNotIn('templateSMS', result)
+        self.assertEqual(result['statusCode'], '112300')
+
+    def test_large_response_streams(self):
+        xml = sub_accounts_xml(5000)
+        self.assertGreater(len(xml), xmlparser.STREAM_THRESHOLD)
+        result = xmlparser.parse(xml)
+        self.assertEqual(len(result['SubAccount']), 5000)
+        self.assertEqual(result, legacy_parse(xml))
+
+
+class AsyncCCPTest(SimpleTestCase):
+    '''
+    AsyncCCP通过AsyncTransport向本地的AsyncStubGateway并发发送短信
+    '''
+
+    count = 300
+    latency = 0.05
+    max_connections = 20
+
+    def send_many(self, scheme, certfile=None, keyfile=None):
+        '''
+        1.启动模拟网关，每个请求耗时latency秒
+        2.在一个事件循环中同时发送count条短信，最多使用max_connections个连接
+        返回 (发送结果, 耗时, 网关收到的请求数, 新建的连接数)
+        '''
+        context = ssl._create_unverified_context() if scheme == 'https' else None
+
+        async def run():
+            # 1.启动模拟网关
+            async with AsyncStubGateway(latency=self.latency, certfile=certfile, keyfile=keyfile) as server:
+                transport = AsyncTransport('127.0.0.1', server.port, context=context, scheme=scheme,
+                                           pool_size=self.max_connections, max_connections=self.max_connections)
+                rest = AsyncREST('127.0.0.1', str(server.port), '2013-12-26')
+                rest.setAccount('stub-account', 'stub-token')
+                rest.setAppId('stub-app')
+                rest.setTransport(transport)
+                ccp = AsyncCCP(rest)
+                # 2.并发发送
+                messages = [('139%08d' % i, ['%06d' % i, 5]) for i in range(self.count)]
+                start = time.perf_counter()
+                try:
+                    results = await ccp.send_template_sms_many(messages, 1)
+                finally:
+                    await ccp.close()
+                return results, time.perf_counter() - start, server.requests, transport.connections_created
+
+        return asyncio.run(run())
+
+    def check(self, results, elapsed, requests, connections):
+        self.assertEqual(len(results), self.count)
+        self.assertEqual(set(results.values()), {0})
+        self.assertEqual(requests, self.count)
+        # 连接数不超过上限，连接被重复使用
+        self.assertLessEqual(connections, self.max_connections)
+        # 逐条发送需要count * latency秒，并发发送时只需要其中的一小部分
+        self.assertLess(elapsed, self.count * self.latency / 4)
+
+    def test_send_many_http(self):
+        self.check(*self.send_many('http'))
+
+    @unittest.skipUnless(shutil.which('openssl'), '需要openssl生成自签名证书')
+    def test_send_many_https(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.check(*self.send_many('https', *make_self_signed_cert(directory)))
+
+
+class SendBatchTest(SimpleTestCase):
+    '''
+    CCP.send_template_sms_batch把内容相同的手机号合并后发送到本地的StubGatewayServer
+    '''
+
+    @staticmethod
+    def make_ccp(transport):
+        rest = REST(transport.host, str(transport.port), '2013-12-26')
+        rest.setAccount('stub-account', 'stub-token')
+        rest.setAppId('stub-app')
+        rest.setTransport(transport)
+        # 不经过单例，避免替换全局CCP实例的rest
+        ccp = object.__new__(CCP)
+        ccp.rest = rest
+        return ccp
+
+    def send_batch(self, messages, fail=None, **kwargs):
+        '''
+        返回 (发送结果, 网关收到的请求：[(手机号列表, 内容数据列表), ...])
+        '''
+        with StubGatewayServer(fail=fail) as server:
+            transport = HTTPSTransport('127.0.0.1', server.port, scheme='http')
+            try:
+                results = self.make_ccp(transport).send_template_sms_batch(messages, 1, **kwargs)
+            finally:
+                transport.close()
+        requests = []
+        for body in server.bodies:
+            body = body.decode('utf-8')
+            to = re.search(r'<to>(.*?)</to>', body).group(1)
+            requests.append((to.split(','), re.findall(r'<data>(.*?)</data>', body)))
+        return results, requests
+
+    def test_group_by_datas(self):
+        messages = [('1390000000%d' % i, ['1234', 5]) for i in range(3)]
+        messages += [('1380000000%d' % i, ['5678', 5]) for i in range(2)]
+        # 内容数据按字符串比较，5与'5'相同
+        messages.append(('13700000000', ['1234', '5']))
+        results, requests = self.send_batch(messages)
+        self.assertEqual(results, {mobile: 0 for mobile, _ in messages})
+        self.assertCountEqual(requests, [
+            (['13900000000', '13900000001', '13900000002', '13700000000'], ['1234', '5']),
+            (['13800000000', '13800000001'], ['5678', '5']),
+        ])
+
+    def test_group_size(self):
+        messages = [('139%08d' % i, ['1234', 5]) for i in range(7)]
+        results, requests = self.send_batch(messages, group_size=3)
+        self.assertEqual(len(results), 7)
+        self.assertEqual(sorted(len(mobiles) for mobiles, _ in requests), [1, 3, 3])
+        # 每个手机号只发送一次
+        self.assertCountEqual([mobile for mobiles, _ in requests for mobile in mobiles],
+                              [mobile for mobile, _ in messages])
+
+    def test_partial_failure(self):
+        messages = [('139%08d' % i, ['1234', 5]) for i in range(6)]
+        messages += [('138%08d' % i, ['5678', 5]) for i in range(2)]
+        # 包含13900000004的请求失败，其余请求不受影响
+        results, requests = self.send_batch(messages, fail=lambda body: b'13900000004' in body, group_size=2)
+        self.assertEqual(len(requests), 4)
+        expected = {mobile: 0 for mobile, _ in messages}
+        expected.update({'13900000004': -1, '13900000005': -1})
+        self.assertEqual(results, expected)
+
+    def test_network_error(self):
+        # 网关不可用时每个手机号都返回-1
+        with StubGatewayServer() as server:
+            port = server.port
+        ccp = self.make_ccp(HTTPSTransport('127.0.0.1', port, connect_timeout=1, scheme='http'))
+        messages = [('139%08d' % i, ['1234', 5]) for i in range(3)]
+        self.assertEqual(ccp.send_template_sms_batch(messages, 1), {mobile: -1 for mobile, _ in messages})
@@ -0,0 +1,134 @@
+# -*- coding: UTF-8 -*-
+import http.client
+import io
+import queue
+import select
+import socket
+import ssl
+import threading
+from urllib import error as urllib_error
+from urllib import request as urllib2
+
+
+class HTTPSTransport(object):
+    """保持长连接的HTTPS连接池，连接复用后不必每次请求都重新进行TCP和TLS握手"""
+
+    # 向已被服务器关闭的空闲连接发送请求时的异常，只在发送阶段出现时重试
+    # 发送完成后读取响应时出错，服务器可能已经处理了请求（短信已发出），不能重试
+    STALE_ERRORS = (ConnectionResetError, BrokenPipeError)
+
+    # @param host             必选参数    服务器地址
+    # @param port             必选参数    服务器端口
+    # @param connect_timeout  可选参数    建立连接的超时秒数
+    # @param read_timeout     可选参数    等待响应的超时秒数
+    # @param pool_size        可选参数    最多保持的空闲连接数
+    # @param context          可选参数    ssl.SSLContext，默认校验服务器证书
+    # @param scheme           可选参数    https或http
+    def __init__(self, host, port, connect_timeout=5, read_timeout=10, pool_size=4, context=None,
+                 scheme='https'):
+        self.host = host
+        self.port = int(port)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.context = context
+        self.scheme = scheme
+        self._idle = queue.LifoQueue(maxsize=pool_size)
+        self._lock = threading.Lock()
+        self.connections_created = 0
+
+    def _connect(self):
+        if self.scheme == 'https':
+            conn = http.client.HTTPSConnection(self.host, self.port, timeout=self.connect_timeout,
+                                               context=self.context or ssl.create_default_context())
+        else:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.connect_timeout)
+        conn.connect()
+        # 连接建立后改用读取超时
+        conn.sock.settimeout(self.read_timeout)
+        conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self._lock:
+            self.connections_created += 1
+        return conn
+
+    def _release(self, conn):
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    @staticmethod
+    def _dropped(conn):
+        # 空闲连接上不应有可读的数据，可读说明服务器已经关闭了连接（或发来了多余的数据）
+        try:
+            readable, _, _ = select.select([conn.sock], [], [], 0)
+        except (OSError, ValueError):
+            return True
+        return bool(readable)
+
+    def _acquire(self):
+        """返回 (连接, 是否为复用的空闲连接)，跳过已被服务器关闭的空闲连接"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect(), False
+            if conn.sock is not None and not self._dropped(conn):
+                return conn, True
+            conn.close()
+
+    def request(self, method, path, body=None, headers=None):
+        """发送请求并返回响应包体，响应状态为4xx、5xx时与urlopen一样抛出HTTPError"""
+        conn, reused = self._acquire()
+        try:
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+            except self.STALE_ERRORS:
+                conn.close()
+                if not reused:
+                    raise
+                # 复用的空闲连接在发送时被服务器关闭，请求没有发出，换一个新连接重试一次
+                conn = self._connect()
+                conn.request(method, path, body=body, headers=headers or {})
+            response = conn.getresponse()
+            data = response.read()
+        except Exception:
+            conn.close()
+            raise
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(conn)
+        if response.status >= 400:
+            raise urllib_error.HTTPError('%s://%s:%s%s' % (self.scheme, self.host, self.port, path),
+                                         response.status, response.reason, response.headers, io.BytesIO(data))
+        return data
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class UrllibTransport(object):
+    """每次请求都新建连接的传输方式，与原先直接调用urlopen的行为相同"""
+
+    def __init__(self, host, port, timeout=None, context=None, scheme='https'):
+        self.base_url = '%s://%s:%s' % (scheme, host, port)
+        self.timeout = timeout
+        self.context = context
+
+    def request(self, method, path, body=None, headers=None):
+        req = urllib2.Request(self.base_url + path, data=body, headers=headers or {}, method=method)
+        kwargs = {'context': self.context} if self.context else {}
+        if self.timeout is not None:
+            kwargs['timeout'] = self.timeout
+        res = urllib2.urlopen(req, **kwargs)
+        try:
+            return res.read()
+        finally:
+            res.close()
+
+    def close(self):
+        pass
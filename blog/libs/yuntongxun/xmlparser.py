@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# 云通讯xml响应解析，返回的字典结构与xmltojson.main/main2相同
+# 只遍历一次二级元素，每次调用使用各自的结果字典，不会在多次调用之间残留数据
+
+import io
+import xml.etree.ElementTree as ET
+
+# 超过这个字节数的响应使用iterparse边读边解析，处理完的记录立即释放
+STREAM_THRESHOLD = 256 * 1024
+
+
+def parse(xml, stream=None):
+    """对应xmltojson.main：TemplateSMS改名为templateSMS，有totalCount时SubAccount为列表"""
+    return _parse(xml, stream, {'TemplateSMS': 'templateSMS'}, 'SubAccount')
+
+
+def parse2(xml, stream=None):
+    """对应xmltojson.main2：有totalCount时TemplateSMS为列表"""
+    return _parse(xml, stream, {}, 'TemplateSMS')
+
+
+def _parse(xml, stream, renames, list_tag):
+    if isinstance(xml, str):
+        xml = xml.encode('utf-8')
+    if stream is None:
+        stream = len(xml) > STREAM_THRESHOLD
+    result = {}
+    records = []
+    has_total = False
+    for element in (_iter_streaming(xml) if stream else ET.fromstring(xml)):
+        tag = element.tag
+        if tag == 'totalCount':
+            has_total = True
+        if len(element):
+            # 同名子元素只保留最后一个，与原先dict(zip(tags, texts))的结果一致
+            value = {child.tag: child.text for child in element}
+            if tag == list_tag:
+                records.append(value)
+            result[renames.get(tag, tag)] = value
+        else:
+            result[tag] = element.text
+        if stream:
+            element.clear()
+    # 存在totalCount时说明是列表查询，所有记录都放进列表，否则只保留最后一条
+    if records and has_total:
+        result[renames.get(list_tag, list_tag)] = records
+    return result
+
+
+def _iter_streaming(xml):
+    """逐个产出根元素下已经解析完整的二级元素"""
+    depth = 0
+    root = None
+    for event, element in ET.iterparse(io.BytesIO(xml), events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            if depth == 1:
+                root = element
+            continue
+        depth -= 1
+        if depth == 1:
+            yield element
+            # 已经处理的元素从根元素中移除，内存占用不随记录数增长
+            root.remove(element)
@@ -137,6 +137,8 @@ var vm = new Vue({
                             //图片验证码错误
                             this.image_code_error = true;
                         }
+                        // 展示后端返回的错误信息，例如短信发送过于频繁
+                        this.sms_code_error_message = response.data.errmsg;
                         this.sms_code_error = true;
                         this.generate_image_code();
                         this.sending_flag = false;
@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from users import user_cache
+from utils import hashers
+
+UserModel = get_user_model()
+
+
+class MobileBackend(ModelBackend):
+    """
+    按手机号认证，与ModelBackend的区别是密码校验和重新哈希都在utils.hashers的进程池中计算，
+    每个请求加载已登录用户时优先使用users.user_cache中缓存的用户
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # 用户不存在时也计算一次哈希，避免通过响应时间判断手机号是否注册
+            hashers.make_password(password)
+            return None
+        is_correct, encoded = hashers.verify_password(password, user.password)
+        if not is_correct or not self.user_can_authenticate(user):
+            return None
+        if encoded:
+            # 密码使用的算法或参数已过时，保存按当前配置重新计算的哈希
+            user.password = encoded
+            user.save(update_fields=['password'])
+        return user
+
+    def get_user(self, user_id):
+        user = user_cache.load_user(user_id)
+        if user is None:
+            # 先读版本号再查询数据库，期间用户被修改时不写入缓存
+            version = user_cache.get_version(user_id)
+            try:
+                user = UserModel._default_manager.get(pk=user_id)
+            except UserModel.DoesNotExist:
+                return None
+            user_cache.save_user(user, version)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,93 @@
+'''
+图片验证码池
+生成图片验证码需要加载字体、变形、旋转、加噪点和JPEG编码，CPU开销很大，
+由captcha_pool命令在后台用进程池预先生成验证码放入redis列表，
+ImageCodeView直接从列表中取出一个，池为空时再当场生成
+'''
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django_redis import get_redis_connection
+
+from libs.captcha.captcha import captcha
+
+# 预先生成的验证码列表，每一项为 验证码文字:图片内容
+POOL_KEY = 'captcha:pool'
+# 验证码池的统计信息
+STATS_KEY = 'captcha:pool:stats'
+# 验证码池的默认大小
+POOL_SIZE = 500
+
+# 取出一个验证码并记录命中或未命中
+POP_SCRIPT = '''
+local item = redis.call('lpop', KEYS[1])
+if item then
+    redis.call('hincrby', KEYS[2], 'hit', 1)
+else
+    redis.call('hincrby', KEYS[2], 'miss', 1)
+end
+return item
+'''
+
+
+def pop_captcha():
+    '''
+    从验证码池中取出一个验证码，池为空时当场生成
+    返回 (验证码文字, 图片内容)
+    '''
+    redis_conn = get_redis_connection('default')
+    item = redis_conn.register_script(POP_SCRIPT)(keys=[POOL_KEY, STATS_KEY])
+    if item is None:
+        return captcha.generate_captcha()
+    text, image = item.split(b':', 1)
+    return text.decode(), image
+
+
+def _generate(_):
+    return captcha.generate_captcha()
+
+
+def refill(pool_size=POOL_SIZE, workers=None, batch_size=50):
+    '''
+    用进程池把验证码池补充到pool_size个
+    返回本次生成的验证码数量
+    '''
+    redis_conn = get_redis_connection('default')
+    missing = pool_size - redis_conn.llen(POOL_KEY)
+    if missing <= 0:
+        return 0
+    start = time.time()
+    items = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for text, image in executor.map(_generate, range(missing), chunksize=batch_size):
+            items.append(text.encode() + b':' + image)
+            if len(items) >= batch_size:
+                redis_conn.rpush(POOL_KEY, *items)
+                items = []
+    if items:
+        redis_conn.rpush(POOL_KEY, *items)
+    # 记录生成数量和生成速度（个/秒）
+    pipeline = redis_conn.pipeline()
+    pipeline.hincrby(STATS_KEY, 'produced', missing)
+    pipeline.hset(STATS_KEY, 'refill_rate', '%.1f' % (missing / max(time.time() - start, 0.001)))
+    pipeline.execute()
+    return missing
+
+
+def pool_stats():
+    '''
+    验证码池的统计信息：当前数量、生成数量、生成速度、命中和未命中次数
+    '''
+    redis_conn = get_redis_connection('default')
+    pipeline = redis_conn.pipeline()
+    pipeline.llen(POOL_KEY)
+    pipeline.hgetall(STATS_KEY)
+    size, stats = pipeline.execute()
+    stats = {key.decode(): value.decode() for key, value in stats.items()}
+    return {
+        'size': size,
+        'produced': int(stats.get('produced', 0)),
+        'refill_rate': float(stats.get('refill_rate', 0)),
+        'hit': int(stats.get('hit', 0)),
+        'miss': int(stats.get('miss', 0)),
+    }
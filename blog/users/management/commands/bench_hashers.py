@@ -0,0 +1,65 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from utils import hashers
+from utils.hashers import TunedArgon2PasswordHasher, TunedPBKDF2PasswordHasher
+
+PASSWORD = 'password123'
+
+
+class Command(BaseCommand):
+    help = '测试各种密码哈希配置下每个CPU核每秒能处理的登录次数，以及进程池的总吞吐量'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, nargs='+',
+                            default=[settings.PASSWORD_HASH_ITERATIONS, 100000, 50000],
+                            help='要对比的PBKDF2迭代次数')
+        parser.add_argument('--seconds', type=float, default=2,
+                            help='每种配置的测试时长')
+        parser.add_argument('--logins', type=int, default=200,
+                            help='通过进程池并发校验的密码数量')
+
+    def handle(self, *args, **options):
+        cases = [('pbkdf2_sha256 %d次' % iterations, TunedPBKDF2PasswordHasher,
+                  {'PASSWORD_HASH_ITERATIONS': iterations}) for iterations in options['iterations']]
+        try:
+            import argon2
+        except ImportError:
+            self.stdout.write('未安装argon2-cffi，跳过Argon2')
+        else:
+            cases.append(('argon2 %(time_cost)s/%(memory_cost)sKB/%(parallelism)s' % settings.PASSWORD_HASH_ARGON2,
+                          TunedArgon2PasswordHasher, {}))
+
+        # 单核：在当前进程中循环校验
+        for name, hasher_class, overrides in cases:
+            with override_settings(**overrides):
+                hasher = hasher_class()
+                encoded = hasher.encode(PASSWORD, hasher.salt())
+                count = 0
+                start = time.perf_counter()
+                while time.perf_counter() - start < options['seconds']:
+                    hasher.verify(PASSWORD, encoded)
+                    count += 1
+                elapsed = time.perf_counter() - start
+            self.stdout.write('%-28s 单核 %.1f次登录/秒  %.2fms/次' % (name, count / elapsed, elapsed * 1000 / count))
+
+        # 进程池：按当前settings的配置，用多个线程同时提交校验
+        workers = settings.PASSWORD_HASH_WORKERS
+        if not workers:
+            self.stdout.write('PASSWORD_HASH_WORKERS为0，不使用进程池')
+            return
+        encoded = hashers.make_password(PASSWORD)
+        with ThreadPoolExecutor(max_workers=workers * 4) as executor:
+            start = time.perf_counter()
+            results = list(executor.map(lambda _: hashers.verify_password(PASSWORD, encoded)[0],
+                                        range(options['logins'])))
+            elapsed = time.perf_counter() - start
+        assert all(results)
+        rate = options['logins'] / elapsed
+        self.stdout.write('进程池 %d个进程（CPU核数%d） 共%.1f次登录/秒  每个进程%.1f次登录/秒' % (
+            workers, os.cpu_count(), rate, rate / workers))
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django_redis import get_redis_connection
+
+from users import verify_codes
+from users.captcha_pool import POOL_KEY
+
+
+class Command(BaseCommand):
+    help = '对比被限流的请求与正常请求的耗时，验证拒绝请求的开销远小于正常处理'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200,
+                            help='每种情况发送的请求数')
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        # 清空验证码池，正常请求走当场生成图片的路径；短信只放入队列，不会真正发送
+        get_redis_connection('default').delete(POOL_KEY)
+        cases = [
+            ('imagecode', 'get', '/imagecode/', lambda i: {'uuid': 'bench-image-%d' % i}),
+            ('smscode', 'get', '/smscode/', lambda i: {'mobile': '139%08d' % i, 'image_code': 'abcd',
+                                                      'uuid': 'bench-%d' % i}),
+            ('login', 'post', '/login/', lambda i: {'mobile': '139%08d' % i, 'password': 'wrongpassword1'}),
+        ]
+        # 短信验证码的正常请求需要有效的图片验证码
+        for i in range(count):
+            verify_codes.save_image_code('bench-%d' % i, 'abcd')
+        client = Client()
+        for name, method, path, make_data in cases:
+            with override_settings(RATELIMIT_ENABLE=True):
+                # 每个请求使用不同的ip和手机号，都不会触发限流
+                allowed = self.measure(client, method, path, make_data, count, lambda i: '10.%d.%d.%d' % (
+                    i >> 16 & 255, i >> 8 & 255, i & 255))
+                # 先用完同一个ip的令牌，之后的请求都会被拒绝
+                self.measure(client, method, path, make_data, 100, lambda i: '192.0.2.1')
+                rejected = self.measure(client, method, path, make_data, count, lambda i: '192.0.2.1',
+                                        status=429)
+            self.stdout.write('%-10s 正常请求%.2fms  被拒绝%.2fms  拒绝开销为正常请求的%.1f%%' % (
+                name, allowed * 1000, rejected * 1000, rejected * 100 / allowed))
+
+    @staticmethod
+    def measure(client, method, path, make_data, count, make_ip, status=None):
+        '''
+        依次发送count个请求，返回平均耗时（秒）
+        '''
+        start = time.perf_counter()
+        for i in range(count):
+            response = getattr(client, method)(path, make_data(i), REMOTE_ADDR=make_ip(i))
+            if status is not None:
+                assert response.status_code == status, response.status_code
+        return (time.perf_counter() - start) / count
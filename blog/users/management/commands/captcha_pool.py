@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.captcha_pool import POOL_SIZE, pool_stats, refill
+
+
+class Command(BaseCommand):
+    help = '在后台预先生成图片验证码，保持验证码池中有足够的验证码'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=POOL_SIZE,
+                            help='验证码池的大小')
+        parser.add_argument('--workers', type=int,
+                            help='生成验证码的进程数，默认为CPU核数')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='循环补充的间隔秒数，为0时只补充一次')
+        parser.add_argument('--stats', action='store_true',
+                            help='只显示验证码池的统计信息')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.print_stats()
+            return
+        while True:
+            count = refill(pool_size=options['size'], workers=options['workers'])
+            if count:
+                self.print_stats()
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def print_stats(self):
+        stats = pool_stats()
+        total = stats['hit'] + stats['miss']
+        self.stdout.write('验证码池：%d个  已生成：%d个  生成速度：%.1f个/秒  命中：%d  未命中：%d  命中率：%.1f%%' % (
+            stats['size'], stats['produced'], stats['refill_rate'], stats['hit'], stats['miss'],
+            stats['hit'] * 100 / total if total else 0))
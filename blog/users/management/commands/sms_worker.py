@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from libs.yuntongxun.stub import StubCCP
+from users.sms_queue import LOAD_TEST_PREFIX, SmsWorker, clear_queue, enqueue_sms
+
+
+class Command(BaseCommand):
+    help = '从redis队列中取出短信发送任务并发送'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='同时发送的短信数量')
+        parser.add_argument('--until-empty', action='store_true',
+                            help='队列中的任务全部处理完后退出')
+        parser.add_argument('--stub', action='store_true',
+                            help='使用本地模拟的短信网关，不真正发送短信')
+        parser.add_argument('--latency', type=float, default=0.1,
+                            help='模拟网关每次发送的耗时（秒）')
+        parser.add_argument('--failure-rate', type=float, default=0.0,
+                            help='模拟网关发送失败的概率')
+        parser.add_argument('--backoff', type=float, default=2,
+                            help='第一次重试的等待秒数')
+        parser.add_argument('--load-test', type=int, default=0,
+                            help='压测：先放入指定数量的任务，全部处理完后输出吞吐量，需要配合--stub使用')
+
+    def handle(self, *args, **options):
+        gateway = StubCCP(options['latency'], options['failure_rate']) if options['stub'] else None
+        if options['load_test']:
+            if not options['stub']:
+                raise CommandError('压测需要配合--stub使用')
+            # 压测的任务放在单独的队列中，不会用模拟网关处理真实的短信
+            with override_settings(SMS_QUEUE_PREFIX=LOAD_TEST_PREFIX):
+                self.load_test(gateway, options)
+            return
+        worker = SmsWorker(gateway, concurrency=options['concurrency'], backoff=options['backoff'])
+        try:
+            worker.run(until_empty=options['until_empty'])
+        except KeyboardInterrupt:
+            worker.stop()
+
+    def load_test(self, gateway, options):
+        '''
+        1.压测队列中已有任务时拒绝运行，可能有其他压测正在进行
+        2.放入指定数量的任务，全部处理完后输出吞吐量
+        3.删除压测队列和发送状态
+        '''
+        worker = SmsWorker(gateway, concurrency=options['concurrency'], backoff=options['backoff'])
+        # 1.检查压测队列
+        if worker.pending():
+            raise CommandError('压测队列%s中已有任务，可能有其他压测正在进行' % worker.queue_key)
+        try:
+            # 2.放入任务并处理
+            for i in range(options['load_test']):
+                enqueue_sms('139%08d' % i, ['123456', 5], 1)
+            start = time.time()
+            worker.run(until_empty=True)
+            elapsed = time.time() - start
+        finally:
+            # 3.清理
+            clear_queue(LOAD_TEST_PREFIX)
+        self.stdout.write('处理%d个任务耗时%.2f秒，%.1f条/秒，成功%d次，失败%d次' % (
+            options['load_test'], elapsed, options['load_test'] / elapsed, gateway.sent, gateway.failed))
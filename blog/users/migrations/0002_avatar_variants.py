@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 10:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar_variants',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+
+from utils import hashers
 # Create your models here.
 
 
@@ -10,6 +12,8 @@ class User(AbstractUser):
     # 头像信息
     # ImageField自动保存图片文件（默认保存在工程文件中），并记录图片路径
     avatar = models.ImageField(upload_to='avatar/%Y%m%d/', blank=True)
+    # 头像的缩略图，json格式，由utils.images在后台生成
+    avatar_variants = models.TextField(blank=True, default='')
     # 简介信息
     user_desc = models.CharField(max_length=200, blank=True)
     # 修改（登录等）认证字段为手机号（默认为username）
@@ -24,4 +28,17 @@ class User(AbstractUser):
         verbose_name_plural = verbose_name # admin后台显示
 
     def __str__(self):
-        return self.mobile
\ No newline at end of file
+        return self.mobile
+
+    def set_password(self, raw_password):
+        # create_user和修改密码都通过这里计算哈希，放到utils.hashers的进程池中执行
+        self.password = hashers.make_password(raw_password)
+        self._password = raw_password
+
+    def get_session_auth_hash(self):
+        # users.user_cache加载的用户没有密码哈希（password延迟加载），
+        # 使用缓存中保存的校验值，避免每个请求为校验session查询一次数据库
+        session_hash = getattr(self, '_session_auth_hash', None)
+        if session_hash is not None and 'password' in self.get_deferred_fields():
+            return session_hash
+        return super().get_session_auth_hash()
@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users import user_cache
+from users.models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    # 用户信息、密码、最后登录时间修改后使缓存的用户失效
+    # 事务提交前其他请求读到的仍是旧数据，提交后再失效一次，使这些请求的写入被放弃
+    user_cache.invalidate_user(instance.pk)
+    transaction.on_commit(lambda: user_cache.invalidate_user(instance.pk))
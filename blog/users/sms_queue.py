@@ -0,0 +1,210 @@
+'''
+短信发送队列
+SmsCodeView只把发送任务放入redis队列后立即返回，不再等待短信网关的响应，
+由sms_worker命令从队列中取出任务，用有限的并发发送短信，
+发送失败时按指数退避重试，并记录每个手机号的发送状态
+'''
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from redis import RedisError
+from django.utils.module_loading import import_string
+from django_redis import get_redis_connection
+
+logger = logging.getLogger('')
+
+# 队列使用单独的前缀，不能与以手机号为键的短信验证码共用sms:前缀，
+# 前缀由settings.SMS_QUEUE_PREFIX指定，压测时换成单独的前缀，不会处理真实的短信
+DEFAULT_PREFIX = 'smsq'
+# 压测使用的前缀，sms_worker --load-test和loadtest命令的任务只放在这个队列中
+LOAD_TEST_PREFIX = 'smsq-loadtest'
+# 待发送的任务列表
+QUEUE_KEY = '%s:queue'
+# 等待重试的任务，有序集合：任务 -> 重试时间
+RETRY_KEY = '%s:retry'
+# 手机号的发送状态
+STATUS_KEY = '%s:status:%s'
+# redis出错后等待的秒数
+ERROR_WAIT = 1
+# 发送状态的保存时间
+STATUS_EXPIRES = 24 * 3600
+# 最多发送次数
+MAX_ATTEMPTS = 5
+# 第一次重试的等待秒数，之后每次翻倍
+BACKOFF = 2
+
+# 发送状态
+QUEUED = 'queued'
+SENT = 'sent'
+RETRYING = 'retrying'
+FAILED = 'failed'
+
+# 把到期的重试任务移回待发送列表
+MOVE_DUE_SCRIPT = '''
+local jobs = redis.call('zrangebyscore', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, job in ipairs(jobs) do
+    redis.call('zrem', KEYS[1], job)
+    redis.call('lpush', KEYS[2], job)
+end
+return #jobs
+'''
+
+
+def get_prefix():
+    return getattr(settings, 'SMS_QUEUE_PREFIX', DEFAULT_PREFIX)
+
+
+def clear_queue(prefix):
+    '''
+    删除一个前缀下的队列、重试任务和发送状态，用于压测结束后清理
+    '''
+    redis_conn = get_redis_connection('default')
+    redis_conn.delete(QUEUE_KEY % prefix, RETRY_KEY % prefix)
+    for key in redis_conn.scan_iter(STATUS_KEY % (prefix, '*'), count=1000):
+        redis_conn.delete(key)
+
+
+def _set_status(redis_conn, prefix, mobile, status, **fields):
+    key = STATUS_KEY % (prefix, mobile)
+    pipeline = redis_conn.pipeline()
+    pipeline.hset(key, mapping=dict(fields, status=status, updated=int(time.time())))
+    pipeline.expire(key, STATUS_EXPIRES)
+    pipeline.execute()
+
+
+def enqueue_sms(mobile, datas, temp_id):
+    '''
+    把发送任务放入队列，立即返回任务id
+    '''
+    job = {
+        'id': uuid.uuid4().hex,
+        'mobile': mobile,
+        'datas': datas,
+        'temp_id': temp_id,
+        'attempts': 0,
+    }
+    prefix = get_prefix()
+    redis_conn = get_redis_connection('default')
+    redis_conn.lpush(QUEUE_KEY % prefix, json.dumps(job))
+    _set_status(redis_conn, prefix, mobile, QUEUED, job=job['id'], attempts=0)
+    return job['id']
+
+
+def get_sms_status(mobile):
+    '''
+    查询手机号最近一次短信的发送状态
+    '''
+    status = get_redis_connection('default').hgetall(STATUS_KEY % (get_prefix(), mobile))
+    return {key.decode(): value.decode() for key, value in status.items()}
+
+
+def get_gateway():
+    return import_string(settings.SMS_GATEWAY)()
+
+
+class SmsWorker(object):
+    '''
+    从队列中取出发送任务，用线程池并发发送
+    同时发送的任务数不超过concurrency
+    '''
+
+    def __init__(self, gateway=None, concurrency=4, max_attempts=MAX_ATTEMPTS, backoff=BACKOFF):
+        self.gateway = gateway or get_gateway()
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.redis_conn = get_redis_connection('default')
+        self.prefix = get_prefix()
+        self.queue_key = QUEUE_KEY % self.prefix
+        self.retry_key = RETRY_KEY % self.prefix
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def pending(self):
+        '''
+        队列中和等待重试的任务数量
+        '''
+        return self.redis_conn.llen(self.queue_key) + self.redis_conn.zcard(self.retry_key)
+
+    def run(self, until_empty=False):
+        '''
+        1.把到期的重试任务移回队列
+        2.有空闲的发送线程时从队列中取出一个任务
+        3.在线程池中发送
+        until_empty为True时，队列和重试任务都处理完后退出
+        '''
+        move_due = self.redis_conn.register_script(MOVE_DUE_SCRIPT)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while not self._stopped.is_set():
+                try:
+                    item = self._next(move_due)
+                    if item is None and until_empty and self._idle() and not self.pending():
+                        break
+                except RedisError as e:
+                    # redis暂时不可用或键的类型不对时记录日志后继续，不让worker退出
+                    logger.error(e)
+                    self._stopped.wait(ERROR_WAIT)
+                    continue
+                if item is None:
+                    continue
+                # 3.在线程池中发送
+                future = executor.submit(self.process, json.loads(item[1]))
+                future.add_done_callback(lambda _: self._slots.release())
+
+    def _next(self, move_due):
+        '''
+        1.把到期的重试任务移回队列
+        2.有空闲的发送线程时取出一个任务，队列为空时返回None
+        取出任务后占用一个发送线程，发送完成后释放
+        '''
+        # 1.把到期的重试任务移回队列
+        move_due(keys=[self.retry_key, self.queue_key], args=[time.time(), 100])
+        # 2.有空闲的发送线程时取出一个任务
+        self._slots.acquire()
+        try:
+            item = self.redis_conn.brpop(self.queue_key, timeout=1)
+        except RedisError:
+            self._slots.release()
+            raise
+        if item is None:
+            self._slots.release()
+        return item
+
+    def _idle(self):
+        # 没有正在发送的任务
+        acquired = 0
+        while acquired < self.concurrency and self._slots.acquire(blocking=False):
+            acquired += 1
+        for _ in range(acquired):
+            self._slots.release()
+        return acquired == self.concurrency
+
+    def process(self, job):
+        '''
+        发送一条短信，失败时按指数退避放入重试队列，超过最多发送次数后记为失败
+        '''
+        mobile = job['mobile']
+        job['attempts'] += 1
+        try:
+            result = self.gateway.send_template_sms(mobile, job['datas'], job['temp_id'])
+        except Exception as e:
+            logger.error(e)
+            result = -1
+        if result == 0:
+            _set_status(self.redis_conn, self.prefix, mobile, SENT, job=job['id'], attempts=job['attempts'])
+        elif job['attempts'] >= self.max_attempts:
+            logger.error('sms to %s failed after %d attempts' % (mobile, job['attempts']))
+            _set_status(self.redis_conn, self.prefix, mobile, FAILED, job=job['id'], attempts=job['attempts'])
+        else:
+            retry_at = time.time() + self.backoff * 2 ** (job['attempts'] - 1)
+            self.redis_conn.zadd(self.retry_key, {json.dumps(job): retry_at})
+            _set_status(self.redis_conn, self.prefix, mobile, RETRYING, job=job['id'], attempts=job['attempts'])
+        return result
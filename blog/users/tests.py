@@ -1,3 +1,183 @@
-from django.test import TestCase
+import uuid
+from unittest import mock
 
-# Create your tests here.
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django_redis import get_redis_connection
+
+from users import verify_codes
+from utils import ratelimit
+
+
+def limited_view(request):
+    return HttpResponse('ok')
+
+
+class RateLimitTest(SimpleTestCase):
+    '''
+    utils.ratelimit的令牌桶脚本和视图包装，时间由mock的time.time()控制
+    '''
+
+    ip = '203.0.113.17'
+    mobile = '13900000017'
+
+    def setUp(self):
+        self.redis_conn = get_redis_connection('default')
+        self.clear()
+        self.factory = RequestFactory()
+        self.now = 1600000000.0
+        patcher = mock.patch.object(ratelimit, 'time')
+        patcher.start().time.side_effect = lambda: self.now
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.clear()
+
+    def clear(self):
+        keys = list(self.redis_conn.scan_iter(ratelimit.BUCKET_KEY % (limited_view.__name__, '*', '*')))
+        if keys:
+            self.redis_conn.delete(*keys)
+
+    def get(self, view, **data):
+        return view(self.factory.get('/', data, REMOTE_ADDR=self.ip))
+
+    def test_parse_rate(self):
+        self.assertEqual(ratelimit.parse_rate('5/m'), (5, 5 / 60000))
+        self.assertEqual(ratelimit.parse_rate('10/s'), (10, 10 / 1000))
+
+    def test_drained_bucket_returns_429(self):
+        view = ratelimit.ratelimit(limited_view, ip='3/m')
+        for _ in range(3):
+            self.assertEqual(self.get(view).status_code, 200)
+        response = self.get(view)
+        self.assertEqual(response.status_code, 429)
+        # 补充一个令牌需要20秒
+        self.assertEqual(response['Retry-After'], '20')
+
+    def test_tokens_refill(self):
+        view = ratelimit.ratelimit(limited_view, ip='3/m')
+        for _ in range(3):
+            self.get(view)
+        self.now += 19
+        self.assertEqual(self.get(view).status_code, 429)
+        self.now += 1
+        self.assertEqual(self.get(view).status_code, 200)
+        self.assertEqual(self.get(view).status_code, 429)
+        # 很久之后桶补满，但不超过容量
+        self.now += 3600
+        for _ in range(3):
+            self.assertEqual(self.get(view).status_code, 200)
+        self.assertEqual(self.get(view).status_code, 429)
+
+    def test_rejected_request_takes_no_tokens(self):
+        view = ratelimit.ratelimit(limited_view, ip='2/m', mobile='5/m')
+        for _ in range(2):
+            self.assertEqual(self.get(view, mobile=self.mobile).status_code, 200)
+        # ip的桶已空，mobile的桶不扣减
+        for _ in range(5):
+            self.assertEqual(self.get(view, mobile=self.mobile).status_code, 429)
+        # 换一个ip，mobile的桶还剩3个令牌
+        for ip in ('203.0.113.18', '203.0.113.18', '203.0.113.19'):
+            self.ip = ip
+            self.assertEqual(self.get(view, mobile=self.mobile).status_code, 200)
+        self.ip = '203.0.113.20'
+        self.assertEqual(self.get(view, mobile=self.mobile).status_code, 429)
+
+    def test_missing_value_not_limited(self):
+        view = ratelimit.ratelimit(limited_view, mobile='1/m')
+        for _ in range(3):
+            self.assertEqual(self.get(view).status_code, 200)
+
+    def test_methods(self):
+        view = ratelimit.ratelimit(limited_view, methods=['POST'], ip='1/m')
+        for _ in range(3):
+            self.assertEqual(self.get(view).status_code, 200)
+        self.assertEqual(view(self.factory.post('/', REMOTE_ADDR=self.ip)).status_code, 200)
+        self.assertEqual(view(self.factory.post('/', REMOTE_ADDR=self.ip)).status_code, 429)
+
+    @override_settings(RATELIMIT_ENABLE=False)
+    def test_disabled(self):
+        view = ratelimit.ratelimit(limited_view, ip='1/m')
+        for _ in range(3):
+            self.assertEqual(self.get(view).status_code, 200)
+
+
+class VerifyCodesTest(SimpleTestCase):
+    '''
+    users.verify_codes中签发和比对验证码的Lua脚本
+    '''
+
+    mobile = '13900000016'
+
+    def setUp(self):
+        self.redis_conn = get_redis_connection('default')
+        self.uuids = []
+        self.clear()
+
+    def tearDown(self):
+        self.clear()
+
+    def clear(self):
+        self.redis_conn.delete(verify_codes.SMS_CODE_KEY % self.mobile, verify_codes.SMS_FLAG_KEY % self.mobile,
+                               *[verify_codes.IMAGE_CODE_KEY % uuid for uuid in self.uuids])
+
+    def image_code(self, text='AbC4'):
+        image_uuid = str(uuid.uuid4())
+        self.uuids.append(image_uuid)
+        verify_codes.save_image_code(image_uuid, text)
+        return image_uuid
+
+    def test_issue(self):
+        image_uuid = self.image_code()
+        # 图片验证码不区分大小写
+        self.assertEqual(verify_codes.issue_sms_code(image_uuid, 'abc4', self.mobile, '123456'),
+                         verify_codes.SMS_OK)
+        self.assertEqual(self.redis_conn.get(verify_codes.SMS_CODE_KEY % self.mobile), b'123456')
+
+    def test_image_code_single_use(self):
+        image_uuid = self.image_code()
+        self.assertEqual(verify_codes.issue_sms_code(image_uuid, 'ABC4', self.mobile, '123456'),
+                         verify_codes.SMS_OK)
+        self.redis_conn.delete(verify_codes.SMS_FLAG_KEY % self.mobile)
+        self.assertEqual(verify_codes.issue_sms_code(image_uuid, 'ABC4', self.mobile, '654321'),
+                         verify_codes.IMAGE_CODE_EXPIRED)
+
+    def test_wrong_image_code_deleted(self):
+        image_uuid = self.image_code()
+        self.assertEqual(verify_codes.issue_sms_code(image_uuid, 'XXXX', self.mobile, '123456'),
+                         verify_codes.IMAGE_CODE_WRONG)
+        # 猜错一次后图片验证码作废，不能继续猜
+        self.assertEqual(verify_codes.issue_sms_code(image_uuid, 'ABC4', self.mobile, '123456'),
+                         verify_codes.IMAGE_CODE_EXPIRED)
+        self.assertIsNone(self.redis_conn.get(verify_codes.SMS_CODE_KEY % self.mobile))
+
+    def test_send_interval(self):
+        self.assertEqual(verify_codes.issue_sms_code(self.image_code(), 'ABC4', self.mobile, '111111'),
+                         verify_codes.SMS_OK)
+        ttl = self.redis_conn.ttl(verify_codes.SMS_FLAG_KEY % self.mobile)
+        self.assertTrue(0 < ttl <= verify_codes.SMS_SEND_INTERVAL)
+        # 发送标记存在期间不能再次发送，已保存的验证码不变
+        self.assertEqual(verify_codes.issue_sms_code(self.image_code(), 'ABC4', self.mobile, '222222'),
+                         verify_codes.SMS_THROTTLED)
+        self.assertEqual(self.redis_conn.get(verify_codes.SMS_CODE_KEY % self.mobile), b'111111')
+        # 标记过期后可以再次发送
+        self.redis_conn.delete(verify_codes.SMS_FLAG_KEY % self.mobile)
+        self.assertEqual(verify_codes.issue_sms_code(self.image_code(), 'ABC4', self.mobile, '333333'),
+                         verify_codes.SMS_OK)
+        self.assertEqual(self.redis_conn.get(verify_codes.SMS_CODE_KEY % self.mobile), b'333333')
+
+    def test_check_sms_code(self):
+        verify_codes.issue_sms_code(self.image_code(), 'ABC4', self.mobile, '123456')
+        # 输错不删除已保存的验证码
+        self.assertEqual(verify_codes.check_sms_code(self.mobile, '000000'), verify_codes.SMS_CODE_WRONG)
+        self.assertEqual(verify_codes.check_sms_code(self.mobile, '123456'), verify_codes.SMS_CODE_MATCHED)
+        # 比对成功后不能再次使用
+        self.assertEqual(verify_codes.check_sms_code(self.mobile, '123456'), verify_codes.SMS_CODE_EXPIRED)
+
+    def test_invalid_mobile(self):
+        for mobile in ('1390000001', '23900000016', '13900000016*', None):
+            with self.subTest(mobile=mobile):
+                with self.assertRaises(ValueError):
+                    verify_codes.issue_sms_code(self.image_code(), 'ABC4', mobile, '123456')
+                with self.assertRaises(ValueError):
+                    verify_codes.check_sms_code(mobile, '123456')
@@ -1,16 +1,17 @@
 from django.urls import path
 from users.views import RegisterView, ImageCodeView, SmsCodeView, LoginView, LogoutView, ForgetPasswordView, \
     UserCenterView, WriteBlogView
+from utils.ratelimit import ratelimit
 
 urlpatterns = [
     # 注册界面
     path('register/', RegisterView.as_view(), name='register'),
-    # 图片验证码
-    path('imagecode/', ImageCodeView.as_view(), name='imagecode'),
-    # 短信验证码
-    path('smscode/', SmsCodeView.as_view(), name='smscode'),
-    # 登录
-    path('login/', LoginView.as_view(), name='login'),
+    # 图片验证码，生成图片的CPU开销大，按ip限流
+    path('imagecode/', ratelimit(ImageCodeView.as_view(), ip='30/m'), name='imagecode'),
+    # 短信验证码，每条短信都要付费，按ip和手机号限流
+    path('smscode/', ratelimit(SmsCodeView.as_view(), ip='10/m', mobile='3/h'), name='smscode'),
+    # 登录，密码哈希的CPU开销大，按ip和手机号限流
+    path('login/', ratelimit(LoginView.as_view(), methods=['POST'], ip='20/m', mobile='10/m'), name='login'),
     # 退出登录
     path('logout/', LogoutView.as_view(), name='logout'),
     # 忘记密码
@@ -0,0 +1,118 @@
+'''
+已登录用户的缓存
+每个请求的AuthenticationMiddleware都要根据session中的用户id加载用户，
+这里把用户各字段的值序列化后保存在session所在的redis中，命中时不查询tb_users，
+用户信息保存或删除时由users.signals使缓存失效
+
+缓存与失效之间的竞争：请求A查询数据库得到旧数据后、写入缓存前，请求B修改了用户并删除缓存，
+A随后写入的旧数据会一直留到过期。为此每个用户有一个版本号，失效时加1，
+写缓存前先读版本号，写入时在Lua脚本中比较，版本号变化说明期间用户被修改过，放弃写入
+
+密码哈希不放入缓存，加载的用户password字段为延迟加载，
+session校验使用缓存中保存的get_session_auth_hash()的结果，见users.models.User
+'''
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+from django_redis import get_redis_connection
+
+# 用户快照，json格式，字段名 -> 值
+USER_KEY = 'user:snapshot:%s'
+# 用户缓存的版本号，每次失效加1
+VERSION_KEY = 'user:version:%s'
+# 缓存时间（秒），即使漏掉了失效，旧数据最多保留这么久
+USER_EXPIRES = 300
+# 版本号的保存时间（秒），远大于缓存时间，过期后从0重新计数
+VERSION_EXPIRES = 24 * 3600
+# 不缓存的字段
+EXCLUDED_FIELDS = {'password'}
+# 快照中session校验值的键名
+SESSION_HASH = '_session_auth_hash'
+
+# KEYS: 版本号, 用户快照
+# ARGV: 查询数据库前读到的版本号, 缓存时间, 用户快照
+SAVE_SCRIPT = '''
+if (redis.call('get', KEYS[1]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('setex', KEYS[2], ARGV[2], ARGV[3])
+return 1
+'''
+
+# KEYS: 版本号, 用户快照
+# ARGV: 版本号的保存时间
+INVALIDATE_SCRIPT = '''
+redis.call('incr', KEYS[1])
+redis.call('expire', KEYS[1], ARGV[1])
+redis.call('del', KEYS[2])
+return 1
+'''
+
+
+def _fields():
+    return [field for field in get_user_model()._meta.concrete_fields if field.attname not in EXCLUDED_FIELDS]
+
+
+def _dump(field, user):
+    # 时间等字段转成字符串，None保持为null
+    if field.value_from_object(user) is None:
+        return None
+    return field.value_to_string(user)
+
+
+def _load(field, value):
+    if value is None:
+        return None
+    return field.to_python(value)
+
+
+def get_version(user_id):
+    '''
+    返回用户缓存当前的版本号，在查询数据库之前调用，结果传给save_user
+    '''
+    redis_conn = get_redis_connection('session')
+    return int(redis_conn.get(VERSION_KEY % user_id) or 0)
+
+
+def load_user(user_id):
+    '''
+    返回缓存的用户，未缓存时返回None
+    '''
+    redis_conn = get_redis_connection('session')
+    data = redis_conn.get(USER_KEY % user_id)
+    if data is None:
+        return None
+    values = json.loads(data)
+    fields = _fields()
+    # 缓存之后用户模型增加了字段，当作未缓存处理
+    if SESSION_HASH not in values or any(field.attname not in values for field in fields):
+        return None
+    # 与从数据库加载相同，通过from_db创建对象，不会被当作新建的对象，
+    # 没有传入的password成为延迟加载的字段，save()时也只更新已加载的字段
+    user = get_user_model().from_db(DEFAULT_DB_ALIAS, [field.attname for field in fields],
+                                    [_load(field, values[field.attname]) for field in fields])
+    user._session_auth_hash = values[SESSION_HASH]
+    return user
+
+
+def save_user(user, version):
+    '''
+    缓存用户，version是查询数据库之前get_version的结果，版本号已变化时不写入
+    返回是否写入
+    '''
+    redis_conn = get_redis_connection('session')
+    values = {field.attname: _dump(field, user) for field in _fields()}
+    values[SESSION_HASH] = user.get_session_auth_hash()
+    script = redis_conn.register_script(SAVE_SCRIPT)
+    return bool(script(keys=[VERSION_KEY % user.pk, USER_KEY % user.pk],
+                       args=[version, USER_EXPIRES, json.dumps(values)]))
+
+
+def invalidate_user(user_id):
+    '''
+    删除缓存的用户并使版本号加1，正在查询数据库的请求不会再写入旧数据
+    '''
+    redis_conn = get_redis_connection('session')
+    script = redis_conn.register_script(INVALIDATE_SCRIPT)
+    script(keys=[VERSION_KEY % user_id, USER_KEY % user_id], args=[VERSION_EXPIRES])
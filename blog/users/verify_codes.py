@@ -0,0 +1,103 @@
+'''
+图片验证码和短信验证码的存取
+校验图片验证码、检查发送频率、保存短信验证码都在一个Lua脚本中完成，只需一次往返，
+图片验证码取出即删除，两个并发请求不能复用同一个图片验证码；
+短信验证码比对成功后立即删除，不能重复使用；
+短信验证码的键由手机号拼成，存取前检查手机号的格式，不合法的输入不能拼出其他模块使用的键
+'''
+import re
+
+from django_redis import get_redis_connection
+
+# 图片验证码，uuid -> 验证码文字
+IMAGE_CODE_KEY = 'img:%s'
+# 短信验证码，手机号 -> 验证码
+SMS_CODE_KEY = 'sms_code:%s'
+# 短信发送标记，存在期间同一手机号不能再次发送
+SMS_FLAG_KEY = 'sms_flag:%s'
+# 图片验证码有效期（秒）
+IMAGE_CODE_EXPIRES = 300
+# 短信验证码有效期（秒）
+SMS_CODE_EXPIRES = 300
+# 同一手机号两次发送短信的最小间隔（秒），与前端的倒计时一致
+SMS_SEND_INTERVAL = 60
+# 手机号格式，与视图中的校验一致
+MOBILE_RE = re.compile(r'^1[3-9]\d{9}$')
+
+# issue_sms_code的返回值
+SMS_OK = 0
+IMAGE_CODE_EXPIRED = 1
+IMAGE_CODE_WRONG = 2
+SMS_THROTTLED = 3
+
+# check_sms_code的返回值
+SMS_CODE_MATCHED = 1
+SMS_CODE_EXPIRED = 0
+SMS_CODE_WRONG = -1
+
+# KEYS: 图片验证码, 短信验证码, 发送标记
+# ARGV: 小写的用户输入, 短信验证码, 短信验证码有效期, 发送间隔
+ISSUE_SCRIPT = '''
+local image_code = redis.call('get', KEYS[1])
+if not image_code then
+    return 1
+end
+redis.call('del', KEYS[1])
+if string.lower(image_code) ~= ARGV[1] then
+    return 2
+end
+if redis.call('set', KEYS[3], 1, 'ex', ARGV[4], 'nx') == false then
+    return 3
+end
+redis.call('setex', KEYS[2], ARGV[3], ARGV[2])
+return 0
+'''
+
+# KEYS: 短信验证码
+# ARGV: 用户输入
+CHECK_SCRIPT = '''
+local sms_code = redis.call('get', KEYS[1])
+if not sms_code then
+    return 0
+end
+if sms_code ~= ARGV[1] then
+    return -1
+end
+redis.call('del', KEYS[1])
+return 1
+'''
+
+
+def _check_mobile(mobile):
+    if not isinstance(mobile, str) or not MOBILE_RE.match(mobile):
+        raise ValueError('手机号不符合规则：%r' % (mobile,))
+
+
+def save_image_code(uuid, text):
+    redis_conn = get_redis_connection('default')
+    redis_conn.setex(IMAGE_CODE_KEY % uuid, IMAGE_CODE_EXPIRES, text)
+
+
+def issue_sms_code(uuid, image_code, mobile, sms_code):
+    '''
+    校验并删除图片验证码，检查发送频率，保存短信验证码
+    返回SMS_OK、IMAGE_CODE_EXPIRED、IMAGE_CODE_WRONG或SMS_THROTTLED
+    手机号格式不正确时抛出ValueError
+    '''
+    _check_mobile(mobile)
+    redis_conn = get_redis_connection('default')
+    script = redis_conn.register_script(ISSUE_SCRIPT)
+    return script(keys=[IMAGE_CODE_KEY % uuid, SMS_CODE_KEY % mobile, SMS_FLAG_KEY % mobile],
+                  args=[image_code.lower(), sms_code, SMS_CODE_EXPIRES, SMS_SEND_INTERVAL])
+
+
+def check_sms_code(mobile, sms_code):
+    '''
+    比对短信验证码，比对成功时删除
+    返回SMS_CODE_MATCHED、SMS_CODE_EXPIRED或SMS_CODE_WRONG
+    手机号格式不正确时抛出ValueError
+    '''
+    _check_mobile(mobile)
+    redis_conn = get_redis_connection('default')
+    script = redis_conn.register_script(CHECK_SCRIPT)
+    return script(keys=[SMS_CODE_KEY % mobile], args=[sms_code])
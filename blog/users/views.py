@@ -7,11 +7,14 @@ from django.shortcuts import render, redirect
 from django.urls import reverse
 from django.views import View
 from django.http.response import HttpResponseBadRequest, HttpResponse, JsonResponse
-from libs.captcha.captcha import captcha
+from users.captcha_pool import pop_captcha
 from django_redis import get_redis_connection
-from home.models import ArticleCtegory, Article
+from home.models import Article
+from home.categories import get_categories, get_category
 
-from libs.yuntongxun.sms import CCP
+from users.sms_queue import enqueue_sms
+from users import verify_codes
+from utils import images
 from utils.response_code import RETCODE
 import logging
 import re
@@ -59,15 +62,11 @@ class RegisterView(View):
         if password != password2:
             return HttpResponseBadRequest('密码不一致')
         #     2.5短信验证码是否和redis中一致
-        redis_conn = get_redis_connection('default')
-        redis_sms_code = redis_conn.get('sms:%s'%mobile)
-        if redis_sms_code is None:
+        # 比对成功的短信验证码会被删除，不能重复使用
+        result = verify_codes.check_sms_code(mobile, sms_code)
+        if result == verify_codes.SMS_CODE_EXPIRED:
             return HttpResponseBadRequest('短信验证码已过期')
-        # try:
-        #     redis_conn.delete('sms:%s'%mobile)
-        # except Exception as e:
-        #     logger.error(e)
-        if sms_code != redis_sms_code.decode():
+        if result == verify_codes.SMS_CODE_WRONG:
             return HttpResponseBadRequest('验证码错误')
         # 3.保存信息
         # 使用系统自带的create_user()对密码加密
@@ -109,15 +108,12 @@ class ImageCodeView(View):
         if uuid is None:
             return HttpResponseBadRequest('没有图片验证码信息')
         # 3.通过调用captcha生成图片验证码
-        text, image = captcha.generate_captcha()
+        # 优先从预先生成的验证码池中取出，池为空时再当场生成
+        text, image = pop_captcha()
         # 4.将图片内容保存至redis
         #   uuid作为key，图片内容作为value
         #   同时还要设置一个时效
-        redis_conn = get_redis_connection('default')
-        # seconds为过期秒数
-        # 为uuid添加前缀
-        # redis_conn.setex(key, seconds, value)
-        redis_conn.setex('img:%s'%uuid, 300, text)
+        verify_codes.save_image_code(uuid, text)
         # 5。返回图片验证码
         return HttpResponse(image, content_type='image/jpeg')
 
@@ -128,10 +124,10 @@ class SmsCodeView(View):
         1.接收参数
         2.参数验证
             2.1验证参数是否齐全
-            2.2图片验证码的验证
-                若图片验证码未过期，获取之后就可以删除图片验证码
+            2.2手机号格式是否正确
         3.生成短信验证码
-        4.保存短信验证码到redis
+        4.验证图片验证码并保存短信验证码
+            图片验证码取出后即删除，同一手机号60秒内只能发送一次
         5.发送短信
         6.返回响应
         '''
@@ -143,34 +139,30 @@ class SmsCodeView(View):
         #     2.1验证参数是否齐全
         if not all([mobile, image_code, uuid]):
             return JsonResponse({'code':RETCODE.NECESSARYPARAMERR, 'errmsg':'缺少参数信息'})
-        #     2.2图片验证码的验证
-        #         若图片验证码未过期，获取之后就可以删除图片验证码
-        redis_conn = get_redis_connection('default')
-        redis_image_code = redis_conn.get('img:%s'%uuid)
-        # 判断图片验证码是否存在
-        if redis_image_code is None:
-            return JsonResponse({'code':RETCODE.IMAGECODEERR, 'errmsg':'图片验证码已过期'})
-        # 删除redis中的图片验证码
-        try:
-            redis_conn.delete('img:%s'%uuid)
-        except Exception as e:
-            logger.error(e)
-        # 图片验证码比对
-        if redis_image_code.decode().lower() != image_code.lower():
-            return JsonResponse({'code':RETCODE.IMAGECODEERR, 'errmsg':'图片验证码错误'})
+        #     2.2手机号格式是否正确
+        if not re.match(r'^1[3-9]\d{9}$', mobile):
+            return JsonResponse({'code':RETCODE.MOBILEERR, 'errmsg':'手机号不符合规则'})
         # 3.生成6位短信验证码
         sms_code = '%06d'%randint(0,999999)
+        # 4.验证图片验证码并保存短信验证码
+        #   图片验证码取出后即删除，同一手机号60秒内只能发送一次
+        result = verify_codes.issue_sms_code(uuid, image_code, mobile, sms_code)
+        if result == verify_codes.IMAGE_CODE_EXPIRED:
+            return JsonResponse({'code':RETCODE.IMAGECODEERR, 'errmsg':'图片验证码已过期'})
+        if result == verify_codes.IMAGE_CODE_WRONG:
+            return JsonResponse({'code':RETCODE.IMAGECODEERR, 'errmsg':'图片验证码错误'})
+        if result == verify_codes.SMS_THROTTLED:
+            return JsonResponse({'code':RETCODE.THROTTLINGERR, 'errmsg':'短信发送过于频繁'})
         # 为了后期比对方便，可以将短信验证码记录到日志中
         logger.info(sms_code)
-        # 4.保存短信验证码到redis
-        redis_conn.setex('sms:%s'%mobile, 300, sms_code)
         # 5.发送短信
         # 参数1：测试手机号
         # 参数2：您的验证码时{1}，请于{2}分钟内正确输入
         #       {1}短信验证码
         #       {2}短信验证码有效期
         # 参数3：短信模板ID
-        CCP().send_template_sms(mobile, [sms_code,5], 1)
+        # 发送任务放入队列后立即返回，由sms_worker命令异步发送
+        enqueue_sms(mobile, [sms_code, 5], 1)
         # 6.返回响应
         return JsonResponse({'code':RETCODE.OK, 'errmsg':'短信发送成功'})
 
@@ -291,11 +283,10 @@ class ForgetPasswordView(View):
         if password != password2:
             return HttpResponseBadRequest('密码不一致')
         #     2.5判断短信验证码是否正确
-        redis_conn = get_redis_connection('default')
-        redis_sms_code = redis_conn.get('sms:%s'%mobile)
-        if redis_sms_code is None:
+        result = verify_codes.check_sms_code(mobile, smscode)
+        if result == verify_codes.SMS_CODE_EXPIRED:
             return HttpResponseBadRequest('短信验证码已过期')
-        if redis_sms_code.decode() != smscode:
+        if result == verify_codes.SMS_CODE_WRONG:
             return HttpResponseBadRequest('短信验证码错误')
         # 3.根据手机号进行用户信息查询
         try:
@@ -333,7 +324,7 @@ class UserCenterView(LoginRequiredMixin, View):
         context = {
             'username': user.username,
             'mobile': user.mobile,
-            'avatar': user.avatar.url if user.avatar else None,
+            'avatar': images.variant_url(user.avatar, user.avatar_variants, 256),
             'user_desc': user.user_desc
         }
         return render(request, 'center.html', context)
@@ -357,11 +348,17 @@ class UserCenterView(LoginRequiredMixin, View):
             user.username = username
             user.user_desc = user_desc
             if avatar:
+                # 旧头像的缩略图在生成新缩略图时删除
+                stale_variants = user.avatar_variants
                 user.avatar = avatar
+                user.avatar_variants = ''
             user.save()
         except Exception as e:
             logger.error(e)
             return HttpResponseBadRequest('修改失败，请稍后再试')
+        # 在后台生成头像的缩略图
+        if avatar:
+            images.schedule_variants(user, 'avatar', images.AVATAR_WIDTHS, stale_variants)
         # 3.更新cookie中的username
         # 4.刷新当前页面（重定向）
         response = redirect(reverse('users:center'))
@@ -373,7 +370,7 @@ class UserCenterView(LoginRequiredMixin, View):
 class WriteBlogView(LoginRequiredMixin, View):
     def get(self, request):
         # 查询所有分类信息
-        categories = ArticleCtegory.objects.all()
+        categories = get_categories()
         context = {
             'categories':categories
         }
@@ -399,9 +396,8 @@ class WriteBlogView(LoginRequiredMixin, View):
         if not all([avatar, title, category_id, tags, summary, content]):
             return HttpResponseBadRequest('参数不全')
         # 2.2判断分类id
-        try:
-            category = ArticleCtegory.objects.get(id=category_id)
-        except ArticleCtegory.DoesNotExist:
+        category = get_category(category_id)
+        if category is None:
             return HttpResponseBadRequest('没有此分类')
         # 3.保存数据
         try:
@@ -417,5 +413,7 @@ class WriteBlogView(LoginRequiredMixin, View):
         except Exception as e:
             logger.error(e)
             return HttpResponseBadRequest('发布失败，请稍后再试')
+        # 在后台生成标题图的缩略图
+        images.schedule_variants(article, 'avatar', images.ARTICLE_WIDTHS)
         # 4.跳转至指定页面
         return redirect(reverse('home:index'))
\ No newline at end of file
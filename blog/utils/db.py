@@ -0,0 +1,19 @@
+from django.db.models import Case, F, IntegerField, Value, When
+
+
+def case_update(model, field, values, increment=False):
+    '''
+    用一条UPDATE ... CASE语句批量更新多行数据的同一个字段
+    values为 主键 -> 值 的字典
+    increment为True时在原值的基础上累加，否则直接覆盖
+    返回受影响的行数
+    '''
+    if not values:
+        return 0
+    expression = Case(
+        *[When(pk=pk, then=Value(value)) for pk, value in values.items()],
+        output_field=IntegerField()
+    )
+    if increment:
+        expression = F(field) + expression
+    return model.objects.filter(pk__in=list(values)).update(**{field: expression})
@@ -0,0 +1,108 @@
+'''
+密码哈希
+哈希算法的参数可以在settings中调整，登录时旧算法或旧参数的密码会自动按PASSWORD_HASHERS中的第一个重新哈希；
+计算哈希可以放到一个大小固定的进程池中执行，登录高峰时最多占用PASSWORD_HASH_WORKERS个CPU核，
+不会挤占处理文章页面的工作进程
+'''
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher
+
+logger = logging.getLogger('')
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    迭代次数由PASSWORD_HASH_ITERATIONS配置的PBKDF2
+    algorithm与Django默认的相同，已有的密码可以直接校验，迭代次数变化后在下次登录时重新哈希
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_HASH_ITERATIONS', PBKDF2PasswordHasher.iterations)
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    参数由PASSWORD_HASH_ARGON2配置的Argon2，需要安装argon2-cffi
+    """
+
+    def _option(self, name):
+        return getattr(settings, 'PASSWORD_HASH_ARGON2', {}).get(name, getattr(Argon2PasswordHasher, name))
+
+    @property
+    def time_cost(self):
+        return self._option('time_cost')
+
+    @property
+    def memory_cost(self):
+        return self._option('memory_cost')
+
+    @property
+    def parallelism(self):
+        return self._option('parallelism')
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    '''
+    返回计算哈希的进程池，PASSWORD_HASH_WORKERS为0时返回None，在当前进程中计算
+    '''
+    global _pool
+    workers = getattr(settings, 'PASSWORD_HASH_WORKERS', 0)
+    if not workers:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers)
+        return _pool
+
+
+def _run(func, *args):
+    pool = get_pool()
+    if pool is None:
+        return func(*args)
+    try:
+        return pool.submit(func, *args).result()
+    except BrokenProcessPool as e:
+        # 子进程异常退出时丢弃进程池，下次调用重新创建，本次在当前进程中计算
+        logger.error(e)
+        global _pool
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        return func(*args)
+
+
+def _make_password(password):
+    return hashers.make_password(password)
+
+
+def _verify_password(password, encoded):
+    updated = []
+    is_correct = hashers.check_password(password, encoded,
+                                        setter=lambda raw_password: updated.append(_make_password(raw_password)))
+    return is_correct, updated[0] if updated else None
+
+
+def make_password(password):
+    '''
+    计算密码的哈希
+    '''
+    return _run(_make_password, password)
+
+
+def verify_password(password, encoded):
+    '''
+    校验密码
+    返回 (密码是否正确, 需要更新时新的哈希否则为None)
+    '''
+    return _run(_verify_password, password, encoded)
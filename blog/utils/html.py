@@ -0,0 +1,224 @@
+'''
+编辑器提交的html的处理
+文章和评论的正文由CKEditor生成，模板中以safe输出，保存前按白名单过滤标签和属性，
+<pre><code class="language-xxx">中的代码在服务端用Pygments高亮（安装了Pygments时），
+页面不再需要加载Prism。过滤时同时得到纯文本，用于统计字数和生成摘要
+'''
+import math
+import re
+from html import escape
+from html.parser import HTMLParser
+
+try:
+    from pygments import highlight
+    from pygments.formatters import HtmlFormatter
+    from pygments.lexers import get_lexer_by_name
+    from pygments.util import ClassNotFound
+except ImportError:
+    highlight = None
+
+# 允许的标签
+ALLOWED_TAGS = {
+    'a', 'abbr', 'b', 'blockquote', 'br', 'caption', 'code', 'del', 'div', 'em', 'h1', 'h2', 'h3', 'h4',
+    'h5', 'h6', 'hr', 'i', 'img', 'ins', 'kbd', 'li', 'ol', 'p', 'pre', 's', 'small', 'span', 'strike',
+    'strong', 'sub', 'sup', 'table', 'tbody', 'td', 'tfoot', 'th', 'thead', 'tr', 'u', 'ul',
+}
+# 没有结束标签的标签
+VOID_TAGS = {'br', 'hr', 'img'}
+# 块级标签，提取纯文本时作为分隔
+BLOCK_TAGS = {
+    'blockquote', 'br', 'div', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'li', 'p', 'pre', 'td', 'th', 'tr',
+}
+# 连同内容一起删除的标签
+DROP_CONTENT_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'noscript', 'template', 'textarea', 'title'}
+# 各标签允许的属性，'*'对所有标签有效
+ALLOWED_ATTRIBUTES = {
+    '*': {'title', 'style'},
+    'a': {'href', 'target'},
+    'img': {'src', 'alt', 'width', 'height'},
+    'code': {'class'},
+    'ol': {'start'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan'},
+}
+# 链接和图片允许的协议，没有协议的相对地址也允许
+ALLOWED_SCHEMES = {'http', 'https', 'mailto'}
+# style中允许的属性，编辑器的文字颜色、背景色和对齐
+ALLOWED_STYLES = {'color', 'background-color', 'text-align'}
+STYLE_VALUE_RE = re.compile(r'^[#\w\s(),.%-]+$')
+# 代码语言，CKEditor的codesnippet插件生成<code class="language-python">
+LANGUAGE_RE = re.compile(r'\blanguage-([\w+#-]+)')
+SCHEME_RE = re.compile(r'^([a-z][a-z0-9+.-]*):')
+# 去掉地址中的空白和控制字符后再判断协议，防止"java\tscript:"
+URL_IGNORED_RE = re.compile(r'[\x00-\x20]+')
+
+# 字数统计：中文按字，英文和数字按单词
+WORD_RE = re.compile(r'[一-鿿]|[A-Za-z0-9]+(?:[\'’-][A-Za-z0-9]+)*')
+# 每分钟阅读的字数
+READING_SPEED = 300
+
+
+def _safe_url(value):
+    url = URL_IGNORED_RE.sub('', value).lower()
+    match = SCHEME_RE.match(url)
+    return match is None or match.group(1) in ALLOWED_SCHEMES
+
+
+def _safe_style(value):
+    declarations = []
+    for declaration in value.split(';'):
+        name, _, style = declaration.partition(':')
+        name, style = name.strip().lower(), style.strip()
+        if name in ALLOWED_STYLES and STYLE_VALUE_RE.match(style) and 'url' not in style.lower():
+            declarations.append('%s: %s' % (name, style))
+    return '; '.join(declarations)
+
+
+class Sanitizer(HTMLParser):
+    '''
+    按白名单重新输出html：不允许的标签去掉但保留其中的文字，
+    DROP_CONTENT_TAGS连同内容一起删除，未闭合的标签自动闭合，多余的结束标签忽略
+    '''
+
+    def __init__(self, highlight_code=True):
+        super().__init__(convert_charrefs=True)
+        self.highlight_code = highlight_code and highlight is not None
+        self.out = []
+        self.text = []
+        # 已输出的开始标签，用于闭合
+        self.stack = []
+        # 正在删除的标签的嵌套层数
+        self.dropping = 0
+        # 正在收集的代码：(语言, 代码片段列表)
+        self.code = None
+        # 当前<pre>开始标签在out中的位置，高亮后给<pre>加上样式
+        self.pre_index = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping += 1
+            return
+        if self.dropping:
+            return
+        if tag in BLOCK_TAGS:
+            self.text.append('\n')
+        if self.code is not None:
+            # 代码中的换行标签转成换行符，其余标签忽略
+            if tag == 'br':
+                self.code[1].append('\n')
+            return
+        if tag not in ALLOWED_TAGS:
+            return
+        allowed = ALLOWED_ATTRIBUTES['*'] | ALLOWED_ATTRIBUTES.get(tag, set())
+        cleaned = []
+        for name, value in attrs:
+            if name not in allowed or value is None:
+                continue
+            if name in ('href', 'src') and not _safe_url(value):
+                continue
+            if name == 'style':
+                value = _safe_style(value)
+                if not value:
+                    continue
+            cleaned.append((name, value))
+        if tag == 'a' and any(name == 'target' for name, _ in cleaned):
+            # 新窗口打开的链接不能访问window.opener
+            cleaned.append(('rel', 'noopener noreferrer'))
+        if tag == 'code' and self.highlight_code and 'pre' in self.stack:
+            match = LANGUAGE_RE.search(dict(cleaned).get('class', ''))
+            if match:
+                self.code = (match.group(1).lower(), [])
+                return
+        if tag == 'pre':
+            self.pre_index = len(self.out)
+        self.out.append('<%s%s>' % (tag, ''.join(' %s="%s"' % (name, escape(value)) for name, value in cleaned)))
+        if tag not in VOID_TAGS:
+            self.stack.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and not self.dropping and self.stack and self.stack[-1] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping = max(0, self.dropping - 1)
+            return
+        if self.dropping:
+            return
+        if self.code is not None:
+            if tag == 'code':
+                self.flush_code()
+            return
+        if tag not in self.stack:
+            return
+        # 闭合到对应的开始标签为止
+        while self.stack:
+            open_tag = self.stack.pop()
+            self.out.append('</%s>' % open_tag)
+            if open_tag == tag:
+                break
+        if tag == 'pre':
+            self.pre_index = None
+
+    def handle_data(self, data):
+        if self.dropping:
+            return
+        self.text.append(data)
+        if self.code is not None:
+            self.code[1].append(data)
+        else:
+            self.out.append(escape(data, quote=False))
+
+    def flush_code(self):
+        language, parts = self.code
+        self.code = None
+        source = ''.join(parts)
+        try:
+            lexer = get_lexer_by_name(language)
+        except ClassNotFound:
+            self.out.append('<code class="language-%s">%s</code>' % (escape(language), escape(source, quote=False)))
+            return
+        self.out.append('<code class="language-%s">%s</code>' % (
+            escape(language), highlight(source, lexer, HtmlFormatter(nowrap=True))))
+        # 高亮的样式使用static/md_css/monokai.css中的.codehilite
+        if self.pre_index is not None:
+            self.out[self.pre_index] = '<pre class="codehilite">'
+
+    def close(self):
+        super().close()
+        if self.code is not None:
+            self.flush_code()
+        while self.stack:
+            self.out.append('</%s>' % self.stack.pop())
+
+
+def sanitize(html, highlight_code=True):
+    '''
+    返回 (过滤后的html, 纯文本)
+    '''
+    parser = Sanitizer(highlight_code=highlight_code)
+    parser.feed(html or '')
+    parser.close()
+    return ''.join(parser.out), ''.join(parser.text)
+
+
+def count_words(text):
+    return len(WORD_RE.findall(text))
+
+
+def reading_minutes(word_count):
+    '''
+    阅读时间（分钟），有内容时至少为1分钟
+    '''
+    return math.ceil(word_count / READING_SPEED)
+
+
+def excerpt(text, length=200):
+    '''
+    纯文本的前length个字符，连续的空白合并为一个空格
+    '''
+    text = ' '.join(text.split())
+    if len(text) <= length:
+        return text
+    return text[:length - 1] + '…'
@@ -0,0 +1,133 @@
+'''
+上传图片的处理
+上传的原图可能有几MB，直接在首页和详情页展示会拖慢页面，
+图片保存后在后台线程池中按几个固定宽度生成WebP和JPEG两种格式的缩略图，
+缩略图路径以json保存在模型的avatar_variants字段中，模板通过picture标签按需要的宽度选择
+'''
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger('')
+
+# 文章标题图的缩略图宽度，首页列表约270px，详情页和高分屏使用更大的
+ARTICLE_WIDTHS = (240, 480, 960)
+# 用户头像的缩略图宽度
+AVATAR_WIDTHS = (64, 128, 256)
+
+# 格式 -> (文件扩展名, 编码参数)
+FORMATS = {
+    'webp': ('webp', {'format': 'WEBP', 'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = ThreadPoolExecutor(max_workers=getattr(settings, 'IMAGE_WORKERS', 2))
+
+
+def make_variants(name, widths):
+    '''
+    为storage中的图片name生成各个宽度的缩略图
+    返回 {宽度: {格式: 缩略图路径}}，宽度为字符串以便保存为json
+    '''
+    with default_storage.open(name) as f:
+        image = Image.open(f)
+        # JPEG解码时直接按1/2、1/4、1/8缩小，大图不必完整解码，宽高都不小于最大的缩略图宽度
+        image.draft('RGB', (max(widths), max(widths)))
+        image.load()
+    # 按EXIF信息旋转手机拍摄的照片
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+    # 原图比所有宽度都窄时只按原图宽度生成一份
+    targets = [width for width in widths if width < image.width] or [image.width]
+    base, _ = os.path.splitext(name)
+    variants = {}
+    for width in targets:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+        variants[str(width)] = {}
+        for fmt, (ext, options) in FORMATS.items():
+            output = resized
+            if fmt == 'jpeg' and resized.mode == 'RGBA':
+                # JPEG不支持透明，铺在白色背景上
+                output = Image.new('RGB', resized.size, (255, 255, 255))
+                output.paste(resized, mask=resized.split()[3])
+            buffer = BytesIO()
+            output.save(buffer, **options)
+            variants[str(width)][fmt] = default_storage.save('%s_%d.%s' % (base, width, ext),
+                                                             ContentFile(buffer.getvalue()))
+    return variants
+
+
+def delete_variants(variants_json):
+    for formats in load_variants(variants_json).values():
+        for name in formats.values():
+            default_storage.delete(name)
+
+
+def load_variants(variants_json):
+    if not variants_json:
+        return {}
+    try:
+        return json.loads(variants_json)
+    except ValueError:
+        return {}
+
+
+def variant_url(image, variants_json, width, fmt='jpeg'):
+    '''
+    返回不窄于width的最小缩略图的地址，没有合适的缩略图时返回原图地址，没有图片时返回None
+    '''
+    if not image:
+        return None
+    variants = load_variants(variants_json)
+    widths = sorted(int(w) for w in variants)
+    if not widths:
+        return image.url
+    chosen = next((w for w in widths if w >= width), widths[-1])
+    return default_storage.url(variants[str(chosen)][fmt])
+
+
+def process(model, pk, field_name, widths, stale_variants=''):
+    '''
+    生成缩略图并保存到avatar_variants字段，在后台线程中执行
+    stale_variants为替换前的图片的缩略图，一并删除
+    通过save保存，文章和用户的缓存由post_save信号使之失效
+    '''
+    close_old_connections()
+    try:
+        delete_variants(stale_variants)
+        instance = model.objects.filter(pk=pk).first()
+        if instance is None:
+            return
+        name = getattr(instance, field_name).name
+        if not name:
+            return
+        variants = make_variants(name, widths)
+        # 生成期间图片又被替换时丢弃本次结果
+        if not model.objects.filter(pk=pk, **{field_name: name}).exists():
+            delete_variants(json.dumps(variants))
+            return
+        instance.avatar_variants = json.dumps(variants)
+        instance.save(update_fields=['avatar_variants'])
+    except Exception as e:
+        logger.error('生成缩略图失败 %s %s: %s' % (model.__name__, pk, e))
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(instance, field_name='avatar', widths=ARTICLE_WIDTHS, stale_variants=''):
+    '''
+    事务提交后在后台线程池中为instance的图片生成缩略图
+    '''
+    # request.user是SimpleLazyObject，通过_meta取得真实的模型类
+    model, pk = instance._meta.model, instance.pk
+    transaction.on_commit(lambda: _executor.submit(process, model, pk, field_name, widths, stale_variants))
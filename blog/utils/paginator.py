@@ -0,0 +1,118 @@
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage(object):
+    '''
+    游标分页的一页数据
+    '''
+
+    def __init__(self, object_list, next_cursor, prev_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class CursorPaginator(object):
+    '''
+    按(created, id)倒序进行游标（seek）分页
+    与django自带的Paginator不同，不需要COUNT(*)，也不使用OFFSET，
+    翻到很深的页码时查询耗时不会随页码增长
+    游标对前端是不透明的字符串：方向 + 当前页首条或末条数据的(created, id)
+    '''
+    # 向后翻页
+    NEXT = 'n'
+    # 向前翻页
+    PREV = 'p'
+    # 每页数量不合法时使用的默认值和允许的最大值，与SearchView相同
+    DEFAULT_PER_PAGE = 10
+    MAX_PER_PAGE = 50
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = self.clean_per_page(per_page)
+
+    @classmethod
+    def clean_per_page(cls, per_page):
+        '''
+        每页数量来自请求参数，不是整数时使用默认值，超出范围时截断到1~MAX_PER_PAGE
+        '''
+        try:
+            per_page = int(per_page)
+        except (TypeError, ValueError):
+            return cls.DEFAULT_PER_PAGE
+        return min(max(1, per_page), cls.MAX_PER_PAGE)
+
+    @staticmethod
+    def encode_cursor(direction, obj):
+        value = json.dumps([direction, obj.created.isoformat(), obj.id])
+        return base64.urlsafe_b64encode(value.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            value = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, created, id = json.loads(value.decode())
+            created = parse_datetime(created)
+            id = int(id)
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+            raise InvalidCursor(cursor)
+        if direction not in (CursorPaginator.NEXT, CursorPaginator.PREV) or created is None:
+            raise InvalidCursor(cursor)
+        return direction, created, id
+
+    def page(self, cursor=None):
+        '''
+        1.解析游标，没有游标时返回第一页
+        2.向后翻页查询(created, id)小于游标的数据，向前翻页查询大于游标的数据
+        3.多查询一条数据，用来判断是否还有下一页（上一页）
+        4.生成上一页和下一页的游标
+        '''
+        # 1.解析游标
+        if cursor:
+            direction, created, id = self.decode_cursor(cursor)
+        else:
+            direction, created, id = self.NEXT, None, None
+        # 2.按游标方向查询
+        queryset = self.queryset
+        if direction == self.NEXT:
+            if created is not None:
+                queryset = queryset.filter(Q(created__lt=created) | Q(created=created, id__lt=id))
+            queryset = queryset.order_by('-created', '-id')
+        else:
+            queryset = queryset.filter(Q(created__gt=created) | Q(created=created, id__gt=id))
+            queryset = queryset.order_by('created', 'id')
+        # 3.多查询一条数据
+        object_list = list(queryset[:self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if direction == self.PREV:
+            object_list.reverse()
+        # 4.生成上一页和下一页的游标
+        if direction == self.NEXT:
+            has_next, has_previous = has_more, created is not None
+        else:
+            has_next, has_previous = True, has_more
+        next_cursor = self.encode_cursor(self.NEXT, object_list[-1]) if has_next and object_list else None
+        prev_cursor = self.encode_cursor(self.PREV, object_list[0]) if has_previous and object_list else None
+        return CursorPage(object_list, next_cursor, prev_cursor)
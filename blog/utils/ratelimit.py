@@ -0,0 +1,128 @@
+'''
+基于redis的令牌桶限流
+每个(视图, 维度, 取值)对应一个桶，桶按速率补充令牌，每个请求消耗一个令牌，
+一个请求涉及的所有桶在一次Lua调用中检查和扣减，任意一个桶没有令牌时整个请求被拒绝且不扣减令牌
+'''
+import logging
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.http import JsonResponse
+from django_redis import get_redis_connection
+
+from utils.response_code import RETCODE
+
+logger = logging.getLogger('')
+
+# 令牌桶，hash结构，tokens为剩余令牌数，ts为上次更新的毫秒时间戳
+BUCKET_KEY = 'ratelimit:%s:%s:%s'
+
+# 速率单位
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# KEYS: 各个桶
+# ARGV: 当前毫秒时间戳, 然后每个桶依次为 每毫秒补充的令牌数, 桶容量
+# 返回 {是否允许, 需要等待的毫秒数}
+TOKEN_BUCKET_SCRIPT = '''
+local now = tonumber(ARGV[1])
+local allowed = 1
+local wait = 0
+local tokens = {}
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2])
+    local capacity = tonumber(ARGV[i * 2 + 1])
+    local bucket = redis.call('hmget', key, 'tokens', 'ts')
+    local left = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    left = math.min(capacity, left + math.max(0, now - ts) * rate)
+    if left < 1 then
+        allowed = 0
+        wait = math.max(wait, (1 - left) / rate)
+    end
+    tokens[i] = left
+end
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2])
+    local capacity = tonumber(ARGV[i * 2 + 1])
+    local left = tokens[i]
+    if allowed == 1 then
+        left = left - 1
+    end
+    redis.call('hset', key, 'tokens', tostring(left), 'ts', ARGV[1])
+    -- 桶补满所需的时间之后，桶的状态与不存在时相同，可以过期
+    redis.call('pexpire', key, math.ceil(capacity / rate))
+end
+return {allowed, math.ceil(wait)}
+'''
+
+
+def parse_rate(rate):
+    '''
+    解析形如 '5/m' 的速率，返回 (桶容量, 每毫秒补充的令牌数)
+    '''
+    count, period = rate.split('/')
+    return int(count), int(count) / (PERIODS[period] * 1000)
+
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def request_mobile(request):
+    return request.POST.get('mobile') or request.GET.get('mobile')
+
+
+# 限流维度 -> 从请求中取出对应取值的函数
+KEY_FUNCS = {
+    'ip': client_ip,
+    'mobile': request_mobile,
+}
+
+
+def check(scope, limits, request):
+    '''
+    检查请求是否超出限制，limits为 维度 -> 速率 的字典
+    返回 (是否允许, 需要等待的秒数)
+    '''
+    keys = []
+    args = [int(time.time() * 1000)]
+    for dimension, rate in limits.items():
+        value = KEY_FUNCS[dimension](request)
+        if not value:
+            continue
+        capacity, per_ms = parse_rate(rate)
+        keys.append(BUCKET_KEY % (scope, dimension, value))
+        args.extend([per_ms, capacity])
+    if not keys:
+        return True, 0
+    redis_conn = get_redis_connection('default')
+    allowed, wait = redis_conn.register_script(TOKEN_BUCKET_SCRIPT)(keys=keys, args=args)
+    return bool(allowed), (wait + 999) // 1000
+
+
+def ratelimit(view, methods=None, **limits):
+    '''
+    为视图加上限流，在urls.py中使用：
+        path('smscode/', ratelimit(SmsCodeView.as_view(), ip='20/m', mobile='3/m'), name='smscode')
+    同时指定多个维度时，任意一个维度超出限制都会拒绝请求
+    methods为需要限流的请求方法，默认全部限流
+    '''
+    scope = view.__name__
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if getattr(settings, 'RATELIMIT_ENABLE', True) and (methods is None or request.method in methods):
+            try:
+                allowed, wait = check(scope, limits, request)
+            except Exception as e:
+                # redis不可用时不影响正常访问
+                logger.error(e)
+            else:
+                if not allowed:
+                    response = JsonResponse({'code': RETCODE.THROTTLINGERR, 'errmsg': '请求过于频繁，请稍后再试'},
+                                            status=429)
+                    response['Retry-After'] = str(wait)
+                    return response
+        return view(request, *args, **kwargs)
+    return wrapper